@@ -5,6 +5,7 @@ Collision checking using mediator pattern to decouple shapes.
 import functools
 import Shapes
 import lib
+import Util.Profiler
 
 COLL_SHAPES = Shapes.COLLISION_SHAPETYPES
 
@@ -78,6 +79,13 @@ class Collider(object):
             Not all methods make use of epsilon 'fuzzing'
         """
         check_fn = Collider._collision_fn(shape1, shape2)
+        if Util.Profiler.ENABLED:
+            start = Util.Profiler.clock()
+            result = check_fn(shape1, shape2, eps)
+            Util.Profiler.PROFILER.record(
+                "Collider.check", "collision", start, Util.Profiler.clock(),
+                {'shapes': check_fn.__name__})
+            return result
         return check_fn(shape1, shape2, eps)
 
     check = collision_check
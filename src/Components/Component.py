@@ -5,6 +5,7 @@ Base component, handles layering management, position, selection, etc.
 import Engine.ID
 import Collision
 import pyglet
+import Util.Profiler
 
 class Component(object):
     """
@@ -141,12 +142,19 @@ class Component(object):
         """
         Updates component elements, graphical and logical.
         """
+        profiled = Util.Profiler.ENABLED
+        if profiled:
+            start = Util.Profiler.clock()
         self.update_global_coords()
         
         for element in self._elements:
             element.update(dt)
         
         self._dirty = False
+        if profiled:
+            Util.Profiler.PROFILER.record(
+                "Component.update", "component", start,
+                Util.Profiler.clock(), {'class': self.__class__.__name__})
     
     def update_batch(self, batch, group):
         """
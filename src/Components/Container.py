@@ -3,6 +3,7 @@ Component that contains other components.
 """
 
 import pyglet
+import Util.Profiler
 from Component import Component
 
 class Container(Component):
@@ -57,9 +58,16 @@ class Container(Component):
         
     
     def update(self, dt): #pylint:disable-msg=C0103
+        profiled = Util.Profiler.ENABLED
+        if profiled:
+            start = Util.Profiler.clock()
         Component.update(self, dt)
         for child in self._children:
             child.update(dt)
+        if profiled:
+            Util.Profiler.PROFILER.record(
+                "Container.update", "component", start,
+                Util.Profiler.clock(), {'class': self.__class__.__name__})
     
     def update_batch(self, batch, group):
         Component.update_batch(self, batch, group)
@@ -3,6 +3,8 @@ Standard game entity.
 """
 import Collision.Shapes
 import ID
+import Registry
+import Util.Profiler
 
 class Entity(object):
     """
@@ -23,6 +25,7 @@ class Entity(object):
           enabled :      is the entity updating       : True
         timescale :        see update methods         : 1.0
          collider :  collision object for the entity  : None
+         registry :   EntityRegistry to add the entity to  : None
         """
         self._x, self._y = kwargs.get('x', 0), kwargs.get('y', 0) #pylint:disable-msg=C0103,C0301
         self._visible = kwargs.get('visible', True)
@@ -33,12 +36,28 @@ class Entity(object):
         self._id = ID.get_id(self)
         self._dirty = False
         self._dt = 0.0
+        #(collider, x, y) the collider was last centered with
+        self._centered = None
+        self._registry = kwargs.get('registry', None)
+        if self._registry is not None:
+            self._handle = self._registry.add(self)
+        else:
+            self._handle = Registry.NULL_HANDLE
     
     def _get_id(self):
         """Return the entity's id"""
         return self._id
     eid = property(_get_id)
     
+    def _get_handle(self):
+        """
+        Return the entity's handle in its registry.
+        
+        NULL_HANDLE if the entity wasn't given a registry, or was destroyed.
+        """
+        return self._handle
+    handle = property(_get_handle)
+    
     def _get_timescale(self):
         """
         Returns the entity's timescale.
@@ -82,6 +101,9 @@ class Entity(object):
         
         self._collider = None
         self._dirty = False
+        if self._registry is not None:
+            self._registry.remove(self._handle)
+            self._handle = Registry.NULL_HANDLE
                     
     def get_center(self):
         """
@@ -98,9 +120,30 @@ class Entity(object):
         Applies local timescale modifier before calling _pre_update
         """
         self._dt = dt * self.timescale #pylint:disable-msg=C0103,
+        if Util.Profiler.ENABLED:
+            self._profiled_update()
+            return
+        self._pre_update()
+        self._update()
+        self._post_update()
+    
+    def _profiled_update(self):
+        """Run the update phases, recording each in Util.Profiler"""
+        clock = Util.Profiler.clock
+        record = Util.Profiler.PROFILER.record
+        args = {'class': self.__class__.__name__}
+        
+        start = clock()
         self._pre_update()
+        pre_end = clock()
         self._update()
+        update_end = clock()
         self._post_update()
+        end = clock()
+        
+        record("Entity._pre_update", "entity", start, pre_end, args)
+        record("Entity._update", "entity", pre_end, update_end, args)
+        record("Entity._post_update", "entity", update_end, end, args)
         
     def _pre_update(self):
         """
@@ -149,7 +192,16 @@ class Entity(object):
     def _update_collider(self):
         """
         Update the collider, if any, associated with this entity.
-        """
-        if self._collider:
-            center = self.get_center()
-            self._collider.center_at(center.x, center.y)
\ No newline at end of file
+        
+        Skipped when neither the collider nor the entity's position
+        changed since the last update.
+        """
+        collider = self._collider
+        if collider:
+            x, y = self._x, self._y
+            centered = self._centered
+            if (centered is not None and centered[0] is collider and
+                centered[1] == x and centered[2] == y):
+                return
+            collider.center_at(self.get_center())
+            self._centered = (collider, x, y)
\ No newline at end of file
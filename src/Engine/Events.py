@@ -2,39 +2,214 @@
 Describes EventArgs and EventHandlers
 """
 
+import collections
+import functools
+import itertools
+import multiprocessing.pool
+import threading
+import time
+import types
+import weakref
 import ID
 
+#Threads in the pool invoke_async uses when it isn't given one
+ASYNC_POOL_SIZE = 8
+
+_ASYNC_POOL = None
+_ASYNC_POOL_LOCK = threading.Lock()
+
 class EventArgs(object):
-    """Base class for arguments of an event."""
-    def __init__(self, custom_id = None):
-        self.eid = ID.get_id(self, custom_id = custom_id)
+    """
+    Base class for arguments of an event.
+    
+    By default each EventArgs gets an ID when it's made.  High frequency
+    events can pass with_id=False to skip that- an ID is only allocated
+    if eid is read.  Events made without an ID are only equal to
+    themselves.  See EventArgsPool for reusing EventArgs.
+    """
+    __slots__ = ['_eid']
+    
+    def __init__(self, custom_id = None, with_id = True):
+        if with_id or custom_id is not None:
+            self._eid = ID.get_id(self, custom_id = custom_id)
+        else:
+            self._eid = None
     
     def __eq__(self, other):
+        if self is other:
+            return True
         try:
-            return self.eid == other.eid
+            eid, other_eid = self._eid, other._eid
         except AttributeError:
             return False
+        if eid is other_eid:
+            return eid is not None
+        if eid is None or other_eid is None:
+            return False
+        return eid == other_eid
+    
+    def __ne__(self, other):
+        return not self.__eq__(other)
+    
+    def _get_eid(self):
+        """The event's ID, allocated on first use for with_id=False"""
+        if self._eid is None:
+            self._eid = ID.get_id(self)
+        return self._eid
+    def _set_eid(self, value):
+        """Set the event's ID"""
+        self._eid = value
+    eid = property(_get_eid, _set_eid)
+    
+    def _recycle(self):
+        """Forget the ID, so a reused EventArgs gets a new one"""
+        self._eid = None
     
     def __str__(self):
         return "EventArgs(ID={})".format(self.eid)
         
 NONEARGS = EventArgs(custom_id = -1)
 
+class WeakMethod(object):
+    """
+    Weak reference to a bound method.
+    
+    Calling it returns the bound method, or None once the method's
+    object has been collected.  (A plain weakref to a bound method dies
+    immediately, since bound methods are created on each access.)
+    """
+    __slots__ = ['_obj_ref', '_func']
+    
+    def __init__(self, method, callback=None):
+        self._obj_ref = weakref.ref(method.im_self, callback)
+        self._func = method.im_func
+    
+    def __call__(self):
+        obj = self._obj_ref()
+        if obj is None:
+            return None
+        return types.MethodType(self._func, obj, type(obj))
+
+def _listener_key(listener):
+    """
+    Registry key for a listener- equal for equal bound methods.
+    
+    Keys hold no references, so weakly held listeners can be collected.
+    """
+    obj = getattr(listener, 'im_self', None)
+    if obj is not None:
+        return (id(obj), id(listener.im_func))
+    return id(listener)
+
+def _async_pool():
+    """The shared invoke_async thread pool, started on first use"""
+    global _ASYNC_POOL #pylint:disable-msg=W0603
+    with _ASYNC_POOL_LOCK:
+        if _ASYNC_POOL is None:
+            _ASYNC_POOL = multiprocessing.pool.ThreadPool(ASYNC_POOL_SIZE)
+        return _ASYNC_POOL
+
+def _prune_listener(handler_ref, key, _):
+    """Weakref callback: drop a collected listener from its handler"""
+    handler = handler_ref()
+    if handler is not None:
+        handler._remove_key(key) #pylint:disable-msg=W0212
+
+class EventArgsPool(object):
+    """
+    Hands out recycled EventArgs, for events fired many times a frame.
+    
+    factory: makes a new EventArgs when the pool is empty, such as
+        functools.partial(MyEventArgs, with_id=False)
+    max_size: most released EventArgs kept for reuse.
+    
+    Released EventArgs forget their ID; set any other fields again after
+    acquire(), and don't hold on to them after release().
+    """
+    def __init__(self, factory=None, max_size=256):
+        if factory is None:
+            factory = functools.partial(EventArgs, with_id=False)
+        self._factory = factory
+        self._max_size = max_size
+        self._free = []
+    
+    def acquire(self):
+        """Returns a recycled EventArgs, or a new one"""
+        if self._free:
+            return self._free.pop()
+        return self._factory()
+    
+    def release(self, event_args):
+        """Return an EventArgs to the pool"""
+        if len(self._free) < self._max_size:
+            event_args._recycle() #pylint:disable-msg=W0212
+            self._free.append(event_args)
+    
+    def __len__(self):
+        """Number of EventArgs ready for reuse"""
+        return len(self._free)
+
 class EventHandler(object):
-    """Takes events and dispatches them to its listeners."""
+    """
+    Takes events and dispatches them to its listeners.
+    
+    Listeners are called in the order they were added.
+    Bound methods are held weakly, so listening doesn't keep their
+    objects alive- once an object is collected, its methods stop
+    listening.  Other listeners are held strongly unless they're added
+    with weak=True.  (Held weakly, a lambda or closure would be
+    collected right away.)
+    
+    Batch listeners (see add_batch_listener) are called once per
+    invoke or invoke_batch with lists of senders and EventArgs.
+    """
     def __init__(self, custom_id=None):
         self.id = ID.get_id(self, custom_id = custom_id) #pylint:disable-msg=C0103,C0301
-        self._listeners = []
+        #key -> (listener or weak ref, is weak), in the order added
+        self._listeners = collections.OrderedDict()
+        self._batch_listeners = collections.OrderedDict()
+        #Tuples of the values of each registry, rebuilt after changes
+        self._snapshot = None
+        self._batch_snapshot = None
     
-    def add_listener(self, listener_or_iter):
+    def add_listener(self, listener_or_iter, weak=None):
         """Adds the listener to those pushed on invocation.
-            Can add iterable structures of listeners.  Uses recursion."""
+            Can add iterable structures of listeners.  Uses recursion.
+            weak: hold the listener weakly.  Defaults to True for
+                bound methods, False for anything else.
+            None is ignored."""
         if hasattr(listener_or_iter, '__iter__'):
             for listener in listener_or_iter:
-                self.add_listener(listener)
-        else:
-            if not listener_or_iter in self._listeners:
-                self._listeners.append(listener_or_iter)                
+                self.add_listener(listener, weak)
+        elif self._add_to(self._listeners, listener_or_iter, weak):
+            self._snapshot = None
+    
+    def add_batch_listener(self, listener, weak=None):
+        """Adds a listener that takes (senders, event_args_list).
+            See add_listener for weak."""
+        if self._add_to(self._batch_listeners, listener, weak):
+            self._batch_snapshot = None
+    
+    def _add_to(self, registry, listener, weak):
+        """Adds the listener to registry.  Returns True if it was added."""
+        if listener is None:
+            return False
+        key = _listener_key(listener)
+        if key in registry:
+            return False
+        
+        is_method = getattr(listener, 'im_self', None) is not None
+        if weak is None:
+            weak = is_method
+        if weak:
+            callback = functools.partial(_prune_listener,
+                                         weakref.ref(self), key)
+            if is_method:
+                listener = WeakMethod(listener, callback)
+            else:
+                listener = weakref.ref(listener, callback)
+        registry[key] = (listener, weak)
+        return True
     
     def __call__(self, sender, event_args=NONEARGS):
         """Invoke the EventHandler.  If no event_args are passed,
@@ -56,16 +231,84 @@ class EventHandler(object):
             
     def invoke(self, sender=None, event_args=NONEARGS):
         """Invoke the handler with sender and args information.
-            Default args are NONEARGS."""
-        dead_listeners = []
-        for listener in self._listeners:
-            if listener is not None:
-                listener(sender, event_args)
+            Default args are NONEARGS.
+            Listeners added or removed by a listener take effect
+            on the next invoke."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self._snapshot = tuple(self._listeners.itervalues())
+        for listener, weak in snapshot:
+            if weak:
+                listener = listener()
+                if listener is None:
+                    continue
+            listener(sender, event_args)
+        if self._batch_listeners:
+            self._invoke_batch_listeners([sender], [event_args])
+    
+    def invoke_async(self, sender=None, event_args=NONEARGS,
+                     timeout=None, pool=None):
+        """Invoke every listener (and batch listener) concurrently on a
+            thread pool, and wait for all of them.
+            
+            Returns each listener's return value, in listener order.
+            A listener that raised gives its exception instead, and one
+            still running after timeout seconds gives a
+            multiprocessing.TimeoutError (it's left to finish on its own,
+            since threads can't be cancelled).
+            pool: a multiprocessing.pool.ThreadPool (or Pool) to run the
+                listeners on.  Defaults to a shared pool of
+                ASYNC_POOL_SIZE threads."""
+        if pool is None:
+            pool = _async_pool()
+        results = [pool.apply_async(listener, (sender, event_args))
+                   for listener in self.Listeners]
+        results.extend(pool.apply_async(listener, ([sender], [event_args]))
+                       for listener in self._live(self._batch_listeners))
+        
+        deadline = None if timeout is None else time.time() + timeout
+        outcomes = []
+        for result in results:
+            if deadline is None:
+                remaining = None
             else:
-                dead_listeners.append(listener)
-        for listener in dead_listeners:
-            self.remove_listener(listener)
-        dead_listeners = None
+                remaining = max(0.0, deadline - time.time())
+            try:
+                outcomes.append(result.get(remaining))
+            except Exception as err: #pylint:disable-msg=W0703
+                outcomes.append(err)
+        return outcomes
+    
+    def invoke_batch(self, senders, event_args_list):
+        """Invoke the handler once for each (sender, event_args) pair.
+            Each listener handles every pair before the next listener
+            runs, then batch listeners get the whole lists at once."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self._snapshot = tuple(self._listeners.itervalues())
+        for listener, weak in snapshot:
+            if weak:
+                listener = listener()
+                if listener is None:
+                    continue
+            for sender, event_args in itertools.izip(senders,
+                                                     event_args_list):
+                listener(sender, event_args)
+        if self._batch_listeners:
+            self._invoke_batch_listeners(senders, event_args_list)
+    
+    def _invoke_batch_listeners(self, senders, event_args_list):
+        """Call each batch listener with the lists"""
+        snapshot = self._batch_snapshot
+        if snapshot is None:
+            snapshot = tuple(self._batch_listeners.itervalues())
+            self._batch_snapshot = snapshot
+        for listener, weak in snapshot:
+            if weak:
+                listener = listener()
+                if listener is None:
+                    continue
+            listener(senders, event_args_list)
     
     def __isub__(self, listener):
         """Remove a listener"""
@@ -73,11 +316,103 @@ class EventHandler(object):
         return self
     
     def __get_listeners(self):
-        """Return a copy of the listeners"""
-        return self._listeners[:]
+        """Return a copy of the (live) listeners"""
+        return self._live(self._listeners)
     Listeners = property(__get_listeners)
     
+    @staticmethod
+    def _live(registry):
+        """The live listeners in registry, as a list"""
+        listeners = []
+        for listener, weak in registry.itervalues():
+            if weak:
+                listener = listener()
+                if listener is None:
+                    continue
+            listeners.append(listener)
+        return listeners
+    
+    def remove_batch_listener(self, listener):
+        """Removes a batch listener."""
+        key = _listener_key(listener)
+        if self._batch_listeners.pop(key, None) is not None:
+            self._batch_snapshot = None
+    
     def remove_listener(self, listener):
         """Removes the listener from those pushed on invocation."""
-        if listener in self._listeners:
-            self._listeners.remove(listener)
+        key = _listener_key(listener)
+        if self._listeners.pop(key, None) is not None:
+            self._snapshot = None
+    
+    def _remove_key(self, key):
+        """Removes any listener or batch listener with registry key `key`"""
+        if self._listeners.pop(key, None) is not None:
+            self._snapshot = None
+        if self._batch_listeners.pop(key, None) is not None:
+            self._batch_snapshot = None
+
+class EventQueue(object):
+    """
+    Collects events during a frame, and dispatches them together.
+    
+    post() queues an invoke instead of running it.  dispatch() (called at
+    a fixed point in the frame) runs everything queued, grouped by
+    handler- see EventHandler.invoke_batch.  Handlers are dispatched in
+    the order they were first posted to, and each handler's events in
+    the order they were posted.
+    Events posted during dispatch() are queued for the next dispatch().
+    
+    post() is thread-safe, so other threads (such as network threads)
+    can hand events to the thread that calls dispatch().
+    """
+    def __init__(self):
+        #(handler, sender, event_args), in the order posted
+        self._pending = []
+        #(id(handler), key) -> index in _pending
+        self._keys = {}
+        self._lock = threading.Lock()
+    
+    def clear(self):
+        """Drop every queued event"""
+        with self._lock:
+            self._pending = []
+            self._keys = {}
+    
+    def dispatch(self):
+        """Invoke every queued event.  Returns the number dispatched."""
+        with self._lock:
+            pending = self._pending
+            self._pending = []
+            self._keys = {}
+        
+        #id(handler) -> (handler, senders, event_args_list)
+        batches = collections.OrderedDict()
+        for handler, sender, event_args in pending:
+            batch = batches.get(id(handler))
+            if batch is None:
+                batch = batches[id(handler)] = (handler, [], [])
+            batch[1].append(sender)
+            batch[2].append(event_args)
+        for handler, senders, event_args_list in batches.itervalues():
+            handler.invoke_batch(senders, event_args_list)
+        return len(pending)
+    
+    def post(self, handler, sender=None, event_args=NONEARGS, key=None):
+        """Queue an invoke of handler.
+            When key isn't None and an event for the same handler and key
+            is already queued, that event's sender and event_args are
+            replaced instead, keeping its place in the queue."""
+        event = (handler, sender, event_args)
+        with self._lock:
+            if key is not None:
+                coalesce_key = (id(handler), key)
+                index = self._keys.get(coalesce_key)
+                if index is not None:
+                    self._pending[index] = event
+                    return
+                self._keys[coalesce_key] = len(self._pending)
+            self._pending.append(event)
+    
+    def __len__(self):
+        """Number of queued events"""
+        return len(self._pending)
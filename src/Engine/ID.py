@@ -1,8 +1,12 @@
 """
 Everything having to do with ids and id managers
+
+IDs are integers handed out by an id_manager.  The readable
+"{manager}:{cname}:{index}" form is only built when it's displayed
+(see ID.Name).
 """
 
-import Util
+import itertools
 
 def get_id(obj, custom_id = None):
     """Returns an ID for an object, using the GLOBAL_ID_MANAGER"""
@@ -10,26 +14,36 @@ def get_id(obj, custom_id = None):
 
 class ID(object):
     """An id with a value from an id_manager"""
+    __slots__ = ['_value', '_id_manager', '_cls']
+    
     def __init__(self, obj=None, id_manager_=None, custom_value=None):
+        if obj is None:
+            obj = self
+        self._cls = obj.__class__
         if custom_value is not None:
             self._value = custom_value
-            self.__id_manager = None
+            self._id_manager = None
         else:
             if not hasattr(id_manager_, "next_id"):
                 id_manager_ = GLOBAL_ID_MANAGER
-            self.__id_manager = id_manager_
-            if obj is None:
-                obj = self
-            self._value = self.__id_manager.next_id(obj)
+            self._id_manager = id_manager_
+            self._value = id_manager_.next_id(obj)
     
     def __eq__(self, other):
+        if self is other:
+            return True
         try:
-            val_eq = self.Value == other.Value
-            idm_eq = self.ID_Manager == other.ID_Manager
-            return val_eq and idm_eq
+            return (self._value == other._value and
+                    self._id_manager is other._id_manager)
         except AttributeError:
             return False
     
+    def __ne__(self, other):
+        return not self.__eq__(other)
+    
+    def __hash__(self):
+        return hash(self._value) ^ id(self._id_manager)
+    
     def __get_value(self):
         """Returns the ID's value"""
         return self._value
@@ -37,38 +51,93 @@ class ID(object):
     
     def __get_id_manager(self):
         """Returns the object's id manager"""
-        return self.__id_manager
+        return self._id_manager
     ID_Manager = property(__get_id_manager)
     
+    def __get_name(self):
+        """The readable form of the id, "{manager}:{cname}:{index}" """
+        if self._id_manager is None:
+            return ID_FMT.format(manager=None, cname=_class_name(self._cls),
+                                 index=self._value)
+        return self._id_manager.format_id(self._value, self._cls)
+    Name = property(__get_name)
+    
     def __str__(self):
-        return "ID(id_manager={}, value={})".format(
-            self.__id_manager, self._value)
+        return self.Name
 
 ID_FMT = "{manager}:{cname}:{index}"
+
+def _class_name(cls):
+    """Same as Util.class_name, but takes the class instead of an instance"""
+    return ".".join(str(cls).split("'")[1].split(".")[1:])
+
+def _check_ranges(ranges):
+    """Raises ValueError if any [start, stop) runs backwards or overlaps"""
+    last_stop = None
+    for start, stop in sorted(ranges):
+        if start > stop:
+            msg = "Id range ({}, {}) runs backwards.".format(start, stop)
+            raise ValueError(msg)
+        if last_stop is not None and start < last_stop:
+            msg = "Id range ({}, {}) overlaps another.".format(start, stop)
+            raise ValueError(msg)
+        last_stop = stop
+
+def _skipping_counter(ranges):
+    """Counts up from 0, skipping every [start, stop) in ranges"""
+    pieces = []
+    value = 0
+    for start, stop in sorted(ranges):
+        if stop <= value:
+            continue
+        if start > value:
+            pieces.append(xrange(value, start))
+        value = stop
+    pieces.append(itertools.count(value))
+    return itertools.chain(*pieces)
+
 class id_manager(object): # pylint: disable-msg=C0103
-    """Used to track and hand out ids.  Currently only supports
-            getting the next available id.  Uses seperate ids for
-            different types of objects"""
-    def __init__(self, manager_name = None):
-        self.__nid = {}
+    """Used to track and hand out ids.  Ids are integers from a single
+            counter per manager, so ids are unique within a manager.
+            
+            class_ranges: optional {class: (start, stop)}.  Objects of
+                exactly that class get ids from [start, stop) instead,
+                and OverflowError is raised once a range runs out.
+                The shared counter (which counts up from 0) skips
+                over every range, so ids stay unique.  Ranges can't
+                overlap or run backwards (ValueError).
+            
+            Ids come from itertools counters, so allocating one takes
+            no lock and no string formatting."""
+    def __init__(self, manager_name = None, class_ranges = None):
         self.__manager_name = manager_name
+        self.__class_ranges = dict(class_ranges or {})
+        _check_ranges(self.__class_ranges.values())
+        self.reset()
+    
+    def format_id(self, value, cls):
+        """Returns the readable "{manager}:{cname}:{index}" form of an id
+            that this manager gave an object of class cls."""
+        return ID_FMT.format(manager = self.__manager_name,
+                             cname = _class_name(cls),
+                             index = value)
     
     def next_id(self, obj):
         """Returns the next id available from the manager."""
-        #otype = type(obj)
-        class_name = Util.class_name(obj)
-        if self.__nid.has_key(class_name):
-            self.__nid[class_name] += 1
-        else:
-            self.__nid[class_name] = 1
-        index = self.__nid[class_name] - 1
-        name = ID_FMT.format(manager = self.__manager_name,
-                             cname = class_name,
-                             index = index)
-        return name
+        counter = self.__class_counters.get(obj.__class__)
+        if counter is None:
+            return next(self.__counter)
+        try:
+            return next(counter)
+        except StopIteration:
+            msg = "Id range for {} is used up.".format(obj.__class__)
+            raise OverflowError(msg)
     
     def reset(self):
         """Resets all counters."""
-        self.__nid = {}
+        self.__counter = _skipping_counter(self.__class_ranges.values())
+        self.__class_counters = {}
+        for cls, (start, stop) in self.__class_ranges.iteritems():
+            self.__class_counters[cls] = iter(xrange(start, stop))
 
-GLOBAL_ID_MANAGER = id_manager("GLOBAL")
\ No newline at end of file
+GLOBAL_ID_MANAGER = id_manager("GLOBAL")
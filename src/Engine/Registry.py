@@ -0,0 +1,122 @@
+"""
+Lookup of live objects by generational handle
+
+A handle is an integer that packs a slot index (the low INDEX_BITS)
+and the generation of that slot (the rest).  Removing an object bumps
+its slot's generation, so any handle still pointing at the slot no
+longer matches and lookups return None instead of a recycled object.
+Freed slots are reused before the arrays grow, so memory stays flat
+when objects are added and removed every frame.
+"""
+
+__all__ = ['EntityRegistry', 'NULL_HANDLE', 'INDEX_BITS',
+           'handle_index', 'handle_generation']
+
+import array
+
+INDEX_BITS = 24
+INDEX_MASK = (1 << INDEX_BITS) - 1
+
+#Never returned by add, so it's safe as a "no handle" value
+NULL_HANDLE = -1
+
+def handle_index(handle):
+    """Returns the slot index of a handle"""
+    return handle & INDEX_MASK
+
+def handle_generation(handle):
+    """Returns the generation of a handle"""
+    return handle >> INDEX_BITS
+
+class EntityRegistry(object):
+    """
+    Dense, slot-recycling table of objects keyed by generational handles.
+    
+    add, get, remove and contains are O(1).  Slots are kept in two
+    parallel arrays (objects and generations), and freed slots are
+    kept on a free list to be handed out again.
+    """
+    def __init__(self):
+        self._objects = []
+        self._generations = array.array('L')
+        self._free = []
+        self._count = 0
+    
+    def add(self, obj):
+        """Store obj, and return its handle"""
+        if self._free:
+            index = self._free.pop()
+            self._objects[index] = obj
+        else:
+            index = len(self._objects)
+            if index > INDEX_MASK:
+                raise OverflowError("Registry is full.")
+            self._objects.append(obj)
+            self._generations.append(0)
+        self._count += 1
+        return (self._generations[index] << INDEX_BITS) | index
+    
+    def get(self, handle, default=None):
+        """Returns the object for handle, or default if the handle is stale"""
+        index = handle & INDEX_MASK
+        try:
+            if (handle >= 0 and
+                self._generations[index] == handle >> INDEX_BITS):
+                return self._objects[index]
+        except IndexError:
+            pass
+        return default
+    
+    def contains(self, handle):
+        """True if handle refers to an object that hasn't been removed"""
+        index = handle & INDEX_MASK
+        return (0 <= handle and index < len(self._generations) and
+                self._generations[index] == handle >> INDEX_BITS and
+                self._objects[index] is not None)
+    __contains__ = contains
+    
+    def remove(self, handle):
+        """
+        Remove the object for handle, and free its slot.
+        
+        Returns the object removed, or None if the handle was stale.
+        """
+        if not self.contains(handle):
+            return None
+        index = handle & INDEX_MASK
+        obj = self._objects[index]
+        self._objects[index] = None
+        #Wrap instead of overflowing the array's unsigned long
+        self._generations[index] = (self._generations[index] + 1) & 0xffffffff
+        self._free.append(index)
+        self._count -= 1
+        return obj
+    
+    def clear(self):
+        """Remove every object.  Handles given out before are all stale."""
+        generations = self._generations
+        for index in xrange(len(generations)):
+            if self._objects[index] is not None:
+                generations[index] = (generations[index] + 1) & 0xffffffff
+        self._objects = [None] * len(generations)
+        self._free = range(len(generations) - 1, -1, -1)
+        self._count = 0
+    
+    def handles(self):
+        """Returns the handle of every stored object, in slot order"""
+        generations = self._generations
+        return [(generations[index] << INDEX_BITS) | index
+                for index, obj in enumerate(self._objects) if obj is not None]
+    
+    def __iter__(self):
+        """Iterates over every stored object, in slot order"""
+        return (obj for obj in self._objects if obj is not None)
+    
+    def __len__(self):
+        """Number of stored objects"""
+        return self._count
+    
+    def _get_capacity(self):
+        """Number of slots, used or free"""
+        return len(self._objects)
+    Capacity = property(_get_capacity)
@@ -4,8 +4,26 @@ and managing selection index/default index
 """
 
 import ConfigParser
+import os
 import Util
 
+def _option_key(value):
+    """Hashable stand-in for an option, so list options can be indexed"""
+    if type(value) is list:
+        return (list, tuple(_option_key(item) for item in value))
+    elif type(value) is tuple:
+        return tuple(_option_key(item) for item in value)
+    return value
+
+def _option_to_str(value):
+    """Write one option the way struct_to_str writes it in a list"""
+    return Util.Formatting.struct_to_str([value])[1:-1]
+
+def _option_from_str(string):
+    """Read an option written by _option_to_str"""
+    values = Util.Formatting.str_to_struct("[" + string + "]", str)
+    return values[0] if values else ""
+
 class Setting(object):
     """A setting option, with defaults, index, list of options,
         name, and description."""
@@ -22,10 +40,18 @@ class Setting(object):
             self._options = []
         else:
             self._options = list(options)
+        self._rebuild_index()
+        self._dirty = False
     
     def add_option(self, value):
         """Adds the option to the list of options"""
         self._options.append(value)
+        try:
+            self._index.setdefault(_option_key(value), len(self._options) - 1)
+        except TypeError:
+            #Unhashable- found by _find's scan instead
+            pass
+        self._dirty = True
         if len(self._options) == 1:
             self.current_index = 0
             
@@ -42,6 +68,7 @@ class Setting(object):
         else:
             value %= len(self._options)
         self._current_index = value
+        self._dirty = True
     current_index = property(__g_current_index, __s_current_index)
     
     def __g_current_option(self):
@@ -50,8 +77,10 @@ class Setting(object):
     def __s_current_option(self, value):
         """Sets the current option of the setting.
             If option is not a valid option, does not make a change"""
-        if value in self._options:
-            self._current_index = self._options.index(value)
+        index = self._find(value)
+        if index is not None:
+            self._current_index = index
+            self._dirty = True
         else:
             raise KeyError(self.__no_opt_err.format(value))            
     current_option = property(__g_current_option, __s_current_option)
@@ -66,6 +95,7 @@ class Setting(object):
             value = -1
         value %= len(self._options)
         self._default_index = value
+        self._dirty = True
     default_index = property(__g_default_index, __s_default_index)
     
     def __g_default_option(self):
@@ -74,8 +104,10 @@ class Setting(object):
     def __s_default_option(self, value):
         """Sets the default option of the setting.
             If value is not a valid option, does not make a change"""
-        if value in self._options:
-            self._default_index = self._options.index(value)
+        index = self._find(value)
+        if index is not None:
+            self._default_index = index
+            self._dirty = True
         else:
             raise KeyError(self.__no_opt_err.format(value))            
     default_option = property(__g_default_option, __s_default_option)
@@ -86,25 +118,38 @@ class Setting(object):
     def __s_description(self, value):
         """Sets the description of the setting- no checking"""
         self._description = value
+        self._dirty = True
     description = property(__g_description, __s_description)
     
+    def __g_dirty(self):
+        """True if the setting changed since it was loaded or saved"""
+        return self._dirty
+    def __s_dirty(self, value):
+        """Set (or clear) the changed flag"""
+        self._dirty = value
+    dirty = property(__g_dirty, __s_dirty)
+    
+    def _find(self, value):
+        """Returns the index of value's first occurrence, None if missing"""
+        try:
+            return self._index.get(_option_key(value))
+        except TypeError:
+            #Unhashable, and not a list- fall back to a scan
+            try:
+                return self._options.index(value)
+            except ValueError:
+                return None
+    
     def _get_index(self, value):
         """Returns the index of the value in options. 
             Raises key error when value not in options."""
-        err = None
-        index = -1
-        
         if not self._options:
-            err = "No values loaded in options."
-        elif value in self._options:
-            index = self._options.index(value)
-        else:
+            raise KeyError("No values loaded in options.")
+        index = self._find(value)
+        if index is None:
             err = "Could not find option {} in self.options".format(value)
-        
-        if err:
             raise KeyError(err)
-        else:
-            return index
+        return index
     
     def load(self, config, name = None):
         """Load a setting from a config file.
@@ -116,17 +161,19 @@ class Setting(object):
         section = self._resolve_name(name)
             
         description = config.get(section, 'description')
-        default_value = config.get(section, 'default_option')
-        current_value = config.get(section, 'current_option')
+        default_value = _option_from_str(config.get(section, 'default_option'))
+        current_value = _option_from_str(config.get(section, 'current_option'))
         options_str = config.get(section, 'options')
         options_lst = list(Util.Formatting.str_to_struct(options_str, str))
         
         self._options = options_lst[:]
+        self._rebuild_index()
         self.description = description
         
         
         self.default_index = self._get_index(default_value)
         self.current_index = self._get_index(current_value)
+        self._dirty = False
     
     def __g_name(self):
         """The name of the setting"""
@@ -171,11 +218,24 @@ class Setting(object):
                 raise AttributeError("No name specified.")
         return name
 
+    def _rebuild_index(self):
+        """Map each option to the index of its first occurrence"""
+        self._index = {}
+        for index, value in enumerate(self._options):
+            try:
+                self._index.setdefault(_option_key(value), index)
+            except TypeError:
+                #Unhashable- found by _find's scan instead
+                pass
+    
     def remove_option(self, value):
         """Removes an option from the options, and
             updates the current selection as needed."""
-        if value in self._options:
-            self._options.remove(value)
+        index = self._find(value)
+        if index is not None:
+            del self._options[index]
+            self._rebuild_index()
+            self._dirty = True
         if self.current_index >= len(self._options):
             self.current_index = len(self._options) - 1
     
@@ -192,20 +252,37 @@ class Setting(object):
             config.add_section(section)
         
         config.set(section, 'description', self._description)
-        config.set(section, 'default_option', str(self.default_option))
-        config.set(section, 'current_option', str(self.current_option))
+        config.set(section, 'default_option',
+                   _option_to_str(self.default_option))
+        config.set(section, 'current_option',
+                   _option_to_str(self.current_option))
         options_str = Util.Formatting.struct_to_str(self._options)
         config.set(section, 'options', options_str)
+        self._dirty = False
             
 class Settings(object):
     """Manages multiple settings, including loading and saving from/to
         config files.  Makes building and passing 
-        around a group of settings easy."""
+        around a group of settings easy.
+        
+        Loaded sections are only parsed into Setting objects the first
+        time they're used.  save() only re-serializes settings that
+        changed, and doesn't write at all when nothing did.  Saves to a
+        filename write a temp file and rename it over the old file,
+        so a crash mid-save can't leave a half-written file."""
     __no_setting_err = 'No setting with name: "{0}"'
     
     def __init__(self, fp=None): #pylint:disable-msg=C0103
         self.__fp = fp
         self.dict = {}
+        #Sections as read from (or last written to) file
+        self._config = ConfigParser.ConfigParser()
+        #Sections in _config that haven't been parsed into self.dict
+        self._unloaded = set()
+        #Keys added, replaced or removed since the last load/save
+        self._changed = set()
+        #(filename, mtime, size) of the file _config matches
+        self._file_stamp = None
 
     def add_option(self, key, option):
         """Adds an option to a setting.  The new option is added to the end
@@ -222,17 +299,25 @@ class Settings(object):
         self[key] = setting
     
     def __getitem__(self, key):
+        if key in self._unloaded:
+            self._load_setting(key)
         if self.has_setting(key):
             return self.dict[key]
         else:
             raise KeyError(self.__no_setting_err.format(key))
+    
+    def __g_dirty(self):
+        """True if anything changed since the last load or save"""
+        return bool(self._changed) or any(setting.dirty for setting
+                                           in self.dict.itervalues())
+    dirty = property(__g_dirty)
         
     def has_setting(self, key):
         """Check if the setting with name 'key' exists."""
-        return self.dict.has_key(key)
+        return self.dict.has_key(key) or key in self._unloaded
     
     def __len__(self):
-        return len(self.dict)
+        return len(self.dict) + len(self._unloaded)
     
     def load(self, fp=None): #pylint:disable-msg=C0103
         """Load settings from a config file or file-like object.
@@ -241,7 +326,11 @@ class Settings(object):
             have a remembered filename.  In case the settings
             has a self.__filename and a filename is passed, the passed 
             filename is taken as more current.  self.__filename is 
-            NOT updated to name, unless self.__filename is None."""
+            NOT updated to name, unless self.__filename is None.
+            
+            Reloading a file that hasn't changed (same mtime and size)
+            since it was loaded or saved is skipped, unless
+            a setting changed in the meantime."""
         if fp is None:
             if self.__fp is None:
                 raise AttributeError("No save location specified.")
@@ -249,26 +338,39 @@ class Settings(object):
                 fp = self.__fp #pylint:disable-msg=C0103
         else:
             self.__fp = fp
-            
-        opened = True
-        #Try to open fp, if it's an openable file
-        try:
-            open_file = open(fp)
-        except IOError:
-            opened = False
-        else:
-            fp = open_file  #pylint:disable-msg=C0103
         
         config = ConfigParser.ConfigParser()
-        config.readfp(fp)
-        sections = config.sections()
-        for section in sections:
-            new_setting = Setting()
-            new_setting.load(config, section)
-            self.add_setting(section, new_setting)
-                
-        if opened:
-            fp.close()
+        if isinstance(fp, basestring):
+            stamp = _file_stamp(fp)
+            if stamp is not None and stamp == self._file_stamp and \
+               not self.dirty:
+                return
+            with open(fp) as open_file:
+                config.readfp(open_file)
+        else:
+            stamp = None
+            config.readfp(fp)
+        
+        #Sections still unparsed from an earlier load are kept,
+        #unless this file has them too
+        for section in self._unloaded:
+            if not config.has_section(section):
+                config.add_section(section)
+                for option, value in self._config.items(section, True):
+                    config.set(section, option, value)
+        self._config = config
+        self._file_stamp = stamp
+        for section in config.sections():
+            self.dict.pop(section, None)
+            self._unloaded.add(section)
+            self._changed.discard(section)
+    
+    def _load_setting(self, key):
+        """Parse an unloaded section into a Setting"""
+        self._unloaded.remove(key)
+        new_setting = Setting()
+        new_setting.load(self._config, key)
+        self.dict[key] = new_setting
     
     def remove_option(self, key, option):
         """Removes an option from the specified setting.
@@ -282,14 +384,19 @@ class Settings(object):
     def remove_setting(self, key):
         """Removes the setting with key = key from the dict of settings.
             Raises KeyError if there is no entry with that key."""
+        if key in self._unloaded:
+            self._load_setting(key)
         if self.has_setting(key):
+            self._changed.add(key)
             return self.dict.pop(key)
         else:
             raise KeyError(self.__no_setting_err.format(key))
     
     def save(self, fp=None): # pylint: disable-msg=C0103
         """If the settings were loaded from a file and no
-               filename is specified, saves to same place it was loaded from."""
+               filename is specified, saves to same place it was loaded from.
+               
+               Returns True if anything was written."""
         if fp is None:
             if self.__fp is None:
                 raise AttributeError("No save location specified.")
@@ -298,30 +405,57 @@ class Settings(object):
         else:
             self.__fp = fp
         
-        config = ConfigParser.ConfigParser()
-        sections = self.dict.keys()
-        for section in sections:
-            self.dict[section].save(config, section)
+        is_filename = isinstance(fp, basestring)
+        if is_filename and not self.dirty and self._file_stamp is not None \
+           and self._file_stamp == _file_stamp(fp):
+            return False
         
-        opened = True
-        #Try to open fp, if it's an openable file
-        try:
-            open_file = open(fp, 'w')
-        except IOError:
-            opened = False
-        else:
-            fp = open_file  #pylint:disable-msg=C0103
+        #Unchanged sections are written as they were read
+        config = self._config
+        for key in self._changed:
+            if key not in self.dict and config.has_section(key):
+                config.remove_section(key)
+        for key, setting in self.dict.iteritems():
+            if setting.dirty or key in self._changed or \
+               not config.has_section(key):
+                setting.save(config, key)
+        self._changed.clear()
         
-        config.write(fp)
-        
-        if opened:
-            open_file.close()
+        if is_filename:
+            _write_atomic(config, fp)
+            self._file_stamp = _file_stamp(fp)
+        else:
+            config.write(fp)
+        return True
     
     def __setitem__(self, key, value):
+        self._unloaded.discard(key)
+        self._changed.add(key)
         self.dict[key] = value
         
     def __g_settings(self):
         """Returns a list of the contained settings."""
+        for key in list(self._unloaded):
+            self._load_setting(key)
         return self.dict.values()
     settings = property(__g_settings)
-    
+
+def _file_stamp(filename):
+    """(filename, mtime, size) of a file, None if it doesn't exist"""
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return (filename, stat.st_mtime, stat.st_size)
+
+def _write_atomic(config, filename):
+    """Write config to a temp file, then rename it over filename"""
+    temp = filename + '.tmp'
+    with open(temp, 'w') as open_file:
+        config.write(open_file)
+    try:
+        os.rename(temp, filename)
+    except OSError:
+        #Windows won't rename over an existing file
+        os.remove(filename)
+        os.rename(temp, filename)
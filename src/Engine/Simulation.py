@@ -0,0 +1,210 @@
+"""
+Headless simulation of many independent worlds across processes
+
+A world is built by factory(seed) in a worker process, and must have
+update(dt) and positions(alpha) methods (an EntityGroup does).  If it
+also has drain_events(), that should return the ints recorded since it
+was last called; they're sent back with each snapshot.
+
+Worlds never leave their worker.  Only Snapshots, which hold the
+positions and events packed into bytes, are pickled back:
+    #Each world runs to the end on its own
+    results = run_independent(make_match, range(1000), ticks=600)
+    #Every world steps together, and can be stepped again
+    with SimulationRunner(make_match, range(64)) as runner:
+        snapshots = runner.step(10)
+factory has to be picklable (a module-level function).  Use
+Util.Math.RandomStream(seed) inside it to keep worlds reproducible.
+"""
+
+__all__ = ['Snapshot', 'SimulationRunner', 'run_independent', 'JOIN_TIMEOUT']
+
+import array
+import collections
+import multiprocessing
+import traceback
+
+#Seconds close() waits for a worker before terminating it
+JOIN_TIMEOUT = 5.0
+
+class Snapshot(collections.namedtuple('Snapshot',
+                                      'world tick positions events')):
+    """
+    State of one world after a tick.
+    
+    world: index of the world's seed
+    positions: bytes of an interleaved x, y array('d')
+    events: bytes of an array('l') of the world's events
+    """
+    __slots__ = ()
+    
+    @property
+    def xy(self):
+        """The positions, as an interleaved x, y array('d')"""
+        xy = array.array('d')
+        xy.fromstring(self.positions)
+        return xy
+    
+    @property
+    def event_ids(self):
+        """The events, as an array('l')"""
+        event_ids = array.array('l')
+        event_ids.fromstring(self.events)
+        return event_ids
+
+def _snapshot(world, index, tick):
+    """Pack the state of a world into a Snapshot"""
+    drain = getattr(world, 'drain_events', None)
+    events = array.array('l', drain() if drain is not None else ())
+    return Snapshot(index, tick, world.positions(1.0).tostring(),
+                    events.tostring())
+
+def _run_world(args):
+    """Pool worker: build one world, run it, and return its snapshots"""
+    factory, seed, index, ticks, step, every = args
+    world = factory(seed)
+    update = world.update
+    snapshots = []
+    for tick in xrange(1, ticks + 1):
+        update(step)
+        if tick % every == 0 or tick == ticks:
+            snapshots.append(_snapshot(world, index, tick))
+    return snapshots
+
+def run_independent(factory, seeds, ticks, step=1 / 60.0, every=1,
+                    processes=None):
+    """
+    Run a world per seed for ticks steps, spread over a process pool.
+    
+    Returns, for each seed in order, that world's list of Snapshots:
+    one every `every` ticks, and one after the last tick.
+    Worlds don't wait on each other; a pool worker moves on to the
+    next world as soon as it finishes one.
+    """
+    jobs = [(factory, seed, index, ticks, step, every)
+            for index, seed in enumerate(seeds)]
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(_run_world, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+def _shard_worker(conn, factory, shard, step):
+    """
+    Process target: builds the worlds of a shard, then steps them
+    each time it's sent a tick count, until it's sent None.
+    """
+    try:
+        indices = [index for index, _ in shard]
+        worlds = [factory(seed) for _, seed in shard]
+        updates = [world.update for world in worlds]
+        tick = 0
+        while True:
+            ticks = conn.recv()
+            if ticks is None:
+                break
+            for _ in xrange(ticks):
+                for update in updates:
+                    update(step)
+            tick += ticks
+            conn.send(('ok', [_snapshot(world, index, tick)
+                              for index, world in zip(indices, worlds)]))
+    except Exception: #pylint:disable-msg=W0703
+        conn.send(('error', traceback.format_exc()))
+    finally:
+        conn.close()
+
+class SimulationRunner(object):
+    """
+    Worlds sharded across worker processes, stepped in lockstep.
+    
+    processes: number of workers.  Defaults to the number of CPUs,
+        and is never more than the number of seeds.
+    """
+    def __init__(self, factory, seeds, step=1 / 60.0, processes=None):
+        seeds = list(seeds)
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        processes = max(1, min(processes, len(seeds)))
+        self._count = len(seeds)
+        self._tick = 0
+        self._workers = []
+        for i in xrange(processes):
+            shard = [(index, seeds[index])
+                     for index in xrange(i, len(seeds), processes)]
+            parent, child = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=_shard_worker, args=(child, factory, shard, step))
+            worker.daemon = True
+            worker.start()
+            child.close()
+            self._workers.append((worker, parent))
+    
+    def step(self, ticks=1):
+        """
+        Advance every world by ticks steps, and return one Snapshot per
+        world, in seed order.  Raises RuntimeError if a worker failed,
+        or if the runner is closed.
+        """
+        if not self._workers:
+            raise RuntimeError("Simulation runner is closed.")
+        for _, conn in self._workers:
+            try:
+                conn.send(ticks)
+            except (IOError, OSError):
+                #The worker already failed; its error is read below
+                pass
+        snapshots = [None] * self._count
+        errors = []
+        for _, conn in self._workers:
+            try:
+                status, payload = conn.recv()
+            except EOFError:
+                status, payload = 'error', "Worker exited."
+            if status == 'ok':
+                for snapshot in payload:
+                    snapshots[snapshot.world] = snapshot
+            else:
+                errors.append(payload)
+        if errors:
+            self.close()
+            raise RuntimeError("Simulation worker failed:\n" +
+                               "\n".join(errors))
+        self._tick += ticks
+        return snapshots
+    
+    def close(self):
+        """
+        Stop every worker.  Safe to call more than once.
+        
+        Workers still running JOIN_TIMEOUT seconds after being told
+        to stop are terminated.
+        """
+        for worker, conn in self._workers:
+            try:
+                conn.send(None)
+            except (IOError, OSError):
+                pass
+            conn.close()
+        for worker, _ in self._workers:
+            worker.join(JOIN_TIMEOUT)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        self._workers = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def _get_tick(self):
+        """Number of steps every world has run"""
+        return self._tick
+    Tick = property(_get_tick)
+    
+    def __len__(self):
+        """Number of worlds"""
+        return self._count
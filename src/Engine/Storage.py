@@ -0,0 +1,302 @@
+"""
+Columnar entity storage, and systems that update it in bulk
+
+An EntityStore keeps each entity's position, velocity, timescale, flags
+and collider in parallel arrays, one row per entity.  Systems are
+functions system(store, dt) that update every matching row at once:
+    store = EntityStore()
+    ship = StoredEntity(store, x=5, y=5)
+    ship.velocity = (1.0, 0.0)
+    store.run(dt)  #move_system, then collider_system
+Rows come from the store's EntityRegistry, so a row is the slot index
+of the entity's handle, and freed rows are reused.
+
+StoredEntity is an Entity whose attributes live in the store, so code
+written against Entity (and its update phases) keeps working.  Plain
+Entity objects are unaffected.
+"""
+
+__all__ = ['EntityStore', 'StoredEntity', 'move_system', 'collider_system',
+           'ALIVE', 'ENABLED', 'VISIBLE', 'MOVED']
+
+import array
+
+import Collision.Shapes
+import Entity
+import Registry
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#Row flags
+ALIVE = 1
+ENABLED = 2
+VISIBLE = 4
+#Set when a row's position changes, cleared by collider_system
+MOVED = 8
+
+class EntityStore(object):
+    """
+    Parallel arrays of entity data, one row per entity.
+    
+    use_numpy: run systems on NumPy views of the arrays.
+        Defaults to True when NumPy is installed.
+    systems: the functions run, in order, by run(dt).
+        Defaults to [move_system, collider_system].
+    """
+    def __init__(self, use_numpy=None, systems=None):
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        elif use_numpy and numpy is None:
+            raise ImportError("NumPy is not installed; can't use NumPy views.")
+        self._use_numpy = use_numpy
+        self._registry = Registry.EntityRegistry()
+        self._x = array.array('d')
+        self._y = array.array('d')
+        self._vx = array.array('d')
+        self._vy = array.array('d')
+        self._timescale = array.array('d')
+        self._flags = array.array('B')
+        self._colliders = []
+        if systems is None:
+            systems = [move_system, collider_system]
+        self.systems = list(systems)
+    
+    def add(self, obj, x=0, y=0, timescale=1.0, flags=ALIVE|ENABLED|VISIBLE,
+            collider=None):
+        """Give obj a row, and return its handle"""
+        handle = self._registry.add(obj)
+        row = Registry.handle_index(handle)
+        if row == len(self._flags):
+            self._x.append(x)
+            self._y.append(y)
+            self._vx.append(0.0)
+            self._vy.append(0.0)
+            self._timescale.append(timescale)
+            self._flags.append(flags | ALIVE | MOVED)
+            self._colliders.append(collider)
+        else:
+            self._x[row], self._y[row] = x, y
+            self._vx[row] = self._vy[row] = 0.0
+            self._timescale[row] = timescale
+            self._flags[row] = flags | ALIVE | MOVED
+            self._colliders[row] = collider
+        return handle
+    
+    def remove(self, handle):
+        """
+        Free the row of handle.
+        
+        Returns the object removed, or None if the handle was stale.
+        """
+        obj = self._registry.remove(handle)
+        if obj is not None:
+            row = Registry.handle_index(handle)
+            self._flags[row] = 0
+            self._colliders[row] = None
+            if isinstance(obj, StoredEntity):
+                #The row can be reused now; don't let obj reach it
+                obj._store = _DETACHED #pylint:disable-msg=W0212
+        return obj
+    
+    def get(self, handle, default=None):
+        """Returns the object for handle, or default if the handle is stale"""
+        return self._registry.get(handle, default)
+    
+    def row(self, handle):
+        """Returns the row of handle, or -1 if the handle is stale"""
+        if handle not in self._registry:
+            return -1
+        return Registry.handle_index(handle)
+    
+    def rows(self, mask=ALIVE):
+        """Returns every row that has all the flags in mask set"""
+        return [row for row, flags in enumerate(self._flags)
+                if flags & mask == mask]
+    
+    def run(self, dt):
+        """Run every system, in order"""
+        for system in self.systems:
+            system(self, dt)
+    
+    def views(self, *names):
+        """
+        Returns NumPy views of the named columns
+        ('x', 'y', 'vx', 'vy', 'timescale', 'flags').
+        
+        Views share memory with the store, but become invalid
+        once a row is added.
+        """
+        if numpy is None:
+            raise ImportError("NumPy is not installed; can't use NumPy views.")
+        views = []
+        for name in names:
+            column = getattr(self, '_' + name)
+            dtype = numpy.uint8 if column.typecode == 'B' else numpy.float64
+            if len(column):
+                views.append(numpy.frombuffer(column, dtype=dtype))
+            else:
+                views.append(numpy.zeros(0, dtype=dtype))
+        return views
+    
+    def __len__(self):
+        """Number of live rows"""
+        return len(self._registry)
+    
+    def _get_capacity(self):
+        """Number of rows, used or free"""
+        return len(self._flags)
+    Capacity = property(_get_capacity)
+    
+    def _get_entity_registry(self):
+        """The EntityRegistry rows are handed out from"""
+        return self._registry
+    EntityRegistry = property(_get_entity_registry)
+    
+    def _get_uses_numpy(self):
+        """True if systems run on NumPy views"""
+        return self._use_numpy
+    UsesNumpy = property(_get_uses_numpy)
+
+def move_system(store, dt):
+    """Moves every enabled row by its velocity, scaled by its timescale"""
+    mask = ALIVE | ENABLED
+    if store.UsesNumpy:
+        xs, ys, vxs, vys, scales, flags = store.views(
+            'x', 'y', 'vx', 'vy', 'timescale', 'flags')
+        moving = ((flags & mask) == mask) & ((vxs != 0) | (vys != 0))
+        if not moving.any():
+            return
+        step = numpy.where(moving, scales * dt, 0.0)
+        xs += vxs * step
+        ys += vys * step
+        flags[moving] |= MOVED
+        return
+    
+    xs, ys, vxs, vys = store._x, store._y, store._vx, store._vy #pylint:disable-msg=W0212,C0301
+    scales, flags = store._timescale, store._flags #pylint:disable-msg=W0212
+    for row in xrange(len(flags)):
+        if flags[row] & mask == mask and (vxs[row] or vys[row]):
+            step = scales[row] * dt
+            xs[row] += vxs[row] * step
+            ys[row] += vys[row] * step
+            flags[row] |= MOVED
+
+def collider_system(store, dt): #pylint:disable-msg=W0613
+    """Centers the collider of every moved row on its position"""
+    xs, ys, colliders = store._x, store._y, store._colliders #pylint:disable-msg=W0212,C0301
+    Point = Collision.Shapes.Point #pylint:disable-msg=C0103
+    if store.UsesNumpy:
+        flags, = store.views('flags')
+        for row in numpy.flatnonzero(flags & MOVED):
+            collider = colliders[row]
+            if collider is not None:
+                collider.center_at(Point(xs[row], ys[row]))
+        flags &= ~MOVED & 0xff
+        return
+    
+    flags = store._flags #pylint:disable-msg=W0212
+    for row in xrange(len(flags)):
+        if flags[row] & MOVED:
+            collider = colliders[row]
+            if collider is not None:
+                collider.center_at(Point(xs[row], ys[row]))
+            flags[row] &= ~MOVED & 0xff
+
+def _flag_property(flag, doc):
+    """Property over one of this entity's row flags"""
+    def getter(self):
+        return bool(self._store._flags[self._row] & flag) #pylint:disable-msg=W0212,C0301
+    def setter(self, value):
+        flags = self._store._flags #pylint:disable-msg=W0212
+        if value:
+            flags[self._row] |= flag
+        else:
+            flags[self._row] &= ~flag & 0xff
+    return property(getter, setter, doc=doc)
+
+class _DetachedStore(object):
+    """Stands in for the store of a removed StoredEntity"""
+    def __getattr__(self, name):
+        raise ReferenceError("Entity was removed from its store.")
+
+_DETACHED = _DetachedStore()
+
+class StoredEntity(Entity.Entity):
+    """
+    Entity whose position, velocity, timescale, flags and collider
+    are kept in an EntityStore row.
+    
+    Takes the same kwargs as Entity, except registry; the store's
+    registry is used instead.
+    
+    Once the entity is destroyed (or removed from the store), its row
+    can be given to another entity, so reading or writing any stored
+    attribute raises ReferenceError.
+    """
+    def __init__(self, store, **kwargs):
+        self._store = store
+        handle = store.add(self)
+        self._row = Registry.handle_index(handle)
+        Entity.Entity.__init__(self, **kwargs)
+        #destroy() frees the row through store.remove
+        self._registry = store
+        self._handle = handle
+    
+    def destroy(self, source=None, as_cleanup=True):
+        """See Entity.destroy.  Destroying twice does nothing."""
+        if self._store is not _DETACHED:
+            Entity.Entity.destroy(self, source, as_cleanup)
+    
+    def _get_x(self):
+        """x of the entity's center"""
+        return self._store._x[self._row] #pylint:disable-msg=W0212
+    def _set_x(self, value):
+        """Move the entity's center to x"""
+        self._store._x[self._row] = value #pylint:disable-msg=W0212
+        self._store._flags[self._row] |= MOVED #pylint:disable-msg=W0212
+    _x = property(_get_x, _set_x)
+    
+    def _get_y(self):
+        """y of the entity's center"""
+        return self._store._y[self._row] #pylint:disable-msg=W0212
+    def _set_y(self, value):
+        """Move the entity's center to y"""
+        self._store._y[self._row] = value #pylint:disable-msg=W0212
+        self._store._flags[self._row] |= MOVED #pylint:disable-msg=W0212
+    _y = property(_get_y, _set_y)
+    
+    def _get_collider(self):
+        """The entity's collider, None if it has none"""
+        return self._store._colliders[self._row] #pylint:disable-msg=W0212
+    def _set_collider(self, value):
+        """Set the entity's collider"""
+        self._store._colliders[self._row] = value #pylint:disable-msg=W0212
+    _collider = property(_get_collider, _set_collider)
+    
+    def _get_stored_timescale(self):
+        """The entity's timescale"""
+        return self._store._timescale[self._row] #pylint:disable-msg=W0212
+    def _set_stored_timescale(self, value):
+        """Set the entity's timescale"""
+        self._store._timescale[self._row] = value #pylint:disable-msg=W0212
+    _timescale = property(_get_stored_timescale, _set_stored_timescale)
+    
+    _visible = _flag_property(VISIBLE, "True if the entity is drawn")
+    _enabled = _flag_property(ENABLED, "True if the entity is updating")
+    
+    def _get_velocity(self):
+        """The entity's (vx, vy), applied by move_system"""
+        return (self._store._vx[self._row], #pylint:disable-msg=W0212
+                self._store._vy[self._row]) #pylint:disable-msg=W0212
+    def _set_velocity(self, value):
+        """Set the entity's (vx, vy)"""
+        self._store._vx[self._row], self._store._vy[self._row] = value #pylint:disable-msg=W0212,C0301
+    velocity = property(_get_velocity, _set_velocity)
+    
+    def _get_row(self):
+        """The entity's row in its store"""
+        return self._row
+    row = property(_get_row)
@@ -0,0 +1,278 @@
+"""
+Update drivers for groups of entities
+
+EntityGroup.update(dt) does the same work as calling update(dt) on
+each of its entities, but a phase at a time: every entity's dt is
+scaled, then every entity runs _pre_update, then _update, then
+_post_update.  Each phase is timed in the group's Timers:
+    group = EntityGroup(entities)
+    group.update(dt)
+    group.Timers.stats("update").Mean
+
+FixedStepLoop drives anything with an update(dt) method at a fixed
+rate, no matter how long real frames take:
+    loop = FixedStepLoop(group, step=1 / 60.0, render=draw)
+    pyglet.clock.schedule(loop.tick)
+draw(alpha) gets how far (0 to 1) real time is between the last two
+simulation steps; group.positions(alpha) interpolates to it.
+Server and batch jobs can skip real time with loop.run_headless(ticks).
+"""
+
+__all__ = ['EntityGroup', 'FixedStepLoop', 'PHASES']
+
+import array
+
+import Entity
+import Util.Profiler
+import Util.Timers
+
+#Timer names, in the order the phases run
+PHASES = ("timescale", "pre_update", "update", "post_update")
+
+#How a group updates a class of entity (see _update_mode)
+_PHASED = 'phased'
+_PHASED_TIMESCALE = 'phased, own timescale'
+_CUSTOM = 'custom'
+
+#class -> update mode
+_PHASED_CLASSES = {}
+
+def _update_mode(cls):
+    """
+    Returns how a group should update entities of class cls, and caches it:
+           _PHASED      :: run Entity's phases, reading _timescale
+      _PHASED_TIMESCALE :: run Entity's phases, reading the overridden
+                           timescale property
+           _CUSTOM      :: cls overrides update(); call it
+    """
+    update = getattr(cls, 'update', None)
+    if getattr(update, 'im_func', None) is not Entity.Entity.update.im_func:
+        mode = _CUSTOM
+    elif getattr(cls, 'timescale', None) is Entity.Entity.timescale:
+        mode = _PHASED
+    else:
+        mode = _PHASED_TIMESCALE
+    _PHASED_CLASSES[cls] = mode
+    return mode
+
+class EntityGroup(object):
+    """
+    Entities that are updated together, one phase at a time.
+    
+    timers: TimerRegistry the phases are timed in.  A new one is made
+        when None.
+    """
+    def __init__(self, entities=None, timers=None):
+        self._entities = list(entities or [])
+        self._timers = Util.Timers.TimerRegistry() if timers is None else timers
+        #entity -> (x, y) at the last snapshot
+        self._snapshot = {}
+    
+    def add(self, entity):
+        """Add an entity to the end of the group"""
+        self._entities.append(entity)
+    
+    def remove(self, entity):
+        """Remove an entity from the group.  Raises ValueError if missing."""
+        self._entities.remove(entity)
+        self._snapshot.pop(entity, None)
+    
+    def clear(self):
+        """Remove every entity"""
+        del self._entities[:]
+        self._snapshot.clear()
+    
+    def update(self, dt):
+        """
+        Update every entity in the group.
+        
+        Same as calling entity.update(dt) on each one, except all
+        entities finish a phase before any start the next.  Entities
+        whose class overrides update() have it called instead, during
+        the update phase.
+        """
+        timers = self._timers
+        clock = Util.Profiler.clock
+        
+        start = clock()
+        entities = []
+        custom = []
+        phased_classes = _PHASED_CLASSES
+        add_phased, add_custom = entities.append, custom.append
+        for entity in self._entities:
+            mode = phased_classes.get(entity.__class__)
+            if mode is None:
+                mode = _update_mode(entity.__class__)
+            if mode is _PHASED:
+                #Entity's own timescale property, without the call
+                entity._dt = dt * entity._timescale #pylint:disable-msg=W0212
+                add_phased(entity)
+            elif mode is _PHASED_TIMESCALE:
+                entity._dt = dt * entity.timescale #pylint:disable-msg=W0212
+                add_phased(entity)
+            else:
+                add_custom(entity)
+        scaled = clock()
+        for entity in entities:
+            entity._pre_update() #pylint:disable-msg=W0212
+        pre_end = clock()
+        for entity in entities:
+            entity._update() #pylint:disable-msg=W0212
+        for entity in custom:
+            entity.update(dt)
+        update_end = clock()
+        for entity in entities:
+            entity._post_update() #pylint:disable-msg=W0212
+        end = clock()
+        
+        spans = zip(PHASES, (start, scaled, pre_end, update_end),
+                    (scaled, pre_end, update_end, end))
+        for name, phase_start, phase_end in spans:
+            timers.record(name, phase_start, phase_end)
+        if Util.Profiler.ENABLED:
+            record = Util.Profiler.PROFILER.record
+            args = {'entities': len(self._entities)}
+            for name, phase_start, phase_end in spans:
+                record("EntityGroup." + name, "group",
+                       phase_start, phase_end, args)
+    
+    def snapshot(self):
+        """Remember every entity's position, for positions(alpha)"""
+        self._snapshot = dict((entity, (entity._x, entity._y)) #pylint:disable-msg=W0212,C0301
+                              for entity in self._entities)
+    
+    def positions(self, alpha):
+        """
+        Returns an interleaved x, y array('d') of each entity's position,
+        alpha of the way from the last snapshot to now.
+        
+        Entities added since the snapshot are at their current position.
+        """
+        snapshot = self._snapshot
+        out = array.array('d', [0.0]) * (2 * len(self._entities))
+        for i, entity in enumerate(self._entities):
+            x, y = entity._x, entity._y #pylint:disable-msg=W0212
+            prev = snapshot.get(entity)
+            if prev is not None:
+                x = prev[0] + (x - prev[0]) * alpha
+                y = prev[1] + (y - prev[1]) * alpha
+            out[2 * i], out[2 * i + 1] = x, y
+        return out
+    
+    def __iter__(self):
+        """Iterates over the group's entities, in update order"""
+        return iter(self._entities)
+    
+    def __len__(self):
+        """Number of entities in the group"""
+        return len(self._entities)
+    
+    def __contains__(self, entity):
+        return entity in self._entities
+    
+    def _get_timers(self):
+        """TimerRegistry with a timer per phase (see PHASES)"""
+        return self._timers
+    Timers = property(_get_timers)
+
+class FixedStepLoop(object):
+    """
+    Runs a simulation in fixed size steps, and renders in between.
+    
+    target: object with an update(dt) method, such as an EntityGroup.
+        If it has a snapshot() method, that's called before each step.
+    step: seconds of simulation per update.
+    max_steps: most steps run by one tick.  Time past that is dropped
+        (see Dropped) so a slow frame can't snowball into slower ones.
+    render: called as render(alpha) after each tick.
+    clock: function returning the current time in seconds.
+    """
+    def __init__(self, target, step=1 / 60.0, max_steps=5, render=None,
+                 clock=None):
+        if step <= 0:
+            raise ValueError("Step {s} not recognized.".format(s=step))
+        self._update = target.update
+        self._snapshot = getattr(target, 'snapshot', None)
+        self._step = step
+        self._max_steps = max_steps
+        self._render = render
+        self._clock = Util.Timers.perf_counter if clock is None else clock
+        self._last = None
+        self._accumulator = 0.0
+        self._alpha = 0.0
+        self._ticks = 0
+        self._dropped = 0.0
+    
+    def tick(self, elapsed=None):
+        """
+        Advance by elapsed seconds of real time, and return the number
+        of steps run.
+        
+        Leaving elapsed blank measures the time since the last tick.
+        Matches pyglet.clock.schedule's callback signature.
+        """
+        now = self._clock()
+        if elapsed is None:
+            elapsed = 0.0 if self._last is None else now - self._last
+        self._last = now
+        
+        step = self._step
+        self._accumulator += elapsed
+        steps = int(self._accumulator // step)
+        if steps > self._max_steps:
+            self._dropped += (steps - self._max_steps) * step
+            self._accumulator -= (steps - self._max_steps) * step
+            steps = self._max_steps
+        self._run_steps(steps)
+        self._accumulator -= steps * step
+        
+        self._alpha = self._accumulator / step
+        if self._render is not None:
+            self._render(self._alpha)
+        return steps
+    
+    def run_headless(self, ticks, until=None):
+        """
+        Run ticks steps back to back, ignoring real time and skipping
+        render.  Returns the number of steps run.
+        
+        until: optional function; checked after each step, and
+            stops the run when it returns True.
+        """
+        if until is None:
+            self._run_steps(ticks)
+            return ticks
+        for i in xrange(ticks):
+            self._run_steps(1)
+            if until():
+                return i + 1
+        return ticks
+    
+    def _run_steps(self, steps):
+        """Run steps updates of one step each"""
+        update, snapshot, step = self._update, self._snapshot, self._step
+        for _ in xrange(steps):
+            if snapshot is not None:
+                snapshot()
+            update(step)
+        self._ticks += steps
+    
+    def _get_alpha(self):
+        """How far (0 to 1) the last tick got into the next step"""
+        return self._alpha
+    Alpha = property(_get_alpha)
+    
+    def _get_step(self):
+        """Seconds of simulation per update"""
+        return self._step
+    Step = property(_get_step)
+    
+    def _get_ticks(self):
+        """Number of steps run"""
+        return self._ticks
+    Ticks = property(_get_ticks)
+    
+    def _get_dropped(self):
+        """Seconds of real time dropped by the max_steps cap"""
+        return self._dropped
+    Dropped = property(_get_dropped)
@@ -7,5 +7,6 @@ point to the id pool, so there are not id collisions.
 
 import Events
 import ID
+import Registry
 import Settings
 import Util
@@ -30,6 +30,39 @@ class EventArgsTest(unittest.TestCase):
         Event2 = Events.EventArgs()
         self.assertEqual(Event1.eid, Event2.eid)
         
+    def test_arg_without_id(self):
+        Event1 = Events.EventArgs(with_id=False)
+        Event2 = Events.EventArgs(with_id=False)
+        self.assertEqual(Event1, Event1)
+        self.assertNotEqual(Event1, Event2)
+        self.assertTrue(Event1._eid is None)
+        
+        #An id is allocated when it's needed
+        self.assertNotEqual(Event1.eid, None)
+        self.assertTrue(Event1.eid is Event1.eid)
+        
+        #Custom ids are kept
+        Event3 = Events.EventArgs(custom_id= -100, with_id=False)
+        self.assertEqual(Event3, Events.EventArgs(custom_id= -100))
+        
+        with self.assertRaises(AttributeError):
+            Event1.extra = 1
+    
+    def test_args_pool(self):
+        pool = Events.EventArgsPool(max_size=1)
+        Event1 = pool.acquire()
+        Event2 = pool.acquire()
+        eid = Event1.eid
+        pool.release(Event1)
+        pool.release(Event2)
+        self.assertEqual(len(pool), 1)
+        
+        #Recycled args get a new id
+        recycled = pool.acquire()
+        self.assertTrue(recycled is Event1)
+        self.assertFalse(recycled.eid is eid)
+        self.assertEqual(len(pool), 0)
+        
 class EventHandlerTest(unittest.TestCase):
     def test_constructor(self):
         a = Events.EventHandler()
@@ -158,11 +191,193 @@ class EventHandlerTest(unittest.TestCase):
         actual = a.Listeners
         self.assertListEqual(actual, expected)
         
+class WeakListenerTest(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        class Listener(object):
+            def __init__(self):
+                self.calls = 0
+            def on_event(self, sender, eventargs):
+                self.calls += 1
+        self.Listener = Listener
+    
+    def test_bound_methods_are_weak(self):
+        a = Events.EventHandler()
+        obj = self.Listener()
+        a += obj.on_event
+        
+        #Same bound method isn't added twice
+        a += obj.on_event
+        a.invoke()
+        self.assertEqual(obj.calls, 1)
+        self.assertEqual(a.Listeners, [obj.on_event])
+        
+        a -= obj.on_event
+        self.assertEqual(a.Listeners, [])
+        
+        #Collected objects stop listening
+        a += obj.on_event
+        del obj
+        self.assertEqual(a.Listeners, [])
+        self.assertEqual(len(a._listeners), 0)
+        a.invoke()
+    
+    def test_functions(self):
+        calls = []
+        a = Events.EventHandler()
+        
+        #Functions are strong by default
+        a += lambda sender, eventargs: calls.append(1)
+        a.invoke()
+        self.assertEqual(calls, [1])
+        
+        #Unless they're added weakly
+        def listener(sender, eventargs):
+            calls.append(2)
+        a.add_listener(listener, weak=True)
+        a.invoke()
+        self.assertEqual(calls, [1, 1, 2])
+        del listener
+        a.invoke()
+        self.assertEqual(calls, [1, 1, 2, 1])
+        
+        #Methods can be held strongly
+        a.add_listener(self.Listener().on_event, weak=False)
+        self.assertEqual(len(a.Listeners), 2)
+    
+    def test_changes_during_invoke(self):
+        calls = []
+        a = Events.EventHandler()
+        def second(sender, eventargs):
+            calls.append(2)
+        def first(sender, eventargs):
+            calls.append(1)
+            a.remove_listener(first)
+            a.add_listener(second)
+        a += first
+        
+        #Changes take effect on the next invoke
+        a.invoke()
+        self.assertEqual(calls, [1])
+        a.invoke()
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(a.Listeners, [second])
+
+class EventQueueTest(unittest.TestCase):
+    def test_dispatch_and_coalesce(self):
+        calls = []
+        damage = Events.EventHandler()
+        collide = Events.EventHandler()
+        damage += lambda sender, eventargs: calls.append(('damage', sender))
+        collide += lambda sender, eventargs: calls.append(('collide', sender))
+        
+        queue = Events.EventQueue()
+        queue.post(damage, 'a', key='a')
+        queue.post(collide, 'x')
+        queue.post(damage, 'b')
+        #Replaces the first damage event, keeping its place
+        queue.post(damage, 'c', key='a')
+        self.assertEqual(len(queue), 3)
+        self.assertEqual(calls, [])
+        
+        self.assertEqual(queue.dispatch(), 3)
+        self.assertEqual(calls, [('damage', 'c'), ('damage', 'b'),
+                                 ('collide', 'x')])
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(queue.dispatch(), 0)
+    
+    def test_post_during_dispatch(self):
+        queue = Events.EventQueue()
+        calls = []
+        handler = Events.EventHandler()
+        def listener(sender, eventargs):
+            calls.append(sender)
+            if sender < 2:
+                queue.post(handler, sender + 1)
+        handler += listener
+        
+        queue.post(handler, 0)
+        queue.dispatch()
+        self.assertEqual(calls, [0])
+        queue.dispatch()
+        self.assertEqual(calls, [0, 1])
+    
+    def test_batch_listeners(self):
+        batches = []
+        handler = Events.EventHandler()
+        def batch_listener(senders, eventargs_list):
+            batches.append((senders, eventargs_list))
+        handler.add_batch_listener(batch_listener)
+        
+        args = [Events.EventArgs(), Events.EventArgs()]
+        queue = Events.EventQueue()
+        queue.post(handler, 'a', args[0])
+        queue.post(handler, 'b', args[1])
+        queue.dispatch()
+        self.assertEqual(batches, [(['a', 'b'], args)])
+        
+        #Direct invokes are batches of one
+        handler.invoke('c', args[0])
+        self.assertEqual(batches[1], (['c'], [args[0]]))
+        
+        handler.remove_batch_listener(batch_listener)
+        handler.invoke('d')
+        self.assertEqual(len(batches), 2)
+
+class AsyncEventTest(unittest.TestCase):
+    def test_invoke_async(self):
+        import multiprocessing
+        import time
+        def slow(sender, eventargs):
+            time.sleep(0.2)
+            return sender
+        def stuck(sender, eventargs):
+            time.sleep(1.0)
+        def broken(sender, eventargs):
+            raise ArithmeticError
+        
+        a = Events.EventHandler()
+        a += [slow, lambda sender, eventargs: slow(sender + 1, eventargs)]
+        start = time.time()
+        self.assertEqual(a.invoke_async(1), [1, 2])
+        #Listeners ran concurrently
+        self.assertTrue(time.time() - start < 0.35)
+        
+        a += [stuck, broken]
+        outcomes = a.invoke_async(1, timeout=0.5)
+        self.assertEqual(outcomes[:2], [1, 2])
+        self.assertTrue(isinstance(outcomes[2], multiprocessing.TimeoutError))
+        self.assertTrue(isinstance(outcomes[3], ArithmeticError))
+    
+    def test_post_from_threads(self):
+        import threading
+        calls = []
+        handler = Events.EventHandler()
+        handler += lambda sender, eventargs: calls.append(sender)
+        queue = Events.EventQueue()
+        
+        def post_many(offset):
+            for i in xrange(500):
+                queue.post(handler, offset + i)
+        threads = [threading.Thread(target=post_many, args=(i * 1000,))
+                   for i in xrange(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(queue.dispatch(), 2000)
+        self.assertEqual(sorted(calls), sorted(i * 1000 + j for i in xrange(4)
+                                               for j in xrange(500)))
+
 def suite():
     test_suite = unittest.TestSuite()
     suite1 = unittest.makeSuite(EventArgsTest)
     suite2 = unittest.makeSuite(EventHandlerTest)
-    test_suite.addTests([suite1, suite2])
+    suite3 = unittest.makeSuite(WeakListenerTest)
+    suite4 = unittest.makeSuite(EventQueueTest)
+    suite5 = unittest.makeSuite(AsyncEventTest)
+    test_suite.addTests([suite1, suite2, suite3, suite4, suite5])
     return test_suite
     
 def load_tests():
@@ -27,96 +27,85 @@ class IDTest(unittest.TestCase):
                     
             
         self.mk_obj = mk_obj
-        self.id_fmt_int = "None:Test.test_engine.test_id.o_int:{}"
-        self.id_fmt_str = "None:Test.test_engine.test_id.o_str:{}"
         
     def test_id_manager_instanced_version(self):
         #Make a new manager
         id_manager = ID.id_manager()
         
-        #Make some int objects
+        #Ids are ints from one counter, whatever the class
         int_objs = []
         for i in range(10):
             int_objs.append(self.mk_obj(id_manager, self.o_int))
-        
-        #Make a str object
         str_obj = self.mk_obj(id_manager, self.o_str)
         
         for i in range(10):
-            expected = self.id_fmt_int.format(i)
-            actual = int_objs[i]._id
-            self.assertEqual(actual, expected)
-        
-        actual = str_obj._id
-        expected = self.id_fmt_str.format(0)
-        self.assertEqual(actual, expected)
+            self.assertEqual(int_objs[i]._id, i)
+        self.assertEqual(str_obj._id, 10)
         
-        #Add another int
-        int_objs.append(self.mk_obj(id_manager, self.o_int))
-        actual = int_objs[-1]._id
-        expected = self.id_fmt_int.format(10)
-        self.assertEqual(actual, expected)
+        #The readable form is built on demand
+        name = id_manager.format_id(str_obj._id, self.o_str)
+        self.assertTrue(name.startswith("None:"))
+        self.assertTrue(name.endswith("o_str:10"))
         
     def test_id_manager_global_version(self):
         #Do a reset
         id_manager = ID.GLOBAL_ID_MANAGER
         id_manager.reset()
         
-        #Global id strings
-        g_int_fmt = "GLOBAL:Test.test_engine.test_id.o_int:{}"
-        g_str_fmt = "GLOBAL:Test.test_engine.test_id.o_str:{}"
-        
-        #Make some int objects
         int_objs = []
         for i in range(10):
             int_objs.append(self.mk_obj(id_manager, self.o_int))
-        
-        #Make a str object
-        str_obj = self.mk_obj(id_manager, self.o_str)
-        
         for i in range(10):
-            expected = g_int_fmt.format(i)
-            actual = int_objs[i]._id
-            self.assertEqual(actual, expected)
-        
-        actual = str_obj._id
-        expected = g_str_fmt.format(0)
-        self.assertEqual(actual, expected)
-        
-        #Add another int
-        int_objs.append(self.mk_obj(id_manager, self.o_int))
-        actual = int_objs[-1]._id
-        expected = g_int_fmt.format(10)
-        self.assertEqual(actual, expected)
+            self.assertEqual(int_objs[i]._id, i)
         
         #Test a reset and do it one more time
         id_manager.reset()
-        
-        #Make some int objects
-        int_objs = []
-        for i in range(10):
-            int_objs.append(self.mk_obj(id_manager, self.o_int))
-        
-        #Make a str object
         str_obj = self.mk_obj(id_manager, self.o_str)
+        self.assertEqual(str_obj._id, 0)
         
-        for i in range(10):
-            expected = g_int_fmt.format(i)
-            actual = int_objs[i]._id
-            self.assertEqual(actual, expected)
-        
-        actual = str_obj._id
-        expected = g_str_fmt.format(0)
-        self.assertEqual(actual, expected)
+        #Clear out the global again
+        id_manager.reset()
+    
+    def test_class_ranges(self):
+        id_manager = ID.id_manager("Ranged", {self.o_str: (1000, 1002)})
         
-        #Add another int
-        int_objs.append(self.mk_obj(id_manager, self.o_int))
-        actual = int_objs[-1]._id
-        expected = g_int_fmt.format(10)
-        self.assertEqual(actual, expected)
+        self.assertEqual(self.mk_obj(id_manager, self.o_str)._id, 1000)
+        self.assertEqual(self.mk_obj(id_manager, self.o_int)._id, 0)
+        self.assertEqual(self.mk_obj(id_manager, self.o_str)._id, 1001)
+        with self.assertRaises(OverflowError):
+            self.mk_obj(id_manager, self.o_str)
         
-        #Clear out the global again
+        #Reset restarts ranges too
         id_manager.reset()
+        self.assertEqual(self.mk_obj(id_manager, self.o_str)._id, 1000)
+    
+    def test_shared_counter_skips_ranges(self):
+        id_manager = ID.id_manager("Skipping", {self.o_str: (2, 4),
+                                                self.o_other: (5, 7)})
+        ids = [self.mk_obj(id_manager, self.o_int)._id for _ in range(4)]
+        self.assertEqual(ids, [0, 1, 4, 7])
+    
+    def test_bad_ranges(self):
+        with self.assertRaises(ValueError):
+            ID.id_manager("Overlap", {self.o_str: (0, 5),
+                                      self.o_other: (3, 8)})
+        with self.assertRaises(ValueError):
+            ID.id_manager("Backwards", {self.o_str: (5, 0)})
+    
+    def test_id_name(self):
+        id_manager = ID.id_manager("Named")
+        obj = self.o_int()
+        an_id = ID.ID(obj, id_manager)
+        self.assertEqual(an_id.Value, 0)
+        self.assertTrue(an_id.Name.startswith("Named:"))
+        self.assertTrue(an_id.Name.endswith("o_int:0"))
+        self.assertEqual(str(an_id), an_id.Name)
+        
+        #Ids are equal by value and manager
+        other = ID.ID(obj, ID.id_manager("Named"))
+        self.assertEqual(other.Value, 0)
+        self.assertNotEqual(an_id, other)
+        self.assertEqual(len(set([an_id, an_id, other])), 2)
     
     def test_id(self):
         a = ID.ID(custom_value = -100)
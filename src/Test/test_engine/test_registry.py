@@ -0,0 +1,80 @@
+import unittest
+import Engine.Entity as Entity
+import Engine.Registry as Registry
+
+class EntityRegistryTest(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.registry = Registry.EntityRegistry()
+    
+    def test_add_get(self):
+        objs = [object() for _ in xrange(5)]
+        handles = [self.registry.add(obj) for obj in objs]
+        
+        self.assertEqual(len(self.registry), 5)
+        for obj, handle in zip(objs, handles):
+            self.assertTrue(self.registry.get(handle) is obj)
+            self.assertTrue(handle in self.registry)
+        self.assertEqual(list(self.registry), objs)
+        self.assertEqual(self.registry.handles(), handles)
+        
+        #Unknown handles
+        self.assertEqual(self.registry.get(Registry.NULL_HANDLE), None)
+        self.assertEqual(self.registry.get(1000, "missing"), "missing")
+        self.assertFalse(Registry.NULL_HANDLE in self.registry)
+        
+    def test_stale_handles(self):
+        first = object()
+        handle = self.registry.add(first)
+        self.assertTrue(self.registry.remove(handle) is first)
+        self.assertEqual(len(self.registry), 0)
+        
+        #Removing twice does nothing
+        self.assertEqual(self.registry.remove(handle), None)
+        
+        #The slot is reused, but the old handle doesn't see the new object
+        second = object()
+        new_handle = self.registry.add(second)
+        self.assertEqual(Registry.handle_index(new_handle),
+                         Registry.handle_index(handle))
+        self.assertEqual(Registry.handle_generation(new_handle),
+                         Registry.handle_generation(handle) + 1)
+        self.assertEqual(self.registry.get(handle), None)
+        self.assertTrue(self.registry.get(new_handle) is second)
+        
+    def test_churn_keeps_capacity(self):
+        live = [self.registry.add(object()) for _ in xrange(10)]
+        for _ in xrange(100):
+            self.registry.remove(live.pop(0))
+            live.append(self.registry.add(object()))
+        self.assertEqual(len(self.registry), 10)
+        self.assertEqual(self.registry.Capacity, 10)
+        
+        handles = list(live)
+        self.registry.clear()
+        self.assertEqual(len(self.registry), 0)
+        for handle in handles:
+            self.assertFalse(handle in self.registry)
+        self.registry.add(object())
+        self.assertEqual(self.registry.Capacity, 10)
+    
+    def test_entity_destroy(self):
+        entity = Entity.Entity(registry=self.registry)
+        handle = entity.handle
+        self.assertTrue(self.registry.get(handle) is entity)
+        
+        entity.destroy()
+        self.assertEqual(entity.handle, Registry.NULL_HANDLE)
+        self.assertEqual(self.registry.get(handle), None)
+        
+        #Entities without a registry don't get a handle
+        self.assertEqual(Entity.Entity().handle, Registry.NULL_HANDLE)
+
+def suite():
+    test_suite = unittest.TestSuite()
+    suite1 = unittest.makeSuite(EntityRegistryTest)
+    test_suite.addTests([suite1])
+    return test_suite
+    
+def load_tests():
+    return suite()
@@ -182,6 +182,61 @@ class SettingTest(unittest.TestCase):
         actual = setting.current_index
         self.assertEqual(actual, expected)
     
+    def test_option_lookup_with_duplicates(self):
+        options = ["Yellow", "Red", "Yellow", "Blue"]
+        setting = Settings.Setting(name="MySetting", options=options)
+        
+        #Selecting by value picks the first occurrence
+        setting.current_option = "Blue"
+        self.assertEqual(setting.current_index, 3)
+        setting.default_option = "Yellow"
+        self.assertEqual(setting.default_index, 0)
+        
+        #Removing the first "Yellow" shifts the rest down
+        setting.remove_option("Yellow")
+        self.assertListEqual(setting.options, ["Red", "Yellow", "Blue"])
+        setting.current_option = "Yellow"
+        self.assertEqual(setting.current_index, 1)
+        setting.current_option = "Blue"
+        self.assertEqual(setting.current_index, 2)
+        
+        setting.add_option("Green")
+        setting.current_option = "Green"
+        self.assertEqual(setting.current_index, 3)
+        
+        setting.remove_option("Red")
+        setting.remove_option("Yellow")
+        with self.assertRaises(KeyError):
+            setting.current_option = "Yellow"
+    
+    def test_list_options(self):
+        options = [[800, 600], [1024, 768], (1024, 768)]
+        setting = Settings.Setting(name="Resolution", options=options)
+        setting.current_option = [1024, 768]
+        self.assertEqual(setting.current_index, 1)
+        setting.current_option = (1024, 768)
+        self.assertEqual(setting.current_index, 2)
+        setting.remove_option([800, 600])
+        self.assertEqual(setting.options, [[1024, 768], (1024, 768)])
+        
+        #Unhashable options that aren't lists are scanned for
+        setting.add_option({'w': 640})
+        setting.default_option = {'w': 640}
+        self.assertEqual(setting.default_index, 2)
+        with self.assertRaises(KeyError):
+            setting.current_option = [1, 2]
+        
+        #Round trip through a config
+        config = ConfigParser.ConfigParser()
+        setting = Settings.Setting(name="Resolution", options=options[:2],
+                                   default_index=0, current_index=1)
+        setting.save(config)
+        loaded = Settings.Setting()
+        loaded.load(config, "Resolution")
+        self.assertEqual(loaded.options, [['800', '600'], ['1024', '768']])
+        self.assertEqual(loaded.current_option, ['1024', '768'])
+        self.assertEqual(loaded.default_index, 0)
+    
     def test_load_using_config_parser(self):
         config = ConfigParser.ConfigParser()
         name = "Color"
@@ -205,6 +260,23 @@ class SettingTest(unittest.TestCase):
         self.assertEqual(data['current_option'], a_setting.current_option)
         self.assertEqual(options_lst, a_setting.options)
     
+    def test_load_legacy_file(self):
+        import StringIO
+        legacy = StringIO.StringIO(
+            "[Display]\n"
+            "description = Window mode\n"
+            "default_option = Full (native)\n"
+            "current_option = Windowed\n"
+            "options = [Windowed,Full (native)]\n")
+        config = ConfigParser.ConfigParser()
+        config.readfp(legacy)
+        
+        a_setting = Settings.Setting()
+        a_setting.load(config, "Display")
+        self.assertEqual(a_setting.options, ["Windowed", "Full (native)"])
+        self.assertEqual(a_setting.default_option, "Full (native)")
+        self.assertEqual(a_setting.current_option, "Windowed")
+    
     def test_save_using_config_parser(self):
         config = ConfigParser.ConfigParser()
         
@@ -432,11 +504,110 @@ class SettingsTest(unittest.TestCase):
         with self.assertRaises(KeyError):
             self.settings.remove_option("This_Key_Isnt_Real", "a monkey")
 
+class LazySettingsTest(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.filename = "test_lazy_settings.ini"
+        settings = Settings.Settings(self.filename)
+        for name in ["Color", "Food"]:
+            settings[name] = Settings.Setting(name=name, description=name,
+                                              default_index=0,
+                                              current_index=0,
+                                              options=["a", "b", "c"])
+        self.assertTrue(settings.save())
+    
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        import os
+        for filename in [self.filename, self.filename + ".tmp"]:
+            if os.path.exists(filename):
+                os.remove(filename)
+    
+    def test_lazy_load(self):
+        settings = Settings.Settings(self.filename)
+        settings.load()
+        self.assertEqual(len(settings), 2)
+        self.assertEqual(settings.dict, {})
+        self.assertTrue(settings.has_setting("Food"))
+        
+        self.assertEqual(settings["Food"].current_option, "a")
+        self.assertEqual(settings.dict.keys(), ["Food"])
+        self.assertEqual(len(settings.settings), 2)
+    
+    def test_dirty_save(self):
+        settings = Settings.Settings(self.filename)
+        settings.load()
+        
+        #Nothing changed- nothing written
+        self.assertFalse(settings.dirty)
+        self.assertFalse(settings.save())
+        
+        #Only the changed setting is parsed
+        settings["Color"].current_option = "c"
+        self.assertTrue(settings.dirty)
+        self.assertTrue(settings.save())
+        self.assertFalse(settings.dirty)
+        self.assertEqual(settings.dict.keys(), ["Color"])
+        
+        settings.remove_setting("Food")
+        self.assertTrue(settings.save())
+        
+        reloaded = Settings.Settings(self.filename)
+        reloaded.load()
+        self.assertEqual(len(reloaded), 1)
+        self.assertEqual(reloaded["Color"].current_option, "c")
+    
+    def test_load_two_files(self):
+        import os
+        other = "test_lazy_settings_other.ini"
+        self.addCleanup(os.remove, other)
+        settings = Settings.Settings(other)
+        settings["Drink"] = Settings.Setting(name="Drink", description="Drink",
+                                             options=["tea", "water"])
+        settings["Color"] = Settings.Setting(name="Color", description="Color",
+                                             options=["red"])
+        self.assertTrue(settings.save())
+        
+        settings = Settings.Settings()
+        settings.load(self.filename)
+        settings.load(other)
+        self.assertEqual(len(settings), 3)
+        self.assertEqual(settings["Food"].current_option, "a")
+        self.assertEqual(settings["Drink"].current_option, "tea")
+        #The later file wins
+        self.assertEqual(settings["Color"].options, ["red"])
+        
+        #Every section is saved
+        settings["Drink"].current_option = "water"
+        merged = "test_lazy_settings_merged.ini"
+        self.addCleanup(os.remove, merged)
+        self.assertTrue(settings.save(merged))
+        reloaded = Settings.Settings(merged)
+        reloaded.load()
+        self.assertEqual(sorted(setting.name for setting in reloaded.settings),
+                         ["Color", "Drink", "Food"])
+        self.assertEqual(reloaded["Drink"].current_option, "water")
+    
+    def test_unchanged_reload(self):
+        settings = Settings.Settings(self.filename)
+        settings.load()
+        color = settings["Color"]
+        
+        #Same file, nothing changed- the loaded settings are kept
+        settings.load()
+        self.assertTrue(settings["Color"] is color)
+        
+        #Changed settings are reloaded from file
+        color.current_option = "b"
+        settings.load()
+        self.assertEqual(settings["Color"].current_option, "a")
+
 def suite():
     test_suite = unittest.TestSuite()
     suite1 = unittest.makeSuite(SettingTest)
     suite2 = unittest.makeSuite(SettingsTest)
-    test_suite.addTests([suite1, suite2])
+    suite3 = unittest.makeSuite(LazySettingsTest)
+    test_suite.addTests([suite1, suite2, suite3])
     return test_suite
     
 def load_tests():
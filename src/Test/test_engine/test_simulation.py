@@ -0,0 +1,105 @@
+import time
+import unittest
+import Engine.Entity as Entity
+import Engine.Simulation as Simulation
+import Engine.World as World
+
+class Walker(Entity.Entity):
+    """Walks right at a speed picked by its world's seed"""
+    def __init__(self, speed, events, **kwargs):
+        Entity.Entity.__init__(self, **kwargs)
+        self.speed = speed
+        self.events = events
+        self.crossed = False
+    
+    def _update(self):
+        self._x += self.speed * self._dt
+        if self._x >= 10 and not self.crossed:
+            self.crossed = True
+            self.events.append(1)
+
+class Match(World.EntityGroup):
+    def __init__(self, seed):
+        World.EntityGroup.__init__(self)
+        self.events = []
+        self.add(Walker(seed, self.events, y=seed))
+    
+    def drain_events(self):
+        events, self.events[:] = list(self.events), []
+        return events
+
+def make_match(seed):
+    if seed < 0:
+        raise ValueError("Seed {s} not recognized.".format(s=seed))
+    return Match(seed)
+
+class SlowMatch(Match):
+    def update(self, dt):
+        time.sleep(60)
+
+def make_slow_match(seed):
+    return SlowMatch(seed)
+
+class SimulationTest(unittest.TestCase):
+    def test_snapshot_packing(self):
+        match = Match(3)
+        match.update(4.0)
+        snapshot = Simulation._snapshot(match, 7, 1)
+        self.assertEqual((snapshot.world, snapshot.tick), (7, 1))
+        self.assertEqual(list(snapshot.xy), [12.0, 3.0])
+        self.assertEqual(list(snapshot.event_ids), [1])
+        self.assertTrue(isinstance(snapshot.positions, str))
+        
+    def test_run_independent(self):
+        results = Simulation.run_independent(make_match, [1, 2, 3], ticks=5,
+                                             step=1.0, every=2, processes=2)
+        self.assertEqual(len(results), 3)
+        for seed, snapshots in zip([1, 2, 3], results):
+            self.assertEqual([s.tick for s in snapshots], [2, 4, 5])
+            self.assertEqual(list(snapshots[-1].xy), [5.0 * seed, seed])
+        #Seed 2 and 3 crossed x=10 by the last tick
+        self.assertEqual(list(results[2][-1].event_ids), [])
+        self.assertEqual(list(results[2][1].event_ids), [1])
+        
+    def test_lockstep(self):
+        with Simulation.SimulationRunner(make_match, [1, 2, 3, 4], step=1.0,
+                                         processes=3) as runner:
+            self.assertEqual(len(runner), 4)
+            snapshots = runner.step(2)
+            self.assertEqual([s.world for s in snapshots], [0, 1, 2, 3])
+            self.assertEqual([s.xy[0] for s in snapshots], [2, 4, 6, 8])
+            snapshots = runner.step()
+            self.assertEqual([s.tick for s in snapshots], [3] * 4)
+            self.assertEqual(runner.Tick, 3)
+    
+    def test_worker_errors(self):
+        runner = Simulation.SimulationRunner(make_match, [1, -1], processes=2)
+        with self.assertRaises(RuntimeError):
+            runner.step()
+        runner.close()
+        
+        #Closed runners don't step
+        with self.assertRaises(RuntimeError):
+            runner.step()
+    
+    def test_close_terminates_hung_workers(self):
+        runner = Simulation.SimulationRunner(make_slow_match, [1],
+                                             processes=1)
+        old_timeout = Simulation.JOIN_TIMEOUT
+        Simulation.JOIN_TIMEOUT = 0.1
+        try:
+            worker, conn = runner._workers[0]
+            conn.send(1)
+            runner.close()
+        finally:
+            Simulation.JOIN_TIMEOUT = old_timeout
+        self.assertFalse(worker.is_alive())
+
+def suite():
+    test_suite = unittest.TestSuite()
+    suite1 = unittest.makeSuite(SimulationTest)
+    test_suite.addTests([suite1])
+    return test_suite
+    
+def load_tests():
+    return suite()
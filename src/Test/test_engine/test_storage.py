@@ -0,0 +1,108 @@
+import unittest
+import Collision.Shapes as Shapes
+import Engine.Registry as Registry
+import Engine.Storage as Storage
+
+class EntityStoreTest(unittest.TestCase):
+    use_numpy = False
+    
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.store = Storage.EntityStore(use_numpy=self.use_numpy)
+    
+    def test_facade(self):
+        entity = Storage.StoredEntity(self.store, x=3, y=4, timescale=2.0,
+                                      visible=False)
+        row = entity.row
+        self.assertEqual((self.store._x[row], self.store._y[row]), (3, 4))
+        self.assertEqual(entity.timescale, 2.0)
+        self.assertFalse(entity._visible)
+        self.assertTrue(entity._enabled)
+        self.assertEqual(entity.get_center().x, 3)
+        self.assertTrue(self.store.get(entity.handle) is entity)
+        
+        #Writes go to the store
+        entity.timescale = 0.5
+        entity._enabled = False
+        self.assertEqual(self.store._timescale[row], 0.5)
+        self.assertEqual(self.store.rows(Storage.ENABLED), [])
+        
+        #Entity.update still runs on a stored entity
+        entity.update(1.0)
+        self.assertEqual(entity._dt, 0.5)
+    
+    def test_move_system(self):
+        fast = Storage.StoredEntity(self.store, x=0, y=0, timescale=2.0)
+        still = Storage.StoredEntity(self.store, x=1, y=1)
+        off = Storage.StoredEntity(self.store, enabled=False)
+        fast.velocity = (1.0, -1.0)
+        off.velocity = (5.0, 5.0)
+        
+        Storage.move_system(self.store, 0.5)
+        self.assertEqual((fast._x, fast._y), (1.0, -1.0))
+        self.assertEqual((still._x, still._y), (1, 1))
+        self.assertEqual((off._x, off._y), (0, 0))
+        
+    def test_collider_system(self):
+        collider = Shapes.Point(0, 0)
+        entity = Storage.StoredEntity(self.store, x=2, y=3, collider=collider)
+        entity.velocity = (1.0, 0.0)
+        
+        self.store.run(1.0)
+        self.assertEqual((collider.x, collider.y), (3.0, 3.0))
+        self.assertEqual(self.store.rows(Storage.MOVED), [])
+        
+        #Unmoved rows are left alone
+        collider.x = 100
+        entity.velocity = (0.0, 0.0)
+        self.store.run(1.0)
+        self.assertEqual(collider.x, 100)
+    
+    def test_destroy_recycles_row(self):
+        first = Storage.StoredEntity(self.store, x=9)
+        handle = first.handle
+        first.destroy()
+        self.assertEqual(len(self.store), 0)
+        self.assertEqual(self.store.row(handle), -1)
+        self.assertEqual(first.handle, Registry.NULL_HANDLE)
+        
+        second = Storage.StoredEntity(self.store)
+        self.assertEqual(second.row, first.row)
+        self.assertEqual(second._x, 0)
+        self.assertEqual(self.store.Capacity, 1)
+        self.assertEqual(self.store.get(handle), None)
+    
+    def test_use_after_destroy(self):
+        first = Storage.StoredEntity(self.store, x=1)
+        first.destroy()
+        second = Storage.StoredEntity(self.store, x=2)
+        self.assertEqual(second.row, first.row)
+        
+        #The old facade can't see or move the new entity
+        with self.assertRaises(ReferenceError):
+            first._x
+        with self.assertRaises(ReferenceError):
+            first._x = 5
+        with self.assertRaises(ReferenceError):
+            first.velocity = (1.0, 1.0)
+        self.assertEqual(second._x, 2)
+        first.destroy()
+        
+        #Removing through the store detaches it too
+        self.store.remove(second.handle)
+        with self.assertRaises(ReferenceError):
+            second.timescale
+
+@unittest.skipIf(Storage.numpy is None, "NumPy is not installed")
+class EntityStoreNumpyTest(EntityStoreTest):
+    use_numpy = True
+
+def suite():
+    test_suite = unittest.TestSuite()
+    suite1 = unittest.makeSuite(EntityStoreTest)
+    suite2 = unittest.makeSuite(EntityStoreNumpyTest)
+    test_suite.addTests([suite1, suite2])
+    return test_suite
+    
+def load_tests():
+    return suite()
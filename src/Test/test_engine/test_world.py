@@ -0,0 +1,184 @@
+import unittest
+import Collision.Shapes as Shapes
+import Engine.Entity as Entity
+import Engine.World as World
+
+class CountingPoint(Shapes.Point):
+    def __init__(self, *args, **kwargs):
+        Shapes.Point.__init__(self, *args, **kwargs)
+        self.centered = 0
+    
+    def center_at(self, point):
+        Shapes.Point.center_at(self, point)
+        self.centered += 1
+
+class LoggingEntity(Entity.Entity):
+    def __init__(self, log, **kwargs):
+        Entity.Entity.__init__(self, **kwargs)
+        self.log = log
+    
+    def _pre_update(self):
+        self.log.append(("pre", self))
+    
+    def _update(self):
+        self.log.append(("update", self))
+        self._x += self._dt
+    
+    def _post_update(self):
+        self.log.append(("post", self))
+        Entity.Entity._post_update(self)
+
+class EntityGroupTest(unittest.TestCase):
+    def test_phase_order(self):
+        log = []
+        first = LoggingEntity(log)
+        second = LoggingEntity(log, timescale=0.5)
+        group = World.EntityGroup([first, second])
+        group.update(2.0)
+        
+        self.assertEqual(log, [("pre", first), ("pre", second),
+                               ("update", first), ("update", second),
+                               ("post", first), ("post", second)])
+        self.assertEqual((first._dt, second._dt), (2.0, 1.0))
+        self.assertEqual((first._x, second._x), (2.0, 1.0))
+        
+    def test_overridden_update(self):
+        calls = []
+        class CustomUpdate(Entity.Entity):
+            def update(self, dt):
+                calls.append(dt)
+        class DoubleTime(Entity.Entity):
+            def _get_timescale(self):
+                return 2.0
+            timescale = property(_get_timescale)
+        
+        custom, double = CustomUpdate(), DoubleTime()
+        group = World.EntityGroup([custom, double])
+        group.update(1.0)
+        self.assertEqual(calls, [1.0])
+        self.assertEqual(double._dt, 2.0)
+    
+    def test_phase_timers(self):
+        group = World.EntityGroup([Entity.Entity() for _ in xrange(3)])
+        for _ in xrange(4):
+            group.update(1.0)
+        for phase in World.PHASES:
+            self.assertEqual(group.Timers.stats(phase).Count, 4)
+    
+    def test_membership(self):
+        entity = Entity.Entity()
+        group = World.EntityGroup()
+        group.add(entity)
+        self.assertTrue(entity in group)
+        self.assertEqual(list(group), [entity])
+        group.remove(entity)
+        self.assertEqual(len(group), 0)
+        with self.assertRaises(ValueError):
+            group.remove(entity)
+
+class ColliderSkipTest(unittest.TestCase):
+    def test_unmoved_entities_skip_collider(self):
+        collider = CountingPoint(0, 0)
+        entity = Entity.Entity(x=3, y=4, collider=collider)
+        group = World.EntityGroup([entity])
+        
+        group.update(1.0)
+        self.assertEqual((collider.x, collider.y), (3, 4))
+        group.update(1.0)
+        self.assertEqual(collider.centered, 1)
+        
+        #Moving recenters
+        entity._x = 5
+        entity.update(1.0)
+        self.assertEqual((collider.x, collider.centered), (5, 2))
+        
+        #So does a new collider
+        entity._collider = other = CountingPoint(0, 0)
+        entity.update(1.0)
+        self.assertEqual((other.x, other.y), (5, 4))
+        self.assertEqual(collider.centered, 2)
+
+class Stepper(object):
+    def __init__(self):
+        self.steps = []
+    
+    def update(self, dt):
+        self.steps.append(dt)
+
+class FixedStepLoopTest(unittest.TestCase):
+    def test_accumulator(self):
+        stepper = Stepper()
+        alphas = []
+        loop = World.FixedStepLoop(stepper, step=0.25, render=alphas.append)
+        
+        self.assertEqual(loop.tick(0.1), 0)
+        self.assertEqual(loop.tick(0.4), 2)
+        self.assertEqual(loop.tick(0.375), 1)
+        self.assertEqual(stepper.steps, [0.25] * 3)
+        self.assertEqual(loop.Ticks, 3)
+        self.assertEqual(len(alphas), 3)
+        self.assertAlmostEqual(alphas[0], 0.4)
+        self.assertAlmostEqual(loop.Alpha, 0.5)
+    
+    def test_max_steps(self):
+        stepper = Stepper()
+        loop = World.FixedStepLoop(stepper, step=0.25, max_steps=2)
+        self.assertEqual(loop.tick(1.125), 2)
+        self.assertEqual(loop.Dropped, 0.5)
+        self.assertAlmostEqual(loop.Alpha, 0.5)
+    
+    def test_measured_ticks(self):
+        clock = [0.0]
+        stepper = Stepper()
+        loop = World.FixedStepLoop(stepper, step=0.25,
+                                   clock=lambda: clock[0])
+        self.assertEqual(loop.tick(), 0)
+        clock[0] = 0.5
+        self.assertEqual(loop.tick(), 2)
+    
+    def test_headless(self):
+        stepper = Stepper()
+        alphas = []
+        loop = World.FixedStepLoop(stepper, render=alphas.append)
+        self.assertEqual(loop.run_headless(100), 100)
+        self.assertEqual(alphas, [])
+        self.assertEqual(loop.run_headless(
+            100, until=lambda: len(stepper.steps) == 105), 5)
+        self.assertEqual(loop.Ticks, 105)
+        
+        with self.assertRaises(ValueError):
+            World.FixedStepLoop(stepper, step=0)
+    
+    def test_interpolation(self):
+        log = []
+        entity = LoggingEntity(log, x=0, y=10)
+        group = World.EntityGroup([entity])
+        loop = World.FixedStepLoop(group, step=1.0)
+        loop.tick(1.5)
+        
+        #_update moves x by dt, so the step went from 0 to 1
+        self.assertEqual(entity._x, 1.0)
+        self.assertEqual(list(group.positions(loop.Alpha)), [0.5, 10.0])
+        
+        #Entities added after the snapshot aren't interpolated
+        group.add(Entity.Entity(x=7, y=8))
+        self.assertEqual(list(group.positions(0.0)), [0.0, 10.0, 7, 8])
+        
+        #Removing an entity doesn't shift the others' snapshots
+        first, second = Entity.Entity(x=0), Entity.Entity(x=100)
+        group = World.EntityGroup([first, second])
+        group.snapshot()
+        second._x = 200
+        group.remove(first)
+        self.assertEqual(list(group.positions(0.5)), [150.0, 0.0])
+
+def suite():
+    test_suite = unittest.TestSuite()
+    suite1 = unittest.makeSuite(EntityGroupTest)
+    suite2 = unittest.makeSuite(ColliderSkipTest)
+    suite3 = unittest.makeSuite(FixedStepLoopTest)
+    test_suite.addTests([suite1, suite2, suite3])
+    return test_suite
+    
+def load_tests():
+    return suite()
@@ -54,6 +54,59 @@ class FormattingTest(unittest.TestCase):
         actual = Formatting.str_to_struct(s, str, False)
         self.assertEqual(expected, actual)
     
+    def test_str_to_struct_nested(self):
+        #Test nested structs
+        s = "[(1, 2), (3,4), [5]]"
+        expected = [(1, 2), (3, 4), [5]]
+        actual = Formatting.str_to_struct(s, int)
+        self.assertEqual(expected, actual)
+        
+        #Test quoted items and empty items
+        s = '("a, b", " c ",, "say \\"hi\\"")'
+        expected = ('a, b', ' c ', '', 'say "hi"')
+        actual = Formatting.str_to_struct(s, str)
+        self.assertEqual(expected, actual)
+        self.assertEqual(Formatting.str_to_struct("[]", str), [])
+        
+        #Bare items with brackets in them, as older files have them
+        s = "[Windowed,Full (native)]"
+        expected = ["Windowed", "Full (native)"]
+        self.assertEqual(Formatting.str_to_struct(s, str), expected)
+        
+        #Test badly formatted nesting
+        for s in ["[(1,2]", "[(1)2]", "[1,(2]", "[1][2]"]:
+            with self.assertRaises(ValueError):
+                Formatting.str_to_struct(s, int)
+    
+    def test_str_to_struct_cache(self):
+        #Cached results don't share lists
+        s = "[1,[2,3]]"
+        first = Formatting.str_to_struct(s, int)
+        first[1].append(4)
+        second = Formatting.str_to_struct(s, int)
+        self.assertEqual(second, [1, [2, 3]])
+        
+        #Cache is bounded
+        for i in xrange(Formatting.PARSE_CACHE_SIZE + 10):
+            Formatting.str_to_struct("[({})]".format(i), int)
+        self.assertEqual(len(Formatting._PARSE_CACHE),
+                         Formatting.PARSE_CACHE_SIZE)
+        
+        #Flat strings are split, not cached
+        Formatting._PARSE_CACHE.clear()
+        Formatting._PARSE_CACHE_KEYS.clear()
+        self.assertEqual(Formatting.str_to_struct("[a, b]", str), ["a", "b"])
+        self.assertEqual(Formatting.str_to_struct("a, b", str, False),
+                         ("a", "b"))
+        self.assertEqual(len(Formatting._PARSE_CACHE), 0)
+    
+    def test_struct_round_trip(self):
+        structs = [["Red", "Blue"], ("a,b", "", " padded ", '"quoted"'),
+                   [("nested", ["deeper"]), ()], []]
+        for struct in structs:
+            string = Formatting.struct_to_str(struct)
+            self.assertEqual(Formatting.str_to_struct(string, str), struct)
+    
     def test_struct_to_str(self):
         #Test numbers
         a = [1, 2, 3]
@@ -206,10 +259,59 @@ class StringBuilderTest(unittest.TestCase):
         s += " king makes you fat"
         self.assertEqual(len(sb), len(s))
         
+    def test_eq(self):
+        sb = self.mk_and_append(10, "burger")
+        self.assertFalse(sb == "burg")
+        self.assertFalse(sb == "burgers")
+        self.assertTrue(sb != "burgir")
+        self.assertTrue(sb == self.mk_and_append(3, "burger"))
+        self.assertFalse(sb == self.mk_and_append(3, "burgers"))
+    
+    def test_clear_and_bool(self):
+        sb = self.mk_and_append(10, "burger")
+        self.assertTrue(sb)
+        sb.clear()
+        self.assertFalse(sb)
+        self.assertEqual(len(sb), 0)
+        self.assertEqual(sb(), "")
+        sb += ""
+        self.assertFalse(sb)
+    
+    def test_backends(self):
+        for backend in ['list', 'stringio', 'bytearray']:
+            sb = Formatting.StringBuilder("Yup", backend=backend)
+            sb += ", Bro"
+            sb *= 2
+            self.assertEqual(len(sb), 16)
+            self.assertEqual(sb.getvalue(), "Yup, BroYup, Bro")
+            self.assertEqual(sb, "Yup, BroYup, Bro")
+        
+        sb = Formatting.StringBuilder(u"f\xfcnf", backend='bytearray')
+        self.assertEqual(len(sb), 5)
+        self.assertEqual(sb(), "f\xc3\xbcnf")
+        
+        with self.assertRaises(ValueError):
+            Formatting.StringBuilder(backend='rope')
+    
+    def test_write_to(self):
+        import cStringIO
+        for backend in ['list', 'stringio', 'bytearray']:
+            sb = Formatting.StringBuilder(backend=backend)
+            for c in "burger":
+                sb += c
+            out = cStringIO.StringIO()
+            self.assertEqual(sb.write_to(out), 6)
+            self.assertEqual(out.getvalue(), "burger")
+        
+        #The list backend writes its pieces without joining them
+        sb = self.mk_and_append(0, "burger")
+        sb.write_to(cStringIO.StringIO())
+        self.assertEqual(len(sb.data), 6)
+        
 def suite():
     test_suite = unittest.TestSuite()
     suite1 = unittest.makeSuite(FormattingTest)
-    suite2 = unittest.makeSuite(FormattingTest)
+    suite2 = unittest.makeSuite(StringBuilderTest)
     test_suite.addTests([suite1, suite2])
     return test_suite
     
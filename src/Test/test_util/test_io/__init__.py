@@ -15,6 +15,34 @@ class IOTest(unittest.TestCase):
         import os
         os.remove(filename)
     
+    def test_bufcount_parallel(self):
+        import os
+        #Force several ranges, and ranges that split a line return
+        old_sizes = IO._lib.PARALLEL_MIN_SIZE, IO._lib._RANGE_SIZE
+        IO._lib.PARALLEL_MIN_SIZE, IO._lib._RANGE_SIZE = 0, 7
+        filenames = ["test_count_many_{}.txt".format(i) for i in xrange(3)]
+        try:
+            for i, filename in enumerate(filenames):
+                with open(filename, 'wb') as f:
+                    f.write("line\r\n" * (i * 10) + "no line return")
+            
+            self.assertEqual(IO.bufcount(filenames[2], workers=2), 20)
+            actual = IO.count_many(filenames, workers=2)
+            self.assertListEqual(actual, [0, 10, 20])
+            
+            #Same result in-process
+            actual = IO.count_many(filenames, workers=1)
+            self.assertListEqual(actual, [0, 10, 20])
+        finally:
+            IO._lib.PARALLEL_MIN_SIZE, IO._lib._RANGE_SIZE = old_sizes
+            for filename in filenames:
+                os.remove(filename)
+        
+        #Empty batches and missing files
+        self.assertListEqual(IO.count_many([]), [])
+        with self.assertRaises(IOError):
+            IO.bufcount("sadksal21r45ewq90&&&&%%!@####:::")
+    
     def test_ensdir(self):
         #Test a bad folder name
         path = "!@#$%^&*():;[]{}+-`~\"/|"
@@ -52,9 +52,204 @@ class FullBufferedReadTest(unittest.TestCase):
             actual = fbr[i]
             self.assertEqual(actual, expected)
     
+class IncrementalReadTest(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.filename = 'temp_incremental_reader_test_file.txt'
+        self.write("line 0\nline 1\n", 'w')
+    
+    def tearDown(self):
+        unittest.TestCase.tearDown(self) 
+        import os
+        for filename in [self.filename, self.filename + '.1']:
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+    
+    def write(self, data, mode='a'):
+        with open(self.filename, mode) as f:
+            f.write(data)
+    
+    def test_append(self):
+        fbr = Readers.FullBufferedRead(self.filename, incremental=True)
+        self.assertEqual(len(fbr), 2)
+        
+        #Partial lines are held back until complete
+        self.write("line 2\nline")
+        self.assertEqual(fbr.reload_file(), 2)
+        self.assertEqual(len(fbr), 3)
+        self.assertEqual(fbr[2], "line 2\n")
+        
+        self.write(" 3\n")
+        self.assertEqual(fbr.reload_file(), 3)
+        self.assertEqual(fbr[3], "line 3\n")
+        
+        #Nothing new
+        self.assertEqual(fbr.reload_file(), 4)
+        self.assertEqual(len(fbr), 4)
+    
+    def test_truncate_and_rotate(self):
+        import os
+        fbr = Readers.FullBufferedRead(self.filename, incremental=True)
+        
+        #Truncated files are read from the start
+        self.write("new\n", 'w')
+        self.assertEqual(fbr.reload_file(), 0)
+        self.assertListEqual(fbr._lines, ["new\n"])
+        
+        #So are files replaced by rotation, even if they're larger
+        os.rename(self.filename, self.filename + '.1')
+        self.write("rotated 0\nrotated 1\n", 'w')
+        self.assertEqual(fbr.reload_file(), 0)
+        self.assertListEqual(fbr._lines, ["rotated 0\n", "rotated 1\n"])
+    
+    def test_follow(self):
+        fbr = Readers.FullBufferedRead(self.filename)
+        follow = fbr.follow(poll_interval=0.01, idle_timeout=0.05)
+        
+        #Only lines written after the first call are followed
+        self.write("line 2\n")
+        self.assertEqual(next(follow), "line 2\n")
+        self.write("line 3\nline 4\n")
+        self.assertEqual(next(follow), "line 3\n")
+        self.assertEqual(next(follow), "line 4\n")
+        
+        #Stops once idle
+        self.assertListEqual(list(follow), [])
+        self.assertEqual(len(fbr), 5)
+    
+class MmapLineReaderTest(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        
+        #Set up a file to read, last line without a line return
+        self.nlines = 12000
+        self.single_line = "This is line {}.\n"
+        self.filename = 'temp_mmap_reader_test_file.txt'
+        
+        with open(self.filename, 'w', 8 << 10) as f:
+            for i in xrange(self.nlines - 1):
+                f.write(self.single_line.format(i))
+            f.write("Last line")
+    
+    def tearDown(self):
+        unittest.TestCase.tearDown(self) 
+        import os
+        for filename in [self.filename,
+                         self.filename + Readers.MmapLineReader.INDEX_EXT]:
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+    
+    def test_errors(self):
+        #None filename
+        with self.assertRaises(IOError):
+            Readers.MmapLineReader(None)
+        
+        #Bad filename
+        with self.assertRaises(IOError):
+            Readers.MmapLineReader(":-_!@%..>..")
+        
+        with Readers.MmapLineReader(self.filename) as mlr:
+            with self.assertRaises(IndexError):
+                mlr[self.nlines]
+        
+        #Closed readers can't be read
+        self.assertEqual(len(mlr), 0)
+        with self.assertRaises(IOError):
+            mlr[0]
+    
+    def test_getitem(self):
+        #Test every line is correctly read, small chunks to cross boundaries
+        with Readers.MmapLineReader(self.filename, buf_size=100) as mlr:
+            self.assertEqual(len(mlr), self.nlines)
+            for i in xrange(self.nlines - 1):
+                expected = self.single_line.format(i)
+                self.assertEqual(str(mlr[i]), expected)
+                self.assertEqual(mlr.read_line(i), expected)
+            self.assertEqual(str(mlr[-1]), "Last line")
+    
+    def test_empty_file(self):
+        open(self.filename, 'w').close()
+        with Readers.MmapLineReader(self.filename) as mlr:
+            self.assertEqual(len(mlr), 0)
+            self.assertEqual(list(mlr), [])
+    
+    def test_persist_index(self):
+        import os.path
+        index_filename = self.filename + Readers.MmapLineReader.INDEX_EXT
+        with Readers.MmapLineReader(self.filename, True) as mlr:
+            self.assertTrue(os.path.isfile(index_filename))
+            expected = list(mlr._offsets)
+        
+        #Reopening uses the saved index
+        with Readers.MmapLineReader(self.filename, True) as mlr:
+            self.assertListEqual(list(mlr._offsets), expected)
+            self.assertEqual(mlr.read_line(5), self.single_line.format(5))
+        
+        #Changing the file invalidates the saved index
+        with open(self.filename, 'w') as f:
+            f.write("a\nb\n")
+        with Readers.MmapLineReader(self.filename, True) as mlr:
+            self.assertEqual(len(mlr), 2)
+            self.assertEqual(mlr.read_line(1), "b\n")
+    
+class BinaryLogReaderTest(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.filename = 'temp_binary_reader_test_file.blog'
+        
+        #Write records directly in the log format
+        import Util.IO._binlog as _binlog
+        self.records = [_binlog.LogRecord(float(i), i, 0.5, i % 3, ("x", i))
+                        for i in xrange(1000)]
+        with open(self.filename, 'wb') as f:
+            f.write(_binlog.MAGIC)
+            for record in self.records:
+                f.write(_binlog.pack_record(*record))
+    
+    def tearDown(self):
+        unittest.TestCase.tearDown(self) 
+        import os
+        try:
+            os.remove(self.filename)
+        except OSError:
+            pass
+    
+    def test_errors(self):
+        with self.assertRaises(IOError):
+            Readers.BinaryLogReader(None)
+        
+        with open(self.filename, 'wb') as f:
+            f.write("Not a binary log\n")
+        with self.assertRaises(IOError):
+            list(Readers.BinaryLogReader(self.filename))
+    
+    def test_records(self):
+        blr = Readers.BinaryLogReader(self.filename)
+        self.assertListEqual(list(blr), self.records)
+        
+        #Filtering by message id
+        expected = [r for r in self.records if r.msg_id == 2]
+        self.assertListEqual(list(blr.records(msg_id=2)), expected)
+    
+    def test_partial_record(self):
+        #A half-written last record is skipped
+        with open(self.filename, 'ab') as f:
+            f.write("\x00" * 10)
+        actual = list(Readers.BinaryLogReader(self.filename))
+        self.assertListEqual(actual, self.records)
+    
 def suite():
+    test_suite = unittest.TestSuite()
     suite1 = unittest.makeSuite(FullBufferedReadTest)
-    return unittest.TestSuite(suite1)
+    suite2 = unittest.makeSuite(IncrementalReadTest)
+    suite3 = unittest.makeSuite(MmapLineReaderTest)
+    suite4 = unittest.makeSuite(BinaryLogReaderTest)
+    test_suite.addTests([suite1, suite2, suite3, suite4])
+    return test_suite
     
 def load_tests():
     return suite()
\ No newline at end of file
@@ -1,5 +1,9 @@
+import glob
+import gzip
+import os
 import unittest
 import time
+import zlib
 
 import Util.IO.Writers as Writers
 import Util.IO
@@ -84,6 +88,282 @@ class BufferedWriteTest(unittest.TestCase):
         writer.close()
         self.check_file(data)
 
+    def test_file_stays_open(self):
+        writer = Writers.BufferedWriter(self.filename, buffer_size = 0)
+        #Nothing opened until there's something to write
+        self.assertTrue(writer._file is None)
+        writer.write("Hello")
+        handle = writer._file
+        writer.writeln(" there")
+        self.assertTrue(writer._file is handle)
+        self.check_file("Hello there\n")
+        writer.close()
+        self.assertTrue(handle.closed)
+    
+    def test_context_manager(self):
+        with Writers.BufferedWriter(self.filename, buffer_size = -1) as writer:
+            writer.write("Hello")
+            self.assertEqual(len(writer), 5)
+            self.check_file("")
+        self.check_file("Hello")
+    
+    def test_flush_interval(self):
+        writer = Writers.BufferedWriter(self.filename, buffer_size = -1,
+                                        flush_interval = 0.1)
+        writer.write("Hello")
+        self.check_file("")
+        time.sleep(0.15)
+        #The first write after the interval flushes everything
+        writer.write(" there")
+        self.check_file("Hello there")
+        self.assertEqual(writer.CurrentBufferSize, 0)
+        writer.close()
+
+class AsyncBufferedWriteTest(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        
+        #Where we'll write to
+        self.filename = 'temp_async_writer_test_file.txt'
+        Util.IO.remove_file(self.filename)
+    
+    def tearDown(self):
+        unittest.TestCase.tearDown(self) 
+        Util.IO.remove_file(self.filename)
+    
+    def check_file(self, data):
+        with open(self.filename) as filename:
+            actual = filename.read()
+        self.assertEqual(actual, data)
+    
+    def make_stalled_writer(self, policy):
+        #Writer thread waits on an event before writing anything
+        import threading
+        go = threading.Event()
+        class StalledWriter(Writers.AsyncBufferedWriter):
+            def _open_file(self):
+                go.wait()
+                return Writers.AsyncBufferedWriter._open_file(self)
+        writer = StalledWriter(self.filename, buffer_size = 0,
+                               queue_size = 2, policy = policy)
+        return writer, go
+    
+    def test_flush_and_close(self):
+        writer = Writers.AsyncBufferedWriter(self.filename, buffer_size = 10)
+        data = "Hello"
+        writer.write(data)
+        self.check_file("")
+        
+        #Flush is a barrier- data is on file once it returns
+        writer.writeln("\nThis is exciting!")
+        data += "\nThis is exciting!\n"
+        writer.flush()
+        self.check_file(data)
+        
+        writer.write("Bye")
+        writer.close()
+        self.check_file(data + "Bye")
+        self.assertFalse(writer._file)
+        
+        #Closing twice is fine
+        writer.close()
+    
+    def test_bad_policy(self):
+        with self.assertRaises(ValueError):
+            Writers.AsyncBufferedWriter(self.filename, policy = 'shrug')
+    
+    def test_drop_newest(self):
+        writer, go = self.make_stalled_writer('drop_newest')
+        writer.write("0")
+        #Let the stalled writer take "0" from the queue
+        while not writer._queue.empty():
+            time.sleep(0.001)
+        for i in xrange(1, 5):
+            writer.write(str(i))
+        go.set()
+        writer.flush()
+        self.check_file("012")
+        self.assertEqual(writer.Dropped, 2)
+        writer.close()
+    
+    def test_drop_oldest(self):
+        writer, go = self.make_stalled_writer('drop_oldest')
+        writer.write("0")
+        #Let the stalled writer take "0" from the queue
+        while not writer._queue.empty():
+            time.sleep(0.001)
+        for i in xrange(1, 5):
+            writer.write(str(i))
+        go.set()
+        writer.flush()
+        self.check_file("034")
+        self.assertEqual(writer.Dropped, 2)
+        writer.close()
+    
+    def test_async_logger(self):
+        log = Writers.make_log(self.filename[:-4], use_date = False,
+                               async_write = True)
+        self.assertTrue(isinstance(log, Writers.AsyncLogger))
+        log.log_message("Hello")
+        log.start()
+        log.stop()
+        log.log_message_with_elapsed("Timed")
+        log.close()
+        with open(self.filename[:-4] + '.log') as logfile:
+            lines = logfile.readlines()
+        Util.IO.remove_file(self.filename[:-4] + '.log')
+        self.assertEqual(lines[0], "Hello\n")
+        self.assertTrue(lines[1].startswith("Timed ("))
+
+class BinaryLoggerTest(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        
+        #Where we'll write to
+        self.filename = 'temp_binary_logger_test_file.blog'
+        Util.IO.remove_file(self.filename)
+    
+    def tearDown(self):
+        unittest.TestCase.tearDown(self) 
+        Util.IO.remove_file(self.filename)
+    
+    def test_records(self):
+        import Util.IO.Readers as Readers
+        start = time.time()
+        log = Writers.BinaryLogger(self.filename)
+        log.log_record(7, 1, -2.5, "three", u"f\xfcnf", None)
+        tid = log.start()
+        log.stop()
+        log.log_message_with_elapsed("Timed")
+        elapsed = log._elapsed(tid)
+        log.close()
+        
+        #Appending to an existing log doesn't rewrite the header
+        log = Writers.BinaryLogger(self.filename)
+        log.log_message("Again")
+        log.close()
+        
+        records = list(Readers.BinaryLogReader(self.filename))
+        self.assertEqual(len(records), 3)
+        
+        first = records[0]
+        self.assertEqual(first.msg_id, 7)
+        self.assertEqual(first.args, (1, -2.5, "three", "f\xc3\xbcnf", None))
+        self.assertTrue(first.tid is None)
+        self.assertTrue(start <= first.timestamp <= time.time())
+        
+        timed = records[1]
+        self.assertEqual(timed.msg_id, Writers.BinaryLogger.MSG_TEXT)
+        self.assertEqual(timed.args, ("Timed",))
+        self.assertEqual(timed.tid, tid)
+        self.assertEqual(timed.elapsed, elapsed)
+        
+        self.assertEqual(records[2].args, ("Again",))
+
+class RotatingLoggerTest(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        
+        #Where we'll write to
+        self.filename = 'temp_rotating_logger_test_file.log'
+        self.remove_all()
+    
+    def tearDown(self):
+        unittest.TestCase.tearDown(self) 
+        self.remove_all()
+    
+    def remove_all(self):
+        for path in glob.glob(self.filename + '*'):
+            Util.IO.remove_file(path)
+    
+    def test_rotate_by_size(self):
+        log = Writers.RotatingLogger(self.filename, max_bytes = 12,
+                                     backup_count = 2, compression = None)
+        for i in xrange(5):
+            log.log_message("line {}".format(i))
+        log.close()
+        
+        #7 bytes per line, so one line per file; only 2 backups are kept
+        self.assertEqual(sorted(glob.glob(self.filename + '*')),
+                         [self.filename, self.filename + '.000003',
+                          self.filename + '.000004'])
+        with open(self.filename + '.000003') as segment:
+            self.assertEqual(segment.read(), "line 2\n")
+        with open(self.filename) as logfile:
+            self.assertEqual(logfile.read(), "line 4\n")
+    
+    def test_compression(self):
+        log = Writers.RotatingLogger(self.filename, backup_count = None)
+        log.log_message("first")
+        log.force_rotate()
+        log.log_message("second")
+        log.close()
+        
+        #Numbering picks up after existing segments
+        log = Writers.make_log(self.filename[:-4], use_date = False,
+                               max_bytes = 1 << 20, compression = 'zlib')
+        self.assertTrue(isinstance(log, Writers.RotatingLogger))
+        log.force_rotate()
+        log.close()
+        
+        with gzip.open(self.filename + '.000001.gz') as segment:
+            self.assertEqual(segment.read(), "first\n")
+        with open(self.filename + '.000002.zz', 'rb') as segment:
+            self.assertEqual(zlib.decompress(segment.read()), "second\n")
+        self.assertFalse(os.path.exists(self.filename + '.000001'))
+        
+        with self.assertRaises(ValueError):
+            Writers.RotatingLogger(self.filename, compression = 'bz2')
+    
+    def test_async_rotate_by_age(self):
+        log = Writers.make_log(self.filename[:-4], use_date = False,
+                               async_write = True, buffer_size = 0,
+                               max_age = 0.05, compression = None)
+        self.assertTrue(isinstance(log, Writers.AsyncRotatingLogger))
+        log.log_message("old")
+        log.flush()
+        time.sleep(0.1)
+        log.log_message("new")
+        log.close()
+        
+        with open(self.filename + '.000001') as segment:
+            self.assertEqual(segment.read(), "old\n")
+        with open(self.filename) as logfile:
+            self.assertEqual(logfile.read(), "new\n")
+    
+    def test_async_force_rotate_keeps_order(self):
+        #Writer thread waits on an event before writing anything
+        import threading
+        go = threading.Event()
+        class StalledLogger(Writers.AsyncRotatingLogger):
+            def _open_file(self):
+                go.wait()
+                return Writers.AsyncRotatingLogger._open_file(self)
+        log = StalledLogger(self.filename, buffer_size = 0,
+                            compression = None)
+        for msg in "ABC":
+            log.log_message(msg)
+        rotate = threading.Thread(target = log.force_rotate)
+        rotate.start()
+        time.sleep(0.05)
+        go.set()
+        rotate.join()
+        log.log_message("D")
+        log.close()
+        
+        with open(self.filename + '.000001') as segment:
+            self.assertEqual(segment.read(), "A\nB\nC\n")
+        with open(self.filename) as logfile:
+            self.assertEqual(logfile.read(), "D\n")
+    
+    def test_make_log_rotation_options(self):
+        with self.assertRaises(ValueError):
+            Writers.make_log(self.filename[:-4], use_date = False,
+                             compression = None)
+        with self.assertRaises(ValueError):
+            Writers.make_log(self.filename[:-4], use_date = False,
+                             async_write = True, backup_count = 2)
+
 class LoggerTest(unittest.TestCase):
     def setUp(self):
         unittest.TestCase.setUp(self)
@@ -119,13 +399,13 @@ class LoggerTest(unittest.TestCase):
         log.stop(tids[2])
         
         #Assert start times are in order
-        start = lambda i: log._time_start[tids[i]]
+        start = lambda i: log.Timers.timing(tids[i]).start
         self.assertTrue(start(0) < start(1))
         self.assertTrue(start(1) < start(2))
         self.assertTrue(start(2) < start(3))
         
         #Assert end times are in order
-        end = lambda i: log._time_end[tids[i]]
+        end = lambda i: log.Timers.timing(tids[i]).end
         self.assertTrue(end(1) < end(0))
         self.assertTrue(end(0) < end(3))
         self.assertTrue(end(3) < end(2))
@@ -145,13 +425,13 @@ class LoggerTest(unittest.TestCase):
             time.sleep(0.35)
         
         #Assert start times are in order
-        start = lambda i: log._time_start[tid_start[i]]
+        start = lambda i: log.Timers.timing(tid_start[i]).start
         self.assertTrue(start(0) < start(1))
         self.assertTrue(start(1) < start(2))
         self.assertTrue(start(2) < start(3))
         
         #Assert end times are in order
-        end = lambda i: log._time_end[tid_end[i]]
+        end = lambda i: log.Timers.timing(tid_end[i]).end
         self.assertTrue(end(0) < end(1))
         self.assertTrue(end(1) < end(2))
         self.assertTrue(end(2) < end(3))
@@ -159,6 +439,26 @@ class LoggerTest(unittest.TestCase):
         #Assert lists are reversed
         self.assertListEqual(tid_start, list(reversed(tid_end)))
     
+    def test_log_func_time(self):
+        log = Writers.Logger(self.filename)
+        
+        @log.log_func_time
+        def work():
+            time.sleep(0.01)
+            return 5
+        
+        self.assertEqual(work(), 5)
+        self.assertEqual(work(), 5)
+        log.close()
+        
+        stats = log.Timers.stats('work')
+        self.assertEqual(stats.Count, 2)
+        self.assertTrue(stats.Min >= 0.005)
+        with open(self.filename) as logfile:
+            lines = logfile.readlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("work complete (00:00:00::0"))
+    
     def test_log_msg(self):
         #Test log msg without tid
         
@@ -176,8 +476,11 @@ class LoggerTest(unittest.TestCase):
 def suite():
     test_suite = unittest.TestSuite()
     suite1 = unittest.makeSuite(BufferedWriteTest)
-    suite2 = unittest.makeSuite(LoggerTest)
-    test_suite.addTests([suite1, suite2])
+    suite2 = unittest.makeSuite(AsyncBufferedWriteTest)
+    suite3 = unittest.makeSuite(BinaryLoggerTest)
+    suite4 = unittest.makeSuite(RotatingLoggerTest)
+    suite5 = unittest.makeSuite(LoggerTest)
+    test_suite.addTests([suite1, suite2, suite3, suite4, suite5])
     return test_suite
     
 def load_tests():
@@ -66,6 +66,13 @@ class MathTest(unittest.TestCase):
         actual = Math.distance(p1, p2)
         self.assertAlmostEqual(expected, actual, 5)
         
+        #Test N x D points give one distance per pair
+        p1 = [[0, 0], [1, 1], [0, 5.5]]
+        p2 = [[3, 4], [1, 1], [0, -7.5]]
+        expected = [5.0, 0.0, 13.0]
+        actual = Math.distance(p1, p2)
+        self.assertAlmostEqualSequence(expected, actual, 5)
+        
     def test_fwrap(self):
         #Test negative wrapping (all floats) eps = 1E-3
         x = -2.0
@@ -266,6 +273,12 @@ class MathTest(unittest.TestCase):
         expected = [1.0, 0.5, 0.0]
         actual = Math.normalize(base)
         self.assertAlmostEqualSequence(expected, actual, 5)
+        
+        #Test unsorted values
+        base = [3.0, -1.0, 1.0, 7.0]
+        expected = [0.5, 0.0, 0.25, 1.0]
+        actual = Math.normalize(base)
+        self.assertAlmostEqualSequence(expected, actual, 5)
     
     def test_rotate(self):
         ox = oy = py = 0
@@ -0,0 +1,99 @@
+import array
+import unittest
+import Util.Math as Math
+import Util.Math.random_stream as random_stream
+
+class RandomStreamTest(unittest.TestCase):
+    def test_seed_is_reproducible(self):
+        a = Math.RandomStream(1234)
+        b = Math.RandomStream(1234)
+        self.assertEqual(a.seed, 1234)
+        self.assertListEqual(list(a.floats(50)), list(b.floats(50)))
+        self.assertEqual(a.randint(0, 10), b.randint(0, 10))
+        
+        #Random seeds are remembered so a run can be replayed
+        c = Math.RandomStream()
+        d = Math.RandomStream(c.seed)
+        self.assertEqual(c.random(), d.random())
+    
+    def test_negative_seed(self):
+        with self.assertRaises(ValueError):
+            Math.RandomStream(-5)
+        with self.assertRaises(ValueError):
+            Math.RandomStream(-5, use_numpy=True)
+    
+    def test_floats(self):
+        stream = Math.RandomStream(5)
+        values = stream.floats(1000, -3.0, 2.0)
+        self.assertTrue(isinstance(values, array.array))
+        self.assertEqual(len(values), 1000)
+        self.assertTrue(all(-3.0 <= v < 2.0 for v in values))
+        
+        #Fill an existing buffer
+        buf = array.array('d', [0.0]) * 10
+        actual = stream.floats(10, out=buf)
+        self.assertTrue(actual is buf)
+        self.assertTrue(all(0.0 <= v < 1.0 for v in buf))
+    
+    def test_floats_with_gap(self):
+        stream = Math.RandomStream(5)
+        values = stream.floats_with_gap(1000, 2.0, 3.0)
+        self.assertTrue(all(2.0 <= abs(v) <= 3.0 for v in values))
+        self.assertTrue(any(v < 0 for v in values))
+        self.assertTrue(any(v > 0 for v in values))
+    
+    def test_ints(self):
+        stream = Math.RandomStream(5)
+        values = stream.ints(1000, -2, 2)
+        self.assertSetEqual(set(values), set([-2, -1, 0, 1, 2]))
+    
+    def test_substreams(self):
+        parent = Math.RandomStream(99)
+        first = [s.random() for s in parent.spawn(4)]
+        
+        #Substreams don't depend on how much of the parent was used
+        parent.floats(100)
+        second = [s.random() for s in parent.spawn(4)]
+        self.assertListEqual(first, second)
+        
+        #But they are independent of each other
+        self.assertEqual(len(set(first)), 4)
+    
+    def test_mk_rand_fn_with_stream(self):
+        rnd = Math.mk_rand_fn(4, 8, Math.RandomStream(7))
+        expected = Math.RandomStream(7).rand(4, 8)
+        self.assertEqual(rnd(), expected)
+        
+        rnd = Math.mk_rand_with_gap_fn(1, 2, Math.RandomStream(7))
+        expected = Math.RandomStream(7).rand_with_gap(1, 2)
+        self.assertEqual(rnd(), expected)
+
+@unittest.skipIf(random_stream.numpy is None, "NumPy is not installed")
+class NumpyRandomStreamTest(unittest.TestCase):
+    def test_numpy_buffers(self):
+        a = Math.RandomStream(42, use_numpy=True)
+        b = Math.RandomStream(42, use_numpy=True)
+        values = a.floats(100, 1.0, 2.0)
+        self.assertListEqual(list(values), list(b.floats(100, 1.0, 2.0)))
+        self.assertTrue(((values >= 1.0) & (values < 2.0)).all())
+        
+        ints = a.ints(100, 0, 3)
+        self.assertTrue(((ints >= 0) & (ints <= 3)).all())
+        
+        #Substreams stay NumPy-backed
+        self.assertTrue(a.substream(0).uses_numpy)
+        
+        #Can still fill array buffers
+        buf = array.array('d', [0.0]) * 5
+        a.floats_with_gap(5, 1.0, 2.0, out=buf)
+        self.assertTrue(all(1.0 <= abs(v) <= 2.0 for v in buf))
+
+def suite():
+    test_suite = unittest.TestSuite()
+    suite1 = unittest.makeSuite(RandomStreamTest)
+    suite2 = unittest.makeSuite(NumpyRandomStreamTest)
+    test_suite.addTests([suite1, suite2])
+    return test_suite
+    
+def load_tests():
+    return suite()
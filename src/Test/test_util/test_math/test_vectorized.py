@@ -0,0 +1,129 @@
+import array
+import unittest
+import Util.Math as Math
+import Util.Math.vectorized as vectorized
+
+class VectorizedTest(unittest.TestCase):
+    def assertAlmostEqualSequence(self, first, second,
+                               places=None, msg=None, delta=None):
+        self.assertEqual(len(first), len(second))
+        for i in xrange(len(first)):
+            self.assertAlmostEqual(first[i], second[i], places, msg, delta)
+
+    def test_clamp(self):
+        vals = [1.0, 8.0, 4.0]
+        expected = [Math.clamp(v, 3.0, 5.0) for v in vals]
+        actual = vectorized.clamp(vals, 3.0, 5.0)
+        self.assertAlmostEqualSequence(expected, actual, 5)
+
+        #Test in place on an array buffer
+        buf = array.array('d', vals)
+        actual = vectorized.clamp(buf, 3.0, 5.0, out=buf)
+        self.assertTrue(actual is buf)
+        self.assertAlmostEqualSequence(expected, buf, 5)
+
+    def test_distance(self):
+        #Test flat, interleaved buffers
+        p1 = array.array('d', [0, 0, 1, 1, 0, 5.5])
+        p2 = array.array('d', [3, 4, 1, 1, 0, -7.5])
+        expected = [5.0, 0.0, 13.0]
+        actual = vectorized.distance(p1, p2, dims=2)
+        self.assertTrue(isinstance(actual, array.array))
+        self.assertAlmostEqualSequence(expected, actual, 5)
+
+        #Flat buffers without dims are 1 component points
+        actual = vectorized.distance(array.array('d', [1, -2]),
+                                     array.array('d', [4, 2]))
+        self.assertAlmostEqualSequence([3.0, 4.0], actual, 5)
+
+        #Test that unequal size vectors fail
+        with self.assertRaises(IndexError):
+            vectorized.distance([[1, 1, 1]], [[0, 0]])
+
+    def test_lerp(self):
+        ts = array.array('d', [0.0, 0.5, 1.0, 1.5])
+        expected = [Math.lerp(-10, 5, t) for t in ts]
+        actual = vectorized.lerp(-10, 5, ts, out=ts)
+        self.assertAlmostEqualSequence(expected, actual, 5)
+
+    def test_limit_vector(self):
+        xs = array.array('d', [-4, 10, -4])
+        ys = array.array('d', [0, 0, -4])
+        expected_x = [-4, 4.0, -(8 ** 0.5)]
+        expected_y = [0, 0, -(8 ** 0.5)]
+        out_x, out_y = vectorized.limit_vector(xs, ys, 4.0, xs, ys)
+        self.assertAlmostEqualSequence(expected_x, out_x, 5)
+        self.assertAlmostEqualSequence(expected_y, out_y, 5)
+
+        #Check negative mags raise Error
+        with self.assertRaises(ArithmeticError):
+            vectorized.limit_vector(xs, ys, -3)
+
+    def test_normalize(self):
+        #Test empty and single values
+        self.assertEqual(vectorized.normalize([]), [])
+        self.assertAlmostEqualSequence([1.0], vectorized.normalize([4.5]), 5)
+
+        #Test on roughly equal values
+        base = array.array('d', [4.5, 4.50000000001, 4.4999999999999])
+        expected = [1.0 / 3] * 3
+        actual = vectorized.normalize(base)
+        self.assertAlmostEqualSequence(expected, actual, 5)
+
+        #Test in place
+        base = array.array('d', [3.0, -1.0, 1.0, 7.0])
+        vectorized.normalize(base, out=base)
+        self.assertAlmostEqualSequence([0.5, 0.0, 0.25, 1.0], base, 5)
+
+    def test_unit(self):
+        xs = [1, -1, 0, -4, 0]
+        ys = [1, 1, 5, 0, 0]
+        out_x, out_y = vectorized.unit(xs, ys)
+        for i in xrange(4):
+            ex, ey = Math.unit(xs[i], ys[i])
+            self.assertAlmostEqual(ex, out_x[i], 5)
+            self.assertAlmostEqual(ey, out_y[i], 5)
+
+        #Zero vectors stay zero
+        self.assertEqual((out_x[4], out_y[4]), (0, 0))
+
+@unittest.skipIf(vectorized.numpy is None, "NumPy is not installed")
+class VectorizedNumpyTest(unittest.TestCase):
+    def test_clamp_in_place(self):
+        numpy = vectorized.numpy
+        vals = numpy.array([1.0, 8.0, 4.0])
+        vectorized.clamp(vals, 3.0, 5.0, out=vals)
+        self.assertEqual(list(vals), [3.0, 5.0, 4.0])
+
+    def test_distance(self):
+        numpy = vectorized.numpy
+        p1 = numpy.array([[0.0, 0.0], [0.0, 5.5]])
+        p2 = numpy.array([[3.0, 4.0], [0.0, -7.5]])
+        self.assertEqual(list(Math.distance(p1, p2)), [5.0, 13.0])
+
+        #Flat arrays without dims are 1 component points
+        flat1 = numpy.array([1.0, -2.0])
+        flat2 = numpy.array([4.0, 2.0])
+        self.assertEqual(list(vectorized.distance(flat1, flat2)), [3.0, 4.0])
+
+    def test_unit_and_limit(self):
+        numpy = vectorized.numpy
+        xs = numpy.array([10.0, 0.0, 3.0])
+        ys = numpy.array([0.0, 0.0, 4.0])
+        out_x, out_y = vectorized.unit(xs, ys)
+        self.assertEqual(list(out_x), [1.0, 0.0, 0.6])
+        self.assertEqual(list(out_y), [0.0, 0.0, 0.8])
+
+        vectorized.limit_vector(xs, ys, 2.5, xs, ys)
+        self.assertEqual(list(xs), [2.5, 0.0, 1.5])
+        self.assertEqual(list(ys), [0.0, 0.0, 2.0])
+
+def suite():
+    test_suite = unittest.TestSuite()
+    suite1 = unittest.makeSuite(VectorizedTest)
+    suite2 = unittest.makeSuite(VectorizedNumpyTest)
+    test_suite.addTests([suite1, suite2])
+    return test_suite
+
+def load_tests():
+    return suite()
@@ -0,0 +1,88 @@
+import json
+import unittest
+import Util.IO
+import Util.Profiler as Profiler
+
+class FrameProfilerTest(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.filename = 'temp_profiler_test_file.json'
+        Util.IO.remove_file(self.filename)
+    
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        Profiler.disable()
+        Util.IO.remove_file(self.filename)
+    
+    def test_ring_buffer(self):
+        profiler = Profiler.FrameProfiler(capacity=3)
+        for i in xrange(5):
+            profiler.record(str(i), "test", i, i + 1)
+        self.assertEqual(len(profiler), 3)
+        self.assertEqual([span.name for span in profiler.Spans],
+                         ['2', '3', '4'])
+        profiler.clear()
+        self.assertEqual(len(profiler), 0)
+    
+    def test_frames(self):
+        profiler = Profiler.FrameProfiler()
+        for i in xrange(2):
+            with profiler.frame() as frame:
+                self.assertEqual(frame, i)
+                with profiler.span("work", "test"):
+                    pass
+                profiler.record("work", "test", 1.0, 1.5)
+        self.assertEqual(profiler.Frame, 2)
+        
+        summary = profiler.frame_summary()
+        self.assertEqual(sorted(summary), ['frame', 'work'])
+        self.assertEqual(summary['work'][0], 2)
+        self.assertTrue(summary['work'][1] >= 0.5)
+        self.assertEqual(profiler.frame_summary(5), {})
+    
+    def test_chrome_trace(self):
+        profiler = Profiler.FrameProfiler()
+        start = Profiler.clock()
+        profiler.record("work", "test", start, start + 0.25, {'class': 'A'})
+        profiler.export_chrome_trace(self.filename)
+        with open(self.filename) as tracefile:
+            trace = json.load(tracefile)
+        event, = trace['traceEvents']
+        self.assertEqual(event['name'], "work")
+        self.assertEqual(event['ph'], "X")
+        self.assertAlmostEqual(event['dur'], 250000, 3)
+        self.assertEqual(event['args'], {'frame': 0, 'class': 'A'})
+    
+    def test_hooks(self):
+        import Collision
+        import Collision.Shapes as Shapes
+        import Engine.Entity
+        entity = Engine.Entity.Entity()
+        point = Shapes.Point(0, 0)
+        
+        #enable swaps out the global profiler; put it back afterwards
+        self.addCleanup(setattr, Profiler, 'PROFILER', Profiler.PROFILER)
+        self.addCleanup(Profiler.disable)
+        
+        #Nothing is recorded while disabled
+        Profiler.enable(capacity=16)
+        Profiler.disable()
+        entity.update(0.1)
+        Collision.Collider.check(point, point)
+        self.assertEqual(len(Profiler.PROFILER), 0)
+        
+        Profiler.enable()
+        entity.update(0.1)
+        self.assertTrue(Collision.Collider.check(point, point))
+        names = [span.name for span in Profiler.PROFILER.Spans]
+        self.assertEqual(names, ["Entity._pre_update", "Entity._update",
+                                 "Entity._post_update", "Collider.check"])
+        self.assertEqual(Profiler.PROFILER.Spans[0].args,
+                         {'class': 'Entity'})
+
+def suite():
+    suite1 = unittest.makeSuite(FrameProfilerTest)
+    return unittest.TestSuite(suite1)
+    
+def load_tests():
+    return suite()
@@ -0,0 +1,100 @@
+import random
+import unittest
+import Util.Timers as Timers
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+class P2QuantileTest(unittest.TestCase):
+    def test_small_counts_are_exact(self):
+        sketch = Timers.P2Quantile(0.5)
+        self.assertEqual(sketch.Value, 0.0)
+        for value in [5, 1, 3]:
+            sketch.add(value)
+        self.assertEqual(sketch.Value, 3)
+        
+        with self.assertRaises(ValueError):
+            Timers.P2Quantile(1.5)
+    
+    def test_estimates(self):
+        rnd = random.Random(7)
+        values = [rnd.random() for _ in xrange(20000)]
+        p50 = Timers.P2Quantile(0.5)
+        p99 = Timers.P2Quantile(0.99)
+        for value in values:
+            p50.add(value)
+            p99.add(value)
+        values.sort()
+        self.assertAlmostEqual(p50.Value, values[10000], delta=0.02)
+        self.assertAlmostEqual(p99.Value, values[19800], delta=0.01)
+
+class TimerRegistryTest(unittest.TestCase):
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.clock = FakeClock()
+        self.timers = Timers.TimerRegistry(max_results=3, clock=self.clock)
+    
+    def test_nested(self):
+        outer = self.timers.start()
+        self.clock.now = 1.0
+        inner = self.timers.start()
+        self.clock.now = 1.5
+        self.assertEqual(self.timers.stop(), inner)
+        self.clock.now = 4.0
+        self.assertEqual(self.timers.stop(), outer)
+        self.assertEqual(self.timers.stop(), None)
+        
+        self.assertEqual(self.timers.elapsed(inner), 0.5)
+        self.assertEqual(self.timers.elapsed(), 4.0)
+        self.assertEqual(self.timers.timing(outer), (0.0, 4.0))
+        self.assertEqual(self.timers.elapsed('unknown'), 0)
+        self.assertEqual(self.timers.Running, 0)
+    
+    def test_bounded_results(self):
+        for tid in xrange(5):
+            self.timers.start(tid)
+            self.timers.stop(tid)
+        self.assertEqual(self.timers.timing(1), None)
+        self.assertEqual(self.timers.timing(4), (0.0, 0.0))
+    
+    def test_stats(self):
+        for i in xrange(4):
+            with self.timers.timed("load"):
+                self.clock.now += i
+        self.timers.start("save")
+        self.clock.now += 2
+        self.timers.stop("save")
+        #Auto tids have no stats
+        self.timers.start()
+        self.timers.stop()
+        
+        self.assertEqual(sorted(self.timers.Names), ["load", "save"])
+        stats = self.timers.stats("load")
+        self.assertEqual(stats.Count, 4)
+        self.assertEqual(stats.Total, 6)
+        self.assertEqual(stats.Min, 0)
+        self.assertEqual(stats.Max, 3)
+        self.assertEqual(stats.Mean, 1.5)
+        self.assertEqual(stats.P99, 3)
+        self.assertEqual(self.timers.stats("missing"), None)
+    
+    def test_record(self):
+        self.assertEqual(self.timers.record("draw", 1.0, 3.5), "draw")
+        self.timers.record("draw", 4.0, 4.5)
+        self.assertEqual(self.timers.elapsed(), 0.5)
+        self.assertEqual(self.timers.stats("draw").Total, 3.0)
+        self.assertEqual(self.timers.Running, 0)
+
+def suite():
+    test_suite = unittest.TestSuite()
+    suite1 = unittest.makeSuite(P2QuantileTest)
+    suite2 = unittest.makeSuite(TimerRegistryTest)
+    test_suite.addTests([suite1, suite2])
+    return test_suite
+    
+def load_tests():
+    return suite()
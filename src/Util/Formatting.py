@@ -2,6 +2,11 @@
 Common formatting functions and structures.
 """
 
+import collections
+import cStringIO
+import re
+import shutil
+
 def paren_type_func(string):
     """Checks the left and right ends of a string to determine parens type.
         Returns tuple if (), list if [], and 
@@ -19,21 +24,68 @@ def paren_type_func(string):
 def str_to_struct(string, dtype, has_parens=True):
     """Convert tuple-like strings to real tuples.
     eg '(1,2,3,4)' -> (1, 2, 3, 4)
+    
+    () gives a tuple, [] a list, and {} a tuple.  Structs can nest-
+        '[(1,2),(3,4)]' -> [(1, 2), (3, 4)]
+    and dtype is applied to each item that isn't a struct.
+    Items are stripped, unless they're in double quotes- '("a,b", c)'
+        -> ('a,b', 'c').  In quotes, \" and \\ are a quote and backslash.
+    Strings that don't parse that way, such as '[Full (native),Windowed]'
+    from older files, are split on every comma like they used to be.
+    Empty brackets give an empty struct.
+    
+    Flat, unquoted strings are split directly.  Nested or quoted
+    strings are tokenized, and cached (see PARSE_CACHE_SIZE) so parsing
+    the same string again only costs a copy.
     """
-    if not surrounded_by_parens(string) and has_parens:
-        raise ValueError("Badly formatted string (missing supposed brackets).")
-    elif surrounded_by_parens(string) and not has_parens:
+    if has_parens:
+        struct = _PAREN_STRUCTS.get(string[0])
+        if struct is None or _CLOSE_PARENS[string[0]] != string[-1]:
+            msg = "Badly formatted string (missing supposed brackets)."
+            raise ValueError(msg)
+        inner = string[1:-1]
+    elif surrounded_by_parens(string):
         msg = "Badly formatted string (has brackets, said it did not)."
         raise ValueError(msg)
-    
-    if has_parens:
-        items = string[1:-1].split(',')
-        struct = paren_type_func(string)
     else:
-        items = string.split(',')
+        inner = string
         struct = tuple
     
-    return struct(dtype(item.strip()) for item in items)
+    if type(inner) is str:
+        flat = len(inner.translate(None, _STRUCT_CHARS)) == len(inner)
+    else:
+        flat = not _STRUCT_CHARS_RE.search(inner)
+    if flat:
+        #Flat and unquoted- a split is faster than tokenizing or caching
+        if not inner or inner.isspace():
+            return struct()
+        items = inner.split(',')
+        if dtype is type(inner):
+            #Stripping already gives the right type
+            return struct(map(dtype.strip, items))
+        elif dtype is int or dtype is float or dtype is long:
+            #These ignore surrounding whitespace themselves
+            return struct(map(dtype, items))
+        return struct([dtype(item.strip()) for item in items])
+    
+    if not has_parens:
+        string = "(" + string + ")"
+    key = (string, dtype)
+    try:
+        struct, copy = _PARSE_CACHE[key]
+    except KeyError:
+        struct = _parse_or_split(string, dtype)
+        copy = _has_list(struct)
+        if len(_PARSE_CACHE_KEYS) >= PARSE_CACHE_SIZE:
+            del _PARSE_CACHE[_PARSE_CACHE_KEYS.popleft()]
+        _PARSE_CACHE[key] = (struct, copy)
+        _PARSE_CACHE_KEYS.append(key)
+    except TypeError:
+        #Unhashable dtype- can't cache
+        return _parse_or_split(string, dtype)
+    
+    #Callers get their own lists
+    return _copy_struct(struct) if copy else struct
 
 def struct_to_str(struct):
     """Converts a struct of strings to a string that can be properly
@@ -41,20 +93,233 @@ def struct_to_str(struct):
         list -> str will make "['hello','bob']" which when converted
         back gives ["'hello'","'bob'"] which preserves the unnecessary
         inner single quotes.  This function would instead return
-        "[hello,bob]" which when str_to_struct'd, gives ["hello","bob"]"""
+        "[hello,bob]" which when str_to_struct'd, gives ["hello","bob"]
+        
+        Nested lists and tuples are converted too, and items that
+        wouldn't parse back as themselves (such as "a,b" or "") are
+        written in double quotes."""
     if type(struct) is list:
         parens = "[]"
     else:
         parens = "()"
-    inner = ",".join((str(s) for s in struct))
+    inner = ",".join(_item_to_str(item) for item in struct)
     
     return parens[0]+inner+parens[1]
 
+#Number of nested or quoted strings str_to_struct remembers
+PARSE_CACHE_SIZE = 1024
+
+#(string, dtype) -> (struct, needs copying), oldest key first in the deque
+_PARSE_CACHE = {}
+_PARSE_CACHE_KEYS = collections.deque()
+
+_CLOSE_PARENS = {'(': ')', '[': ']', '{': '}'}
+
+_PAREN_STRUCTS = {'(': tuple, '[': list, '{': tuple}
+
+#Characters that make a string nested or quoted
+_STRUCT_CHARS = '()[]{}"'
+
+_STRUCT_CHARS_RE = re.compile(r'[()\[\]{}"]')
+
+_SPECIAL_CHARS_RE = re.compile(r'[,()\[\]{}]')
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<open>[(\[{])                |
+        (?P<close>[)\]}])               |
+        (?P<comma>,)                    |
+        "(?P<quoted>(?:[^"\\]|\\.)*)"   |
+        (?P<bare>[^,()\[\]{}]+)
+    )""", re.VERBOSE | re.DOTALL)
+
+_UNESCAPE_RE = re.compile(r'\\(.)', re.DOTALL)
+
+def _copy_struct(struct):
+    """Copy every list and tuple in a (nested) struct"""
+    if type(struct) is list:
+        return [_copy_struct(item) for item in struct]
+    elif type(struct) is tuple:
+        return tuple(_copy_struct(item) for item in struct)
+    return struct
+
+def _has_list(struct):
+    """True if struct is, or holds, a list"""
+    if type(struct) is list:
+        return True
+    elif type(struct) is tuple:
+        for item in struct:
+            if _has_list(item):
+                return True
+    return False
+
+def _item_to_str(item):
+    """Convert one struct_to_str item, quoting it if needed"""
+    if type(item) in (list, tuple):
+        return struct_to_str(item)
+    string = str(item)
+    if (not string or string != string.strip() or string[0] == '"' or
+        _SPECIAL_CHARS_RE.search(string)):
+        string = '"' + string.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    return string
+
+def _parse_or_split(string, dtype):
+    """_parse_struct, falling back to _split_struct for older strings"""
+    try:
+        return _parse_struct(string, dtype)
+    except ValueError:
+        return _split_struct(string, dtype)
+
+def _split_struct(string, dtype):
+    """
+    The original parse: split on every comma, ignoring brackets
+    and quotes, so bare items can hold brackets- '[Full (native)]'
+    """
+    struct = _PAREN_STRUCTS[string[0]]
+    return struct([dtype(item.strip()) for item in string[1:-1].split(',')])
+
+def _parse_struct(string, dtype):
+    """
+    Parse a bracketed string in one pass over its tokens.
+    
+    Raises ValueError for unbalanced brackets, missing commas,
+    or anything after the closing bracket.
+    """
+    #Each level is [open paren, items, has current item, has comma]
+    stack = []
+    struct = None
+    pos, end = 0, len(string)
+    while pos < end:
+        #Any text matches; unclosed quotes are just a bare item
+        match = _TOKEN_RE.match(string, pos)
+        pos = match.end()
+        kind = match.lastgroup
+        if not stack and (struct is not None or kind != 'open'):
+            msg = "Badly formatted string (item outside of brackets)."
+            raise ValueError(msg)
+        
+        if kind == 'open':
+            stack.append([match.group('open'), [], False, False])
+            continue
+        level = stack[-1]
+        if kind == 'comma':
+            if not level[2]:
+                level[1].append(dtype(''))
+            level[2], level[3] = False, True
+            continue
+        
+        if kind == 'close':
+            stack.pop()
+            paren, items, has_item, has_comma = level
+            if _CLOSE_PARENS[paren] != match.group('close'):
+                raise ValueError("Badly formatted string (mismatched brackets).")
+            if has_comma and not has_item:
+                items.append(dtype(''))
+            value = _PAREN_STRUCTS[paren](items)
+            if not stack:
+                struct = value
+                continue
+            level = stack[-1]
+        elif kind == 'quoted':
+            value = dtype(_UNESCAPE_RE.sub(r'\1', match.group('quoted')))
+        else:
+            value = dtype(match.group('bare').rstrip())
+        
+        if level[2]:
+            raise ValueError("Badly formatted string (missing comma).")
+        level[1].append(value)
+        level[2] = True
+    
+    if stack or struct is None:
+        raise ValueError("Badly formatted string (unclosed brackets).")
+    return struct
+
 def surrounded_by_parens(string):
     """Determines if the string is surrounded in 
             (matching) parens of any sort"""
     return (string[0] + string[-1]) in ['()', '{}', '[]']
 
+class _PieceBuffer(object):
+    """StringBuilder backend: a list of pieces, joined on demand"""
+    __slots__ = ['pieces']
+    
+    def __init__(self):
+        self.pieces = []
+    
+    def append(self, string):
+        """Add string to the end"""
+        self.pieces.append(string)
+    
+    def clear(self):
+        """Empty the buffer"""
+        self.pieces = []
+    
+    def getvalue(self):
+        """Join the pieces down to one, and return it"""
+        if len(self.pieces) > 1:
+            self.pieces = [''.join(self.pieces)]
+        return self.pieces[0] if self.pieces else ""
+    
+    def write_to(self, fileobj):
+        """Write each piece to fileobj"""
+        fileobj.writelines(self.pieces)
+
+class _StringIOBuffer(object):
+    """StringBuilder backend: a cStringIO.StringIO"""
+    __slots__ = ['stream']
+    
+    def __init__(self):
+        self.stream = cStringIO.StringIO()
+    
+    def append(self, string):
+        """Add string to the end"""
+        self.stream.write(string)
+    
+    def clear(self):
+        """Empty the buffer"""
+        self.stream = cStringIO.StringIO()
+    
+    def getvalue(self):
+        """The buffer's contents"""
+        return self.stream.getvalue()
+    
+    def write_to(self, fileobj):
+        """Copy the buffer to fileobj, a chunk at a time"""
+        self.stream.seek(0)
+        shutil.copyfileobj(self.stream, fileobj)
+
+class _BytearrayBuffer(object):
+    """StringBuilder backend: a bytearray.  unicode is utf-8 encoded."""
+    __slots__ = ['data']
+    
+    def __init__(self):
+        self.data = bytearray()
+    
+    def append(self, string):
+        """Add string to the end"""
+        if isinstance(string, unicode):
+            string = string.encode('utf-8')
+        self.data += string
+    
+    def clear(self):
+        """Empty the buffer"""
+        self.data = bytearray()
+    
+    def getvalue(self):
+        """The buffer's contents"""
+        return str(self.data)
+    
+    def write_to(self, fileobj):
+        """Write the buffer to fileobj, without copying it to a string"""
+        fileobj.write(self.data)
+
+#StringBuilder backend name -> buffer class
+STRING_BUILDER_BACKENDS = {
+    'list': _PieceBuffer,
+    'stringio': _StringIOBuffer,
+    'bytearray': _BytearrayBuffer,
+    }
+
 class StringBuilder(object):
     """
     Helper class for building strings out of small pieces.
@@ -65,11 +330,14 @@ class StringBuilder(object):
     To force a compact, use build()
     
     To get the current string, call the StringBuilder object.
-    ie. myStringBuilder()
+    ie. myStringBuilder()  (or getvalue())
+    To stream the string to a file without building it, use write_to.
+    
+    len() is a running count, and never builds the string.
     """
-    __slots__ = ['_size', '_msize', '_data']
+    __slots__ = ['_size', '_msize', '_buffer', '_length']
     
-    def __init__(self, string=None, size = -1):
+    def __init__(self, string=None, size = -1, backend='list'):
         """
         StringBuilder is reduce string concat overhead.
         
@@ -92,13 +360,20 @@ class StringBuilder(object):
                 sb += "b" # size = 3 after call
                 sb += "!" # <-- THIS call compresses the pieces
                                 into one string internally
-        """     
-        if string:
-            self._data = [string]
-        else:
-            self._data = []
+        backend: where the string is built.
+                'list' :: a list of pieces (uses size)
+            'stringio' :: a cStringIO.StringIO
+           'bytearray' :: a bytearray.  unicode is utf-8 encoded,
+                            and len() counts bytes.
+        """
+        if backend not in STRING_BUILDER_BACKENDS:
+            raise ValueError("Backend {p} not recognized.".format(p=backend))
+        self._buffer = STRING_BUILDER_BACKENDS[backend]()
         self._msize = size
-        self._size = len(self._data)
+        self._size = 0
+        self._length = 0
+        if string:
+            self._append(string)
         
     def __add__(self, other):
         """x.__add__(y) <==> x+y"""
@@ -106,22 +381,13 @@ class StringBuilder(object):
     
     def __bool__(self):
         """Python 3.x of __nonzero__"""
-        if len(self._data) == 0:
-            return False
-        elif len(self._data) == 1:
-            return bool(self._data[0])
-        else:
-            return True
+        return self._length > 0
     
     def __call__(self):
         """Return the built string"""
         if self._size > 1:
-            self.build()
-            return self._data[0]
-        elif self._size == 1:
-            return self._data[0]
-        else:
-            return ""
+            self._size = 1
+        return self._buffer.getvalue()
         
     def __contains__(self, other):
         """x.__contains__(y) <==> y in x"""
@@ -129,7 +395,13 @@ class StringBuilder(object):
     
     def __eq__(self, other):
         """x.__eq__(y) <==> x==y"""
-        return self.__call__().__contains__(other)
+        if isinstance(other, StringBuilder):
+            if other._length != self._length:
+                return False
+            other = other()
+        elif isinstance(other, str) and len(other) != self._length:
+            return False
+        return self.__call__().__eq__(other)
     
     def __ge__(self, other):
         """x.__ge__(y) <==> x>=y"""
@@ -144,15 +416,20 @@ class StringBuilder(object):
     
     def __iadd__(self, other):
         """x.__iadd__(y) <==> x+=y"""
-        self._data.append(other)
-        self._size += 1
+        self._append(other)
         self._check_build()
         return self
     
     def __imul__(self, other):
         """x.__imul__(y) <==> x*=y"""
-        self._data *= other
-        self._size = len(self._data)
+        if isinstance(self._buffer, _PieceBuffer):
+            self._buffer.pieces *= other
+            self._size = len(self._buffer.pieces)
+            self._length = max(0, self._length * other)
+        else:
+            string = self.__call__() * other
+            self.clear()
+            self._append(string)
         self._check_build()
         return self
     
@@ -162,7 +439,7 @@ class StringBuilder(object):
     
     def __len__(self):
         """x.__len__() <==> len(x)"""
-        return self.__call__().__len__()
+        return self._length
     
     def __lt__(self, other):
         """x.__lt__(y) <==> x<y"""
@@ -174,7 +451,7 @@ class StringBuilder(object):
     
     def __ne__(self, other):
         """x.__ne__(y) <==> x!=y"""
-        return self.__call__().__ne__(other)
+        return not self.__eq__(other)
     
     __nonzero__ = __bool__
     
@@ -192,6 +469,15 @@ class StringBuilder(object):
         """x.__str__() <==> str(x)"""
         return self.__call__()
     
+    def _append(self, string):
+        """Add string to the buffer, keeping count of its length"""
+        self._buffer.append(string)
+        self._size += 1
+        if isinstance(self._buffer, _BytearrayBuffer) and \
+           isinstance(string, unicode):
+            string = string.encode('utf-8')
+        self._length += len(string)
+    
     def _check_build(self):
         """Check if the string needs to be compacted, and if so, build."""
         if self._msize > 0 and self._size >= self._msize:
@@ -199,16 +485,31 @@ class StringBuilder(object):
     
     def build(self):
         """Compact the string down in memory."""
-        _str = ''.join(self._data)
-        self._data = [_str]
-        self._size = 1
+        if isinstance(self._buffer, _PieceBuffer):
+            self._buffer.getvalue()
+        self._size = min(self._size, 1)
     
     def clear(self):
         """Clear the string back to the empty string"""
-        self._data = [""]
-        self._size = 1
+        self._buffer.clear()
+        self._size = 0
+        self._length = 0
+    
+    getvalue = __call__
+    
+    def write_to(self, fileobj):
+        """
+        Write the string to fileobj, without building it.
+        
+        Returns the number of characters written.
+        """
+        if self._length:
+            self._buffer.write_to(fileobj)
+        return self._length
         
     @property
     def data(self):
         """Returns a copy of the internal list that StringBuilder joins"""
-        return self._data[:]
\ No newline at end of file
+        if isinstance(self._buffer, _PieceBuffer):
+            return self._buffer.pieces[:]
+        return [self.__call__()]
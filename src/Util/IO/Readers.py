@@ -2,23 +2,82 @@
 Various file readers with performance profiles for specific implementations
 """
 
+import array
+import mmap
+import os
 import os.path
+import struct
+import time
+import _binlog
+
+#py2.7 arrays have no 'Q'; 'L' is 64 bits on LP64 platforms
+for _typecode in ('Q', 'L', 'd'):
+    try:
+        if array.array(_typecode).itemsize == 8:
+            OFFSET_TYPECODE = _typecode
+            break
+    except ValueError:
+        pass
+del _typecode
+
+#file size, file mtime, number of offsets
+_INDEX_HEADER = struct.Struct('<QdQ')
 
 class FullBufferedRead(object):
     """Reads an entire file into memory,
         allowing line-indexed searching.
-        First index is 0, NOT 1"""
-    def __init__(self, filename):
+        First index is 0, NOT 1
+    
+    With incremental, reload_file only reads lines appended since the
+        last load.  A truncated or replaced (rotated) file is reloaded
+        from the start.  A trailing line without a line return is held
+        back until it's complete.
+    Use follow() to stream new lines as they're written."""
+    def __init__(self, filename, incremental=False):
         self._lines = []
         self._is_loaded = False
         self._filename = filename
+        self._incremental = incremental
+        self._offset = 0
+        self._stat = None
         self.reload_file()
     
     def clear(self):
         """Clear the file from memory"""
         self._lines = None
         self._is_loaded = False
+        self._offset = 0
+        self._stat = None
+        
+    def follow(self, poll_interval=0.1, idle_timeout=None):
+        """
+        Returns a generator that yields lines as they're appended to the file.
         
+        Starts from the end of the file as of the call.
+        New lines are also kept, as with reload_file.  If the file is
+        truncated or rotated, yields the new file's lines from the start.
+        Polls every poll_interval seconds, and stops after idle_timeout
+        seconds without a new line (None to follow forever).
+        """
+        if self._stat is None:
+            self._load_new_lines()
+        return self._follow(poll_interval, idle_timeout)
+    
+    def _follow(self, poll_interval, idle_timeout):
+        """The generator behind follow, once the end of file is known."""
+        idle = 0.0
+        while True:
+            first_new = self._load_new_lines()
+            if first_new < len(self._lines):
+                idle = 0.0
+                for index in xrange(first_new, len(self._lines)):
+                    yield self._lines[index]
+            elif idle_timeout is not None and idle >= idle_timeout:
+                return
+            else:
+                time.sleep(poll_interval)
+                idle += poll_interval
+    
     def __getitem__(self, key):
         """Returns the line at the specified index"""
         if not self._is_loaded:
@@ -46,9 +105,45 @@ class FullBufferedRead(object):
                 self._lines.append(line)
         
         self._is_loaded = True
+    
+    def _load_new_lines(self):
+        """
+        Load lines appended since the last load.
+        
+        Returns the index of the first new line.
+        """
+        stat = os.stat(self._filename)
+        last = self._stat
+        if (not self._is_loaded or last is None or
+            (stat.st_dev, stat.st_ino) != (last.st_dev, last.st_ino) or
+            stat.st_size < self._offset):
+            #First load, rotated or truncated- start over
+            self._lines = []
+            self._offset = 0
+        elif stat.st_size == last.st_size and stat.st_mtime == last.st_mtime:
+            #Nothing written
+            return len(self._lines)
+        
+        first_new = len(self._lines)
+        #Binary mode so offsets are byte exact
+        with open(self._filename, 'rb', 8 << 10) as open_file:
+            open_file.seek(self._offset)
+            data = open_file.read()
+        
+        #Only take complete lines
+        end = data.rfind('\n') + 1
+        if end:
+            self._lines.extend(line + '\n' 
+                               for line in data[:end - 1].split('\n'))
+            self._offset += end
+        
+        self._stat = stat
+        self._is_loaded = True
+        return first_new
         
     def reload_file(self):
-        """Reload the file into memory."""
+        """Reload the file into memory.
+            Returns the index of the first new line (0 unless incremental)"""
         err_msg = None
         if (not hasattr(self, '_filename') 
             or self._filename is None):
@@ -58,7 +153,202 @@ class FullBufferedRead(object):
         
         if err_msg:
             raise IOError(err_msg)
+        elif self._incremental:
+            return self._load_new_lines()
         else:
             self._load_file()
+            return 0
+
+class MmapLineReader(object):
+    """
+    Memory-maps a file, allowing line-indexed reads without
+        loading the file into memory.
+        First index is 0, NOT 1
+    
+    Only an array of line offsets (8 bytes per line) is kept in memory.
+    Indexing returns a zero-copy buffer over the mapped line, including
+    its line return; use read_line for a str copy.
+    
+    With persist_index, the offsets are saved next to the file
+    (filename + INDEX_EXT) and reused on the next open, as long as
+    the file's size and mtime haven't changed.
+    """
+    INDEX_EXT = '.lidx'
+    
+    def __init__(self, filename, persist_index=False, buf_size=1024 * 1024):
+        if filename is None:
+            raise IOError("No file specified")
+        elif not os.path.isfile(filename):
+            raise IOError("File not found. ({})".format(filename))
+        
+        self._filename = filename
+        self._persist_index = persist_index
+        self._buf_size = buf_size
+        self._file = open(filename, 'rb')
+        self._size = os.fstat(self._file.fileno()).st_size
+        if self._size:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        else:
+            #Can't map an empty file
+            self._map = None
+        self._offsets = None
+        self._load_index()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def __getitem__(self, key):
+        """Returns a buffer over the line at the specified index"""
+        start, end = self._line_bounds(key)
+        return buffer(self._map, start, end - start)
+    
+    def __iter__(self):
+        for index in xrange(len(self)):
+            yield self[index]
+    
+    def __len__(self):
+        """Returns the number of lines in the file"""
+        if self._offsets is None:
+            return 0
+        return len(self._offsets) - 1
+    
+    def close(self):
+        """Unmap and close the file"""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._offsets = None
+    
+    @property
+    def index_filename(self):
+        """Where the line offsets are persisted"""
+        return self._filename + self.INDEX_EXT
+    
+    def read_line(self, index):
+        """Returns a copy of the line at the specified index"""
+        start, end = self._line_bounds(index)
+        return self._map[start:end]
+    
+    def _build_index(self):
+        """Scan the file once, in chunks, for the start of each line."""
+        offsets = array.array(OFFSET_TYPECODE, [0])
+        append = offsets.append # loop optimization
+        buf_size = self._buf_size
+        
+        base = 0
+        while base < self._size:
+            buf = self._map[base:base + buf_size]
+            find = buf.find
+            index = find('\n')
+            while index != -1:
+                append(base + index + 1)
+                index = find('\n', index + 1)
+            base += len(buf)
         
-            
\ No newline at end of file
+        #Last line has no line return
+        if offsets[-1] != self._size:
+            append(self._size)
+        return offsets
+    
+    def _line_bounds(self, index):
+        """Returns the start, end offsets of the line at index"""
+        if self._offsets is None:
+            err = "Error: tried to read a line on a closed file."
+            raise IOError(err)
+        nlines = len(self._offsets) - 1
+        if index < 0:
+            index += nlines
+        if not 0 <= index < nlines:
+            raise IndexError("line index out of range")
+        return int(self._offsets[index]), int(self._offsets[index + 1])
+    
+    def _load_index(self):
+        """Load persisted offsets if they're current, otherwise rebuild."""
+        mtime = os.path.getmtime(self._filename)
+        if self._persist_index:
+            offsets = self._read_index(mtime)
+            if offsets is not None:
+                self._offsets = offsets
+                return
+        
+        self._offsets = self._build_index()
+        if self._persist_index:
+            self._write_index(mtime)
+    
+    def _read_index(self, mtime):
+        """Returns the persisted offsets, or None if missing or stale."""
+        try:
+            with open(self.index_filename, 'rb') as index_file:
+                header = index_file.read(_INDEX_HEADER.size)
+                if len(header) != _INDEX_HEADER.size:
+                    return None
+                size, index_mtime, count = _INDEX_HEADER.unpack(header)
+                if size != self._size or index_mtime != mtime:
+                    return None
+                offsets = array.array(OFFSET_TYPECODE)
+                offsets.fromfile(index_file, count)
+        except (IOError, EOFError):
+            return None
+        return offsets
+    
+    def _write_index(self, mtime):
+        """Save the offsets next to the file."""
+        try:
+            with open(self.index_filename, 'wb') as index_file:
+                index_file.write(_INDEX_HEADER.pack(self._size, mtime,
+                                                    len(self._offsets)))
+                self._offsets.tofile(index_file)
+        except IOError:
+            #Read-only location; just rebuild next time
+            pass
+
+class BinaryLogReader(object):
+    """
+    Streams the records of a Writers.BinaryLogger file.
+    
+    The file is memory-mapped, and records are decoded one at a time as
+    they're iterated, so reading millions of records doesn't need them
+    in memory at once.  Records are LogRecord tuples of
+    (timestamp, tid, elapsed, msg_id, args).
+    A partly written last record (the logger is still writing) ends
+    iteration without an error; iterate again later for new records.
+    """
+    def __init__(self, filename):
+        if filename is None:
+            raise IOError("No file specified")
+        elif not os.path.isfile(filename):
+            raise IOError("File not found. ({})".format(filename))
+        self._filename = filename
+    
+    def __iter__(self):
+        return self.records()
+    
+    def records(self, msg_id=None):
+        """Generator of the file's records, only msg_id's if given"""
+        with open(self._filename, 'rb') as open_file:
+            size = os.fstat(open_file.fileno()).st_size
+            if not size:
+                return
+            mapped = mmap.mmap(open_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic = _binlog.MAGIC
+            if mapped[:len(magic)] != magic:
+                raise IOError("Not a binary log. ({})".format(self._filename))
+            offset = len(magic)
+            unpack = _binlog.unpack_record # loop optimization
+            while offset < size:
+                try:
+                    record, offset = unpack(mapped, offset)
+                except (struct.error, IndexError):
+                    return
+                if msg_id is None or record.msg_id == msg_id:
+                    yield record
+        finally:
+            mapped.close()
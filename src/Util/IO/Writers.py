@@ -4,8 +4,32 @@ Various file writers with performance profiles for specific implementations
 
 import Util.IO
 import Util.Time
+import Util.Timers
 import Util.Formatting
+import _binlog
 import functools
+import glob
+import gzip
+import os
+import os.path
+import Queue
+import shutil
+import threading
+import zlib
+
+#What an AsyncBufferedWriter does with a buffer when its queue is full
+ASYNC_POLICIES = ('block', 'drop_newest', 'drop_oldest')
+
+#Extension added to rotated segments by each RotatingLogger compression
+COMPRESSION_EXTS = {None: '', 'gzip': '.gz', 'zlib': '.zz'}
+
+#Tells the writer thread to stop
+_STOP = object()
+#Queued by AsyncRotatingLogger.force_rotate, handled in queue order
+_ROTATE = object()
+
+#Rotated segments are "{filename}.{sequence}", then any compression ext
+_SEGMENT_FMT = "{}.{:06}"
 
 class BufferedWriter(object):
     """
@@ -18,18 +42,40 @@ class BufferedWriter(object):
                   in memory.
         > 0 :: Once the stored data size passes the buffer_size,
                     memory is written to file.
+    flush_interval
+        None :: No time limit.
+        > 0  :: Memory is also written to file on the first write at least
+                    flush_interval seconds after the last write to file.
+    
+    The file is opened (for append) on the first write to file, and kept
+    open until close().  Can be used as a context manager, which closes
+    the writer on exit.
     """
-    def __init__(self, filename, buffer_size=0):
+    _file_mode = 'a'
+    
+    def __init__(self, filename, buffer_size=0, flush_interval=None):
         self._filename = filename
         Util.IO.ensfile(filename)
         self._buffer_size = buffer_size
         self._current_buffer_size = 0
         self._data = Util.Formatting.StringBuilder()
+        self._file = None
+        self._flush_interval = flush_interval
+        self._last_flush = Util.Time.time.time()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
     
     def close(self):
         """Close the file, writing anything still in memory to file."""
         if self._data:
             self._write_data_to_file()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
         self._buffer_size = None
         self._filename = None
         self._data = None
@@ -37,6 +83,7 @@ class BufferedWriter(object):
     def force_write_to_file(self):
         """Write memory to file, regardless of buffer size."""
         self._write_data_to_file()
+    flush = force_write_to_file
     
     def write(self, data):
         """Write data directly to the buffer"""
@@ -60,33 +107,188 @@ class BufferedWriter(object):
         return self._current_buffer_size
     CurrentBufferSize = property(_get_c_buffer_size)
     
+    def _get_flush_interval(self):
+        """Get flush interval (seconds)"""
+        return self._flush_interval
+    def _set_flush_interval(self, value):
+        """Set flush interval (seconds)"""
+        self._flush_interval = value
+        self._check_buffer()
+    FlushInterval = property(_get_flush_interval, _set_flush_interval)
+    
     def _check_buffer(self, write_on_full=True):
-        """Check the buffer for overflow, write memory to file if full."""
+        """Check the buffer for overflow or age, 
+            write memory to file if full."""
         was_full = is_full = False
-        if (self._current_buffer_size >= self._buffer_size and
-            self._buffer_size >= 0):
+        if ((self._current_buffer_size >= self._buffer_size and
+             self._buffer_size >= 0) or self._is_stale()):
             was_full = is_full = True
             if write_on_full:
                 self._write_data_to_file()
                 is_full = False
         return was_full, is_full
     
+    def _is_stale(self):
+        """True if memory hasn't been written for flush_interval seconds"""
+        if self._flush_interval is None or not self._current_buffer_size:
+            return False
+        elapsed = Util.Time.time.time() - self._last_flush
+        return elapsed >= self._flush_interval
+    
+    def _open_file(self):
+        """Returns the open file, opening it if needed."""
+        if self._file is None:
+            self._file = open(self._filename, self._file_mode, 8 << 10)
+        return self._file
+    
     def _write(self, data):
         """Write to memory, check for overflow"""
         self._data += data
         self._current_buffer_size += len(data)
         self._check_buffer()
     
+    def _write_chunk(self, chunk, flush=True):
+        """Write a chunk of memory (a string or StringBuilder) to the open file
+        """
+        writefile = self._open_file()
+        if isinstance(chunk, Util.Formatting.StringBuilder):
+            chunk.write_to(writefile)
+        else:
+            writefile.write(chunk)
+        if flush:
+            writefile.flush()
+    
     def _write_data_to_file(self):
         """Write memory to file, clear memory"""
-        with open(self._filename, 'a', 8 << 10) as writefile:
-            writefile.write(self._data())
+        if self._current_buffer_size:
+            #Stream the pieces, instead of joining them first
+            self._write_chunk(self._data)
         self._data.clear()
         self._current_buffer_size = 0
+        self._last_flush = Util.Time.time.time()
         
     def __len__(self):
         """Same as CurrentBufferSize"""
-        return len(self._data)
+        return self._current_buffer_size
+
+class AsyncBufferedWriter(BufferedWriter):
+    """
+    BufferedWriter that writes to file on a background thread.
+    
+    Full buffers are handed to a dedicated writer thread through a queue
+    that holds at most queue_size buffers, so writing only costs an append
+    (and a queue put per full buffer) even when the disk is slow.
+    When the queue is full, policy decides what happens to the buffer:
+          block     :: wait for the writer thread to catch up
+        drop_newest :: discard the buffer being handed off
+        drop_oldest :: discard the oldest buffer still in the queue
+    Dropped buffers are counted in Dropped.
+    
+    force_write_to_file (and flush) block until everything written so far
+    is on file.  close() also stops the writer thread.
+    Errors on the writer thread are raised on the next write to file.
+    """
+    def __init__(self, filename, buffer_size=8 << 10, flush_interval=None,
+                 queue_size=64, policy='block'):
+        BufferedWriter.__init__(self, filename, buffer_size, flush_interval)
+        self._start_writer(queue_size, policy)
+    
+    def close(self):
+        """Write anything still in memory, stop the writer and close the file.
+        """
+        if self._thread is None:
+            return
+        try:
+            if self._data:
+                self._write_data_to_file(True)
+        finally:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._buffer_size = None
+            self._filename = None
+            self._data = None
+        self._raise_writer_error()
+    
+    def force_write_to_file(self):
+        """Write memory to file, and wait until it's on file."""
+        self._write_data_to_file(True)
+        self._queue.join()
+        self._raise_writer_error()
+    flush = force_write_to_file
+    
+    def _get_dropped(self):
+        """Number of buffers dropped because the queue was full"""
+        return self._dropped
+    Dropped = property(_get_dropped)
+    
+    def _enqueue(self, chunk, block):
+        """Hand a chunk to the writer thread, following the queue policy"""
+        if block or self._policy == 'block':
+            self._queue.put(chunk)
+            return
+        while True:
+            try:
+                self._queue.put_nowait(chunk)
+                return
+            except Queue.Full:
+                if self._policy == 'drop_newest':
+                    self._dropped += 1
+                    return
+            #drop_oldest- make room and try again
+            try:
+                self._queue.get_nowait()
+            except Queue.Empty:
+                continue
+            self._queue.task_done()
+            self._dropped += 1
+    
+    def _raise_writer_error(self):
+        """Raise (once) any error from the writer thread"""
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+    
+    def _run_writer(self):
+        """Writer thread: write queued chunks until told to stop."""
+        queue = self._queue
+        while True:
+            chunk = queue.get()
+            try:
+                if chunk is _STOP:
+                    return
+                if self._error is None:
+                    #Batch up flushes while there's a backlog
+                    self._write_chunk(chunk, queue.empty())
+            except Exception as err: #pylint:disable-msg=W0703
+                self._error = err
+            finally:
+                queue.task_done()
+    
+    def _start_writer(self, queue_size, policy):
+        """Set up the queue and start the writer thread"""
+        if policy not in ASYNC_POLICIES:
+            raise ValueError("Policy {p} not recognized.".format(p=policy))
+        self._policy = policy
+        self._queue = Queue.Queue(queue_size)
+        self._dropped = 0
+        self._error = None
+        self._thread = threading.Thread(target=self._run_writer,
+                                        name="writer:" + self._filename)
+        self._thread.daemon = True
+        self._thread.start()
+    
+    def _write_data_to_file(self, block=False):
+        """Hand memory to the writer thread, clear memory"""
+        self._raise_writer_error()
+        if self._current_buffer_size:
+            self._enqueue(self._data(), block)
+        self._data.clear()
+        self._current_buffer_size = 0
+        self._last_flush = Util.Time.time.time()
 
 class Logger(BufferedWriter):
     """
@@ -94,6 +296,8 @@ class Logger(BufferedWriter):
     
     You do not need to manage your timer ids (tid) directly
         unless you will be starting and stopping timers non-consecutively.
+    Stopping w/o a tid stops the most recently started timer that's
+        still running.
     In either case (manual management or auto) logging a message w/o a tid
         will tell the Logger to use the last tid that was stopped.
     This assumption allows you to, in code, do the following:
@@ -108,8 +312,12 @@ class Logger(BufferedWriter):
         
     If the logger will be writing lines constantly,
     consider using a buffer_size ~= 8 << 10 or larger.
-    Otherwise, you'll be opening and closing the file on every write.
+    Otherwise, you'll be flushing to the file on every write.
         (which is good in some cases)
+    Use flush_interval to bound how stale the file can get.
+    
+    Timers are kept in a Util.Timers.TimerRegistry (see Timers), which
+    also keeps running stats for named timers, such as log_func_time's.
     
     To log execution of something, you can do any of the following:
         - use the log_func_time decorator
@@ -121,12 +329,11 @@ class Logger(BufferedWriter):
         - log_message to log without any timing information
     """
     
-    def __init__(self, filename, buffer_size=0):
-        BufferedWriter.__init__(self, filename, buffer_size)
-        self._next_tid = [0, 0]
-        self._time_start = {}
-        self._time_end = {}
-        self._last_tid = None
+    def __init__(self, filename, buffer_size=0, flush_interval=None):
+        BufferedWriter.__init__(self, filename, buffer_size, flush_interval)
+        self._timers = Util.Timers.TimerRegistry()
+        self._fmt_time_at = None
+        self._fmt_time = None
         
     def start(self, tid=None):
         """
@@ -135,31 +342,17 @@ class Logger(BufferedWriter):
         Leaving tid blank gives you the next timer, which is a good idea
         for logging sequential events.
         """
-        if tid is None:
-            tid = self._next_tid[0]
-            self._next_tid[0] += 1
-            self._next_tid[1] = self._next_tid[0]
-        self._time_start[tid] = Util.Time.time.time()
-        return tid
+        return self._timers.start(tid)
 
     def stop(self, tid=None):
         """
         Stop a timer.  tid is a timer id.
         
-        Leaving tid blank uses the next timer, which is a good idea
-        for logging sequential events.
+        Leaving tid blank stops the most recently started timer
+        that's still running, which is a good idea for logging
+        sequential (or nested) events.
         """
-        if tid is None:
-            for ptid in xrange(self._next_tid[1] - 1, -1, -1):
-                if ptid not in self._time_end:
-                    tid = ptid
-                    break
-            if tid is None:
-                tid = self._next_tid[1]
-            self._next_tid[1] -= 1
-        self._time_end[tid] = Util.Time.time.time()
-        self._last_tid = tid
-        return tid
+        return self._timers.stop(tid)
 
     def log_message(self, msg, out=False):
         """Log a message."""
@@ -169,8 +362,13 @@ class Logger(BufferedWriter):
 
     def log_message_with_time(self, msg, out=False):
         """Log a message, prepended with the time."""
-        now = Util.Time.log_fmt_time()
-        self.log_message(now + " " + msg, out)
+        #Only re-format once per second
+        now = int(Util.Time.time.time())
+        if now != self._fmt_time_at:
+            self._fmt_time_at = now
+            self._fmt_time = Util.Time.log_fmt_time(
+                Util.Time.time.localtime(now))
+        self.log_message(self._fmt_time + " " + msg, out)
 
     def log_message_with_elapsed(self, msg, out=False, tid=None):
         """
@@ -179,38 +377,318 @@ class Logger(BufferedWriter):
         If no tid is provided, uses the last tid from stop() 
         as time information.
         """
-        if tid is None:
-            tid = self._last_tid
-        try:
-            dtime = self._time_end[tid] - self._time_start[tid]
-        except: #pylint:disable-msg=W0702
-            dtime = 0
-            
+        dtime = self._elapsed(tid)
+
         hrs, mins, sec, msec = Util.Time.split_time(dtime)
         msg += " ({:02}:{:02}:{:02}::{:03})".format(hrs, mins, sec, msec)
         
         self.log_message(msg, out)
 
+    def _elapsed(self, tid):
+        """
+        Seconds between the start and stop of a timer, 0 if unknown.
+        
+        tid None uses the last tid from stop().
+        """
+        return self._timers.elapsed(tid)
+
     def log_func_time(self, func):
         """Wrapper for logging a function's execution time"""
         
         @functools.wraps(func)
         def wrapper(*arg, **kwargs): #pylint:disable-msg=C0111
-            tid = func.func_name
-            self.start(tid)
-            res = func(*arg, **kwargs)
-            self.stop(tid)
-            msg = "{} complete".format(tid)
-            self.log_message_with_elapsed(msg, tid)
+            name = func.func_name
+            with self._timers.timed(name) as tid:
+                res = func(*arg, **kwargs)
+            msg = "{} complete".format(name)
+            self.log_message_with_elapsed(msg, tid=tid)
             return res
         return wrapper
+    
+    def _get_timers(self):
+        """The TimerRegistry behind start() and stop()"""
+        return self._timers
+    Timers = property(_get_timers)
+
+class AsyncLogger(AsyncBufferedWriter, Logger):
+    """
+    Logger that writes to file on a background thread.
+    
+    See Logger for logging, and AsyncBufferedWriter for
+    queue_size and policy.
+    """
+    def __init__(self, filename, buffer_size=8 << 10, flush_interval=None,
+                 queue_size=64, policy='block'):
+        Logger.__init__(self, filename, buffer_size, flush_interval)
+        self._start_writer(queue_size, policy)
+
+class BinaryLogger(Logger):
+    """
+    Logger that writes compact binary records instead of text lines.
+    
+    Every record holds a timestamp, a timer id, elapsed time (for that
+    timer), a message id and a tuple of args (None, ints, floats or strings).
+    Timestamps are stored as seconds since the epoch, so nothing is
+    formatted while logging.
+    The text methods (log_message, etc.) log a MSG_TEXT record with the
+    text as the only arg, so a BinaryLogger can stand in for a Logger.
+    
+    Read the records back with Util.IO.Readers.BinaryLogReader.
+    """
+    MSG_TEXT = 0
+    _file_mode = 'ab'
+    
+    def __init__(self, filename, buffer_size=8 << 10, flush_interval=None):
+        Logger.__init__(self, filename, buffer_size, flush_interval)
+        if not os.path.getsize(filename):
+            self._write(_binlog.MAGIC)
+    
+    def log_record(self, msg_id, *args, **kwargs):
+        """
+        Log a record with message id msg_id and args.
+        
+        Pass tid=timer id to record the timer and its elapsed time.
+        """
+        tid = kwargs.get('tid', None)
+        elapsed = 0.0 if tid is None else self._elapsed(tid)
+        self._write(_binlog.pack_record(Util.Time.time.time(), tid,
+                                        elapsed, msg_id, args))
+    
+    def log_message(self, msg, out=False):
+        """Log a text message."""
+        self.log_record(self.MSG_TEXT, msg)
+        if out:
+            print msg
+    
+    def log_message_with_time(self, msg, out=False):
+        """Log a text message.  Every record has the time."""
+        self.log_message(msg, out)
+    
+    def log_message_with_elapsed(self, msg, out=False, tid=None):
+        """
+        Log a text message, with the timer's elapsed time.
+        
+        If no tid is provided, uses the last tid from stop().
+        """
+        if tid is None:
+            tid = self._timers.LastTid
+        self.log_record(self.MSG_TEXT, msg, tid=tid)
+        if out:
+            print msg
+
+class RotatingLogger(Logger):
+    """
+    Logger that rotates its file by size and/or age.
+    
+    Before a write to file that would take the file past max_bytes, or
+    once the file has been open for max_age seconds, the file is renamed
+    to the next segment "{filename}.{sequence}" and a new file is started.
+    Segment sequence numbers keep counting up across restarts, so
+    segments sort in the order they were written.
+    
+    Rotation only costs a rename on the writing thread.  Rotated segments
+    are handed (in order) to a background thread, which compresses them
+    (compression is 'gzip', 'zlib' or None) and then deletes the oldest
+    segments past backup_count (None keeps every segment).
+    close() waits for the background thread to finish.
+    """
+    def __init__(self, filename, buffer_size=0, flush_interval=None,
+                 max_bytes=None, max_age=None, backup_count=5,
+                 compression='gzip'):
+        if compression not in COMPRESSION_EXTS:
+            msg = "Compression {c} not recognized."
+            raise ValueError(msg.format(c=compression))
+        Logger.__init__(self, filename, buffer_size, flush_interval)
+        self._init_rotation(max_bytes, max_age, backup_count, compression)
+    
+    def close(self):
+        """Close the file, and wait for segments to finish compressing."""
+        Logger.close(self)
+        self._compressor.close()
+    
+    def force_rotate(self):
+        """Write memory to file, then rotate regardless of size and age."""
+        self.force_write_to_file()
+        self._rotate()
+    
+    def _init_rotation(self, max_bytes, max_age, backup_count, compression):
+        """Set up rotation state, continuing any existing segment numbers"""
+        self._max_bytes = max_bytes
+        self._max_age = max_age
+        self._file_bytes = 0
+        self._opened_at = None
+        sequences = [seq for seq, _ in _segments(self._filename)]
+        self._sequence = max(sequences) if sequences else 0
+        self._compressor = _SegmentCompressor(self._filename, backup_count,
+                                              compression)
+    
+    def _open_file(self):
+        """Returns the open file, opening it (and noting its size) if needed
+        """
+        if self._file is None:
+            Logger._open_file(self)
+            self._file_bytes = os.fstat(self._file.fileno()).st_size
+            self._opened_at = Util.Time.time.time()
+        return self._file
+    
+    def _rotate(self):
+        """Close the file, rename it to the next segment and queue it"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if not (os.path.exists(self._filename) and
+                os.path.getsize(self._filename)):
+            return
+        self._sequence += 1
+        segment = _SEGMENT_FMT.format(self._filename, self._sequence)
+        os.rename(self._filename, segment)
+        self._compressor.submit(segment)
+    
+    def _should_rotate(self, nbytes):
+        """True if writing nbytes more should go to a new file"""
+        if self._file is None:
+            return False
+        if (self._max_bytes is not None and self._file_bytes and
+            self._file_bytes + nbytes > self._max_bytes):
+            return True
+        return (self._max_age is not None and
+                Util.Time.time.time() - self._opened_at >= self._max_age)
+    
+    def _write_chunk(self, chunk, flush=True):
+        """Write a chunk to file, rotating first if needed"""
+        if self._should_rotate(len(chunk)):
+            self._rotate()
+        Logger._write_chunk(self, chunk, flush)
+        self._file_bytes += len(chunk)
+
+class AsyncRotatingLogger(AsyncBufferedWriter, RotatingLogger):
+    """
+    RotatingLogger that writes (and rotates) on a background thread.
+    
+    See RotatingLogger and AsyncBufferedWriter.
+    """
+    def __init__(self, filename, buffer_size=8 << 10, flush_interval=None,
+                 max_bytes=None, max_age=None, backup_count=5,
+                 compression='gzip', queue_size=64, policy='block'):
+        RotatingLogger.__init__(self, filename, buffer_size, flush_interval,
+                                max_bytes, max_age, backup_count, compression)
+        self._start_writer(queue_size, policy)
+    
+    def close(self):
+        """Stop the writer, and wait for segments to finish compressing."""
+        AsyncBufferedWriter.close(self)
+        self._compressor.close()
+    
+    def force_rotate(self):
+        """Write memory to file, then rotate regardless of size and age."""
+        #Rotation happens on the writer thread, after what's queued
+        self._write_data_to_file(True)
+        self._enqueue(_ROTATE, True)
+        self._queue.join()
+        self._raise_writer_error()
+    
+    def _write_chunk(self, chunk, flush=True):
+        """Write a chunk to file, or rotate if it's the rotate marker"""
+        if chunk is _ROTATE:
+            self._rotate()
+        else:
+            RotatingLogger._write_chunk(self, chunk, flush)
+
+class _SegmentCompressor(object):
+    """
+    Compresses rotated segments and enforces retention, on its own thread.
+    
+    The thread is started on the first segment.
+    """
+    def __init__(self, filename, backup_count, compression):
+        self._filename = filename
+        self._backup_count = backup_count
+        self._compression = compression
+        self._queue = Queue.Queue()
+        self._thread = None
+    
+    def close(self):
+        """Finish every submitted segment, and stop the thread."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+    
+    def submit(self, segment):
+        """Queue a rotated segment"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run,
+                                            name="rotate:" + self._filename)
+            self._thread.daemon = True
+            self._thread.start()
+        self._queue.put(segment)
+    
+    def _compress(self, segment):
+        """Compress the segment next to itself, then remove it"""
+        target = segment + COMPRESSION_EXTS[self._compression]
+        temp = target + '.tmp'
+        with open(segment, 'rb') as source:
+            if self._compression == 'gzip':
+                with gzip.open(temp, 'wb') as dest:
+                    shutil.copyfileobj(source, dest, 1 << 20)
+            else:
+                compressor = zlib.compressobj()
+                with open(temp, 'wb') as dest:
+                    for chunk in iter(lambda: source.read(1 << 20), ''):
+                        dest.write(compressor.compress(chunk))
+                    dest.write(compressor.flush())
+        os.rename(temp, target)
+        os.remove(segment)
+    
+    def _prune(self):
+        """Remove the oldest segments past backup_count"""
+        if self._backup_count is None:
+            return
+        segments = _segments(self._filename)
+        for _, path in segments[:max(0, len(segments) - self._backup_count)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
+    def _run(self):
+        """Compressor thread: handle segments until told to stop."""
+        while True:
+            segment = self._queue.get()
+            if segment is _STOP:
+                return
+            try:
+                if self._compression is not None:
+                    self._compress(segment)
+                self._prune()
+            except (IOError, OSError):
+                #Leave the segment as is; it's still on disk
+                pass
+
+def _segments(filename):
+    """Returns sorted (sequence, path) for the rotated segments of filename
+    """
+    segments = []
+    prefix = filename + '.'
+    for path in glob.glob(prefix + '*'):
+        parts = path[len(prefix):].split('.', 1)
+        if parts[0].isdigit() and (len(parts) == 1 or
+                                   parts[1] in ('gz', 'zz')):
+            segments.append((int(parts[0]), path))
+    segments.sort()
+    return segments
 
-def make_log(name, use_date=True):
+def make_log(name, use_date=True, async_write=False, **kwargs):
     """
     Make a logfile with name "{name}_{datetime}" if use_date
     
     Otherwise makes a log file with name "{name}".
     name should be the FULL PATH (without extension)
+    If async_write, makes an AsyncLogger.
+    If max_bytes or max_age are given, makes a RotatingLogger
+        (or AsyncRotatingLogger).  backup_count and compression
+        are only allowed with those.
+    Other kwargs are passed to the logger.
     """
     now = Util.Time.file_fmt_datetime()
     ext = '.log'
@@ -221,4 +699,17 @@ def make_log(name, use_date=True):
         filename = name
     
     filename += ext
-    return Logger(filename)
+    rotating = 'max_bytes' in kwargs or 'max_age' in kwargs
+    if not rotating:
+        for option in ('backup_count', 'compression'):
+            if option in kwargs:
+                msg = ("Option {o} not recognized without max_bytes "
+                       "or max_age.")
+                raise ValueError(msg.format(o=option))
+    if async_write and rotating:
+        return AsyncRotatingLogger(filename, **kwargs)
+    elif async_write:
+        return AsyncLogger(filename, **kwargs)
+    elif rotating:
+        return RotatingLogger(filename, **kwargs)
+    return Logger(filename, **kwargs)
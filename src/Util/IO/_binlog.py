@@ -0,0 +1,88 @@
+"""
+Binary log record format, shared by Writers.BinaryLogger
+and Readers.BinaryLogReader
+
+A log file is MAGIC followed by records, back to back.
+A record is a HEADER (timestamp, elapsed, message id, arg count),
+followed by the timer id and then each arg as tagged values.
+A tagged value is a 1 byte tag, followed by:
+    n :: nothing (None)
+    i :: signed 64 bit int
+    f :: double
+    s :: unsigned 32 bit length, then that many bytes of utf-8
+All numbers are little-endian.
+"""
+
+import collections
+import struct
+
+MAGIC = 'UICBLOG1'
+
+#timestamp, elapsed, message id, arg count
+HEADER = struct.Struct('<ddHB')
+
+_INT = struct.Struct('<cq')
+_FLOAT = struct.Struct('<cd')
+_STR = struct.Struct('<cI')
+
+LogRecord = collections.namedtuple('LogRecord',
+                                   'timestamp tid elapsed msg_id args')
+
+def pack_record(timestamp, tid, elapsed, msg_id, args):
+    """Returns the bytes of a record"""
+    if len(args) > 255:
+        raise ValueError("Records hold at most 255 args.")
+    parts = [HEADER.pack(timestamp, elapsed, msg_id, len(args))]
+    _pack_value(tid, parts)
+    for arg in args:
+        _pack_value(arg, parts)
+    return ''.join(parts)
+
+def unpack_record(data, offset):
+    """
+    Returns the record at data[offset:], and the offset after it.
+
+    data can be a str or an mmap.  Raises struct.error if the record
+    runs past the end of data.
+    """
+    timestamp, elapsed, msg_id, nargs = HEADER.unpack_from(data, offset)
+    offset += HEADER.size
+    tid, offset = _unpack_value(data, offset)
+    args = []
+    for _ in xrange(nargs):
+        arg, offset = _unpack_value(data, offset)
+        args.append(arg)
+    return LogRecord(timestamp, tid, elapsed, msg_id, tuple(args)), offset
+
+def _pack_value(value, parts):
+    """Appends the tagged bytes of value to parts"""
+    if value is None:
+        parts.append('n')
+    elif isinstance(value, (int, long)):
+        parts.append(_INT.pack('i', value))
+    elif isinstance(value, float):
+        parts.append(_FLOAT.pack('f', value))
+    else:
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        else:
+            value = str(value)
+        parts.append(_STR.pack('s', len(value)))
+        parts.append(value)
+
+def _unpack_value(data, offset):
+    """Returns the tagged value at data[offset:], and the offset after it"""
+    tag = data[offset]
+    if tag == 'n':
+        return None, offset + 1
+    elif tag == 'i':
+        return _INT.unpack_from(data, offset)[1], offset + _INT.size
+    elif tag == 'f':
+        return _FLOAT.unpack_from(data, offset)[1], offset + _FLOAT.size
+    elif tag == 's':
+        size = _STR.unpack_from(data, offset)[1]
+        start = offset + _STR.size
+        if start + size > len(data):
+            raise struct.error("Record runs past the end of data.")
+        return data[start:start + size], start + size
+    raise ValueError("Unknown value tag {!r} at {}".format(tag, offset))
@@ -2,31 +2,91 @@
 IO common functions
 """
 
-__all__ = ['bufcount', 'ensdir', 'ensfile', 'remove_file']
+__all__ = ['bufcount', 'count_many', 'ensdir', 'ensfile', 'remove_file']
 
+import mmap
+import multiprocessing
 import os
 import os.path
 
-def bufcount(filename):
+#Files (or batches) smaller than this are counted in-process
+PARALLEL_MIN_SIZE = 64 << 20
+
+_BUF_SIZE = 1 << 20
+_RANGE_SIZE = 16 << 20
+
+def bufcount(filename, workers=None):
     """
     Counts the number of lines in a file quickly.
     
-    Code from (with minor change):
-    http://stackoverflow.com/questions/
-    845058/how-to-get-line-count-cheaply-in-python
+    The file is mapped and counted in binary mode.  Files of at least
+    PARALLEL_MIN_SIZE bytes are split into ranges that are counted
+    concurrently by a pool of workers processes (default is one per cpu).
+    Use workers=1 to always count in this process.
+    
+    On Windows, callers that may count in parallel must be guarded by
+    if __name__ == '__main__' (see multiprocessing).
+    """
+    return count_many([filename], workers)[0]
+
+def count_many(filenames, workers=None):
+    """
+    Counts the number of lines in each of filenames.
+    
+    Returns the counts in the same order as filenames.
+    Ranges from every file share a single pool of workers, so a batch of
+    small files and one huge file are balanced the same way.
+    See bufcount for details.
     """
+    filenames = list(filenames)
+    tasks = []
+    owners = []
+    total_size = 0
+    for index, filename in enumerate(filenames):
+        size = _file_size(filename)
+        total_size += size
+        for start in xrange(0, size, _RANGE_SIZE):
+            tasks.append((filename, start, min(start + _RANGE_SIZE, size)))
+            owners.append(index)
     
-    with open(filename) as fname:                  
-        lines = 0
-        buf_size = 1024 * 1024
-        read_f = fname.read # loop optimization
+    if total_size < PARALLEL_MIN_SIZE or workers == 1 or len(tasks) < 2:
+        results = [_count_range(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            results = pool.map(_count_range, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    
+    counts = [0] * len(filenames)
+    for index, lines in zip(owners, results):
+        counts[index] += lines
+    return counts
+
+def _count_range(task):
+    """
+    Counts the line returns in bytes [start, end) of a file.
     
-        buf = read_f(buf_size)
-        while buf:
-            lines += buf.count('\n')
-            buf = read_f(buf_size)
+    task is a (filename, start, end) tuple so that ranges can be
+    mapped over a process pool.
+    """
+    filename, start, end = task
+    with open(filename, 'rb') as open_file:
+        mapped = mmap.mmap(open_file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        lines = 0
+        for pos in xrange(start, end, _BUF_SIZE):
+            lines += mapped[pos:min(pos + _BUF_SIZE, end)].count('\n')
+    finally:
+        mapped.close()
     return lines
 
+def _file_size(filename):
+    """Returns the size of the file, raising IOError if it can't be read."""
+    with open(filename, 'rb') as open_file:
+        return os.fstat(open_file.fileno()).st_size
+
 def ensdir(path):
     """
     Ensures that the folder exists.  
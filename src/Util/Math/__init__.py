@@ -6,6 +6,9 @@ Sub-modules will include (basic) 2d vectors and funcitons on them.
 import digits
 import factors
 import primes
+import random_stream
 import sequences
+import vectorized
 
 from _lib import * #pylint:disable-msg=W0401
+from random_stream import RandomStream
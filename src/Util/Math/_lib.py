@@ -7,8 +7,10 @@ __all__ = ['PI', 'angle_from_vector', 'clamp', 'cos', 'distance', 'fwrap',
            'mk_rand_with_gap_fn', 'mk_rot_fn', 'mk_wrap_fn', 'normalize',
            'rand', 'rand_with_gap', 'randint', 'rotate', 'sin', 'unit']
 
+import functools
 import math, random
 import trig_tables
+import vectorized
 
 PI = math.pi
 _TT_COS = trig_tables.COS
@@ -33,9 +35,16 @@ def cos(theta):
     return _TT_COS[index]
 
 def distance(pt1, pt2):
-    """Checks the distance between two vectors pt1, pt2"""
+    """
+    Checks the distance between two vectors pt1, pt2
+    
+    pt1 and pt2 can also be N x D (sequences of N points), in which case
+    the N distances between each pair of points are returned.
+    """
     if len(pt1) != len(pt2):
         raise IndexError("Unequal length vectors")
+    if len(pt1) and hasattr(pt1[0], '__len__'):
+        return vectorized.distance(pt1, pt2)
     sum_ = 0.0
     for pt1, pt2 in zip(pt1, pt2):
         sum_ += (pt2 - pt1) ** 2.0
@@ -77,19 +86,30 @@ def limit_vector(vec_x, vec_y, mag_max):
         return vec_x * mag_max, vec_y * mag_max
     return vec_x, vec_y
 
-def mk_rand_fn(min_, max_):
-    """Returns a function that gives random floats on [min_, max_)"""
+def mk_rand_fn(min_, max_, stream=None):
+    """
+    Returns a function that gives random floats on [min_, max_)
+    
+    Values come from stream (a RandomStream) if one is given,
+    otherwise from the global random module.
+    """
+    if stream is not None:
+        return functools.partial(stream.rand, min_, max_)
     def rnd_():
         """Returns a random float on [min_, max_)"""
         return rand(min_, max_)
     return rnd_
 
-def mk_rand_with_gap_fn(min_, max_):
+def mk_rand_with_gap_fn(min_, max_, stream=None):
     """
     Returns a function that creates random values on a discontinuous range 
     
     [-max_,-min_] or [min_,max_]
+    Values come from stream (a RandomStream) if one is given,
+    otherwise from the global random module.
     """
+    if stream is not None:
+        return functools.partial(stream.rand_with_gap, min_, max_)
     def rnd():
         """Returns a random value on [-max_,-min_] or [min_,max_]"""
         return rand_with_gap(min_, max_)
@@ -111,29 +131,12 @@ def mk_wrap_fn(min_, max_):
 
 def normalize(vals):
     """
-    Returns a normalized list
+    Returns normalized values, in a buffer of the same kind as vals
     
-    When the values are all within 1E-8, returns a list of [1.0 / len(vals)]
+    When the values are all within 1E-8, every value is 1.0 / len(vals)
     """
-    
-    size = len(vals)
-    norm_vals = [0]*size
-    
-    if size == 1:
-        norm_vals[0] = 1.0
-    else:
-        #Size > 1
-        min_ = float(min(vals))
-        max_ = float(max(vals))
-        if is_zero(max_ - min_):
-            norm_vals = [1.0 / size] * size
-        else:
-            for i in xrange(size):
-                norm_vals[i] = (vals[i] - min_) / (max_ - min_)
-    
-    return norm_vals
-    
-    
+    return vectorized.normalize(vals)
+
 def rand(min_, max_):
     """Returns a random float on [min_, max_)"""
     return lerp(min_, max_, random.random())
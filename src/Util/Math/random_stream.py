@@ -0,0 +1,173 @@
+"""
+Seeded random number streams.
+
+A RandomStream owns its own generator, so its values are reproducible
+from its seed, and it doesn't share state (or a lock) with the global
+random module.  Streams can fill a whole buffer per call, and can spawn
+independent substreams to hand out to parallel workers.
+"""
+
+__all__ = ['RandomStream']
+
+import array
+import hashlib
+import os
+import random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_NO_NUMPY_ERR = "NumPy is not installed; can't use a NumPy-backed stream."
+
+def _seed_words(seed):
+    """Splits a (long) seed into the 32 bit words NumPy seeds with"""
+    words = []
+    while True:
+        words.append(seed & 0xffffffff)
+        seed >>= 32
+        if not seed:
+            return words
+
+class RandomStream(object):
+    """
+    A reproducible stream of random values.
+
+    seed: any non-negative integer.  Streams with the same seed produce
+            the same values.  A random seed is picked when None.
+    use_numpy: fill buffers with NumPy, returning ndarrays instead of
+            array.array buffers.  Scalar calls are unaffected.
+    """
+    def __init__(self, seed=None, use_numpy=False):
+        if seed is None:
+            seed = int(os.urandom(8).encode('hex'), 16)
+        elif seed < 0:
+            raise ValueError("Seed {s} not recognized.".format(s=seed))
+        self._seed = seed
+        self._random = random.Random(seed)
+        if use_numpy:
+            if numpy is None:
+                raise ImportError(_NO_NUMPY_ERR)
+            self._np_random = numpy.random.RandomState(_seed_words(seed))
+        else:
+            self._np_random = None
+
+    @property
+    def seed(self):
+        """The seed the stream was created with"""
+        return self._seed
+
+    @property
+    def uses_numpy(self):
+        """True if buffers are filled (and returned) by NumPy"""
+        return self._np_random is not None
+
+    def random(self):
+        """Returns a random float on [0, 1)"""
+        return self._random.random()
+
+    def rand(self, min_, max_):
+        """Returns a random float on [min_, max_)"""
+        return min_ + self._random.random() * (max_ - min_)
+
+    def rand_with_gap(self, min_, max_):
+        """Returns a random value on [-max_,-min_] or [min_,max_]"""
+        r_pct = self._random.random()
+        if r_pct <= 0.5:
+            return -((max_ - min_) * 2 * r_pct + min_)
+        else:
+            return (max_ - min_) * (2 * r_pct - 1) + min_
+
+    def randint(self, min_, max_):
+        """Returns a random integer on [min_, max_]"""
+        return min_ + int(self._random.random() * (max_ - min_ + 1))
+
+    def floats(self, count, min_=0.0, max_=1.0, out=None):
+        """
+        Returns a buffer of count random floats on [min_, max_)
+
+        Fills out (starting at index 0) when it's given, otherwise
+        returns a new array('d') (or ndarray, for NumPy streams).
+        """
+        span = max_ - min_
+        if self._np_random is not None:
+            values = self._np_random.random_sample(count)
+            values *= span
+            values += min_
+            return self._copy_into(values, out)
+
+        if out is None:
+            out = array.array('d', [0.0]) * count
+        rnd = self._random.random
+        for i in xrange(count):
+            out[i] = min_ + rnd() * span
+        return out
+
+    def floats_with_gap(self, count, min_, max_, out=None):
+        """
+        Returns a buffer of count random values on [-max_,-min_] or [min_,max_]
+
+        See floats for how out is used.
+        """
+        span = max_ - min_
+        if self._np_random is not None:
+            pcts = self._np_random.random_sample(count)
+            values = numpy.where(pcts <= 0.5,
+                                 -(span * 2 * pcts + min_),
+                                 span * (2 * pcts - 1) + min_)
+            return self._copy_into(values, out)
+
+        if out is None:
+            out = array.array('d', [0.0]) * count
+        rnd = self._random.random
+        for i in xrange(count):
+            r_pct = rnd()
+            if r_pct <= 0.5:
+                out[i] = -(span * 2 * r_pct + min_)
+            else:
+                out[i] = span * (2 * r_pct - 1) + min_
+        return out
+
+    def ints(self, count, min_, max_, out=None):
+        """
+        Returns a buffer of count random integers on [min_, max_]
+
+        See floats for how out is used.
+        """
+        if self._np_random is not None:
+            values = self._np_random.randint(min_, max_ + 1, count)
+            return self._copy_into(values, out)
+
+        if out is None:
+            out = array.array('l', [0]) * count
+        rnd = self._random.random
+        span = max_ - min_ + 1
+        for i in xrange(count):
+            out[i] = min_ + int(rnd() * span)
+        return out
+
+    def spawn(self, count):
+        """Returns count independent substreams; see substream"""
+        return [self.substream(key) for key in xrange(count)]
+
+    def substream(self, key):
+        """
+        Returns an independent stream for key.
+
+        The substream's seed depends only on this stream's seed and key,
+        so worker N always gets the same values no matter how much
+        of this stream (or any other substream) has been used.
+        """
+        digest = hashlib.sha1('{0}:{1}'.format(self._seed, key)).hexdigest()
+        return RandomStream(int(digest[:16], 16), self.uses_numpy)
+
+    @staticmethod
+    def _copy_into(values, out):
+        """Copies NumPy values into out, if given"""
+        if out is None:
+            return values
+        if isinstance(out, array.array):
+            values = array.array(out.typecode, values.tolist())
+        out[:len(values)] = values
+        return out
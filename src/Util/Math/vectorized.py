@@ -0,0 +1,228 @@
+"""
+Array versions of the common math functions.
+
+Each function takes a buffer of values instead of a single value.
+Buffers can be NumPy arrays, array.array('d') buffers, or plain lists.
+NumPy is used when it's installed and the inputs are ndarrays; anything
+else falls back to a loop over the buffer.
+
+Functions that take an `out` argument write their results into it and
+return it.  Pass the input buffer as `out` to work in place.
+"""
+
+__all__ = ['clamp', 'distance', 'lerp', 'limit_vector', 'normalize', 'unit']
+
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+PRECISION = 1E-8
+
+def _is_ndarray(*vals):
+    """True if every one of vals is a NumPy array"""
+    if numpy is None:
+        return False
+    for val in vals:
+        if not isinstance(val, numpy.ndarray):
+            return False
+    return True
+
+def _empty_like(vals, size=None):
+    """Returns a zeroed float buffer of the same kind as vals"""
+    if size is None:
+        size = len(vals)
+    if _is_ndarray(vals):
+        return numpy.zeros(size, dtype=float)
+    elif isinstance(vals, array.array):
+        return array.array('d', [0.0]) * size
+    return [0.0] * size
+
+def clamp(vals, min_, max_, out=None):
+    """Clamps each value in vals to the range [min_, max_]"""
+    if out is None:
+        out = _empty_like(vals)
+    if _is_ndarray(vals, out):
+        return numpy.clip(vals, min_, max_, out)
+
+    for i, val in enumerate(vals):
+        if val < min_:
+            val = min_
+        elif val > max_:
+            val = max_
+        out[i] = val
+    return out
+
+def distance(pts1, pts2, dims=None, out=None):
+    """
+    Returns the distance between each pair of points in pts1, pts2.
+
+    pts1 and pts2 are N x D; either sequences of N points, or (with dims)
+    flat buffers of N * dims interleaved components, such as
+    array('d', [x0, y0, x1, y1, ...]).  A flat buffer without dims
+    is N points of 1 component each.
+    """
+    if len(pts1) != len(pts2):
+        raise IndexError("Unequal length vectors")
+
+    if _is_ndarray(pts1, pts2):
+        if dims is None and pts1.ndim == 1:
+            dims = 1
+        if dims is not None:
+            pts1 = pts1.reshape(-1, dims)
+            pts2 = pts2.reshape(-1, dims)
+        if pts1.shape != pts2.shape:
+            raise IndexError("Unequal length vectors")
+        diff = pts2 - pts1
+        diff *= diff
+        if out is None:
+            out = numpy.empty(len(diff), dtype=float)
+        numpy.sqrt(diff.sum(axis=1), out)
+        return out
+
+    if dims is None and len(pts1) and not hasattr(pts1[0], '__len__'):
+        dims = 1
+    if dims is None:
+        if out is None:
+            out = _empty_like(pts1)
+        for i, (pt1, pt2) in enumerate(zip(pts1, pts2)):
+            if len(pt1) != len(pt2):
+                raise IndexError("Unequal length vectors")
+            sum_ = 0.0
+            for val1, val2 in zip(pt1, pt2):
+                sum_ += (val2 - val1) * (val2 - val1)
+            out[i] = sum_ ** 0.5
+        return out
+
+    size = len(pts1) // dims
+    if out is None:
+        out = _empty_like(pts1, size)
+    for i in xrange(size):
+        sum_ = 0.0
+        for j in xrange(i * dims, (i + 1) * dims):
+            diff = pts2[j] - pts1[j]
+            sum_ += diff * diff
+        out[i] = sum_ ** 0.5
+    return out
+
+def lerp(min_, max_, ts, out=None):
+    """Lerps from min_ to max_ for each t in ts"""
+    if out is None:
+        out = _empty_like(ts)
+    span = max_ - min_
+    if _is_ndarray(ts, out):
+        numpy.multiply(ts, span, out)
+        out += min_
+        return out
+
+    for i, t in enumerate(ts): #pylint:disable-msg=C0103
+        out[i] = min_ + t * span
+    return out
+
+def limit_vector(vec_xs, vec_ys, mag_max, out_x=None, out_y=None):
+    """
+    Limits the magnitude of each vector to no greater than mag_max.
+
+    Returns out_x, out_y.  Pass vec_xs, vec_ys as out_x, out_y to
+    limit the vectors in place.
+    """
+    if mag_max < 0:
+        msg = "max_magnitude can't be negative: {0}"
+        raise ArithmeticError(msg.format(mag_max))
+    if out_x is None:
+        out_x = _empty_like(vec_xs)
+    if out_y is None:
+        out_y = _empty_like(vec_ys)
+
+    if _is_ndarray(vec_xs, vec_ys, out_x, out_y):
+        mag = numpy.hypot(vec_xs, vec_ys)
+        scale = numpy.ones_like(mag)
+        over = mag > mag_max
+        scale[over] = mag_max / mag[over]
+        numpy.multiply(vec_xs, scale, out_x)
+        numpy.multiply(vec_ys, scale, out_y)
+        return out_x, out_y
+
+    mag_max2 = mag_max * mag_max
+    for i, (vec_x, vec_y) in enumerate(zip(vec_xs, vec_ys)):
+        mag2 = vec_x * vec_x + vec_y * vec_y
+        if mag2 > mag_max2:
+            scale = mag_max / mag2 ** 0.5
+            vec_x *= scale
+            vec_y *= scale
+        out_x[i] = vec_x
+        out_y[i] = vec_y
+    return out_x, out_y
+
+def normalize(vals, out=None):
+    """
+    Normalizes vals onto [0, 1]
+
+    When the values are all within PRECISION, every value is 1.0 / len(vals)
+    """
+    size = len(vals)
+    if out is None:
+        out = _empty_like(vals)
+    if not size:
+        return out
+
+    if _is_ndarray(vals, out):
+        min_ = float(vals.min())
+        span = float(vals.max()) - min_
+        if size == 1 or span <= PRECISION:
+            out.fill(1.0 / size)
+        else:
+            numpy.subtract(vals, min_, out)
+            out /= span
+        return out
+
+    #Single scan for both bounds
+    min_ = max_ = vals[0]
+    for val in vals:
+        if val < min_:
+            min_ = val
+        elif val > max_:
+            max_ = val
+    span = float(max_ - min_)
+
+    if size == 1 or span <= PRECISION:
+        fill = 1.0 / size
+        for i in xrange(size):
+            out[i] = fill
+    else:
+        for i, val in enumerate(vals):
+            out[i] = (val - min_) / span
+    return out
+
+def unit(vec_xs, vec_ys, out_x=None, out_y=None):
+    """
+    Returns the unit vector components of each vector (vec_x, vec_y).
+
+    Zero-length vectors are left as (0, 0) instead of raising.
+    Returns out_x, out_y.  Pass vec_xs, vec_ys as out_x, out_y to
+    normalize the vectors in place.
+    """
+    if out_x is None:
+        out_x = _empty_like(vec_xs)
+    if out_y is None:
+        out_y = _empty_like(vec_ys)
+
+    if _is_ndarray(vec_xs, vec_ys, out_x, out_y):
+        mag = numpy.hypot(vec_xs, vec_ys)
+        nonzero = mag > 0
+        out_x[~nonzero] = 0.0
+        out_y[~nonzero] = 0.0
+        numpy.divide(vec_xs, mag, out_x, where=nonzero)
+        numpy.divide(vec_ys, mag, out_y, where=nonzero)
+        return out_x, out_y
+
+    for i, (vec_x, vec_y) in enumerate(zip(vec_xs, vec_ys)):
+        mag = (vec_x * vec_x + vec_y * vec_y) ** 0.5
+        if mag:
+            vec_x /= mag
+            vec_y /= mag
+        out_x[i] = vec_x
+        out_y[i] = vec_y
+    return out_x, out_y
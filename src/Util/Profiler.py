@@ -0,0 +1,145 @@
+"""
+Opt-in frame profiler for game loops
+
+Entity.update phases, Component/Container.update and Collider checks
+record how long they take into PROFILER while ENABLED is True.
+When it's False, each hook costs one attribute check.
+
+    Util.Profiler.enable()
+    for _ in xrange(frames):
+        with Util.Profiler.PROFILER.frame():
+            world.update(dt)
+    Util.Profiler.PROFILER.export_chrome_trace("frames.json")
+
+Open the trace in chrome://tracing (or any Chrome trace viewer, such as
+Perfetto or speedscope) to see each frame as a flame graph.
+Only the most recent `capacity` spans are kept.
+"""
+
+__all__ = ['ENABLED', 'PROFILER', 'FrameProfiler', 'clock',
+           'enable', 'disable']
+
+import collections
+import contextlib
+import json
+import os
+import thread
+
+import Util.Timers
+
+#Checked by every hook; use enable() and disable() to change
+ENABLED = False
+
+clock = Util.Timers.perf_counter
+
+#name, category, start, end, thread id, frame, args
+Span = collections.namedtuple('Span', 'name cat start end tid frame args')
+
+class FrameProfiler(object):
+    """
+    Ring buffer of timed spans, grouped by frame.
+
+    capacity: number of spans kept.  The oldest span is dropped
+        to make room for a new one.
+    """
+    def __init__(self, capacity=1 << 16):
+        self._spans = collections.deque(maxlen=capacity)
+        self._frame = 0
+        self._epoch = clock()
+
+    def clear(self):
+        """Drop every span, and start counting frames from 0"""
+        self._spans.clear()
+        self._frame = 0
+        self._epoch = clock()
+
+    def record(self, name, cat, start, end, args=None):
+        """Record a span that ran from start to end (clock seconds)"""
+        self._spans.append(Span(name, cat, start, end, thread.get_ident(),
+                                self._frame, args))
+
+    @contextlib.contextmanager
+    def span(self, name, cat='', args=None):
+        """Context manager that records its block as a span"""
+        start = clock()
+        try:
+            yield
+        finally:
+            self.record(name, cat, start, clock(), args)
+
+    @contextlib.contextmanager
+    def frame(self):
+        """Context manager that records its block as the next frame"""
+        start = clock()
+        try:
+            yield self._frame
+        finally:
+            self.record('frame', 'frame', start, clock())
+            self._frame += 1
+
+    def frame_summary(self, frame=None):
+        """
+        Returns {span name: (count, total seconds)} for one frame.
+
+        Leaving frame blank uses the last finished frame.
+        Nested spans are counted in their own name and their parent's.
+        """
+        if frame is None:
+            frame = self._frame - 1
+        summary = {}
+        for span in self._spans:
+            if span.frame == frame:
+                count, total = summary.get(span.name, (0, 0.0))
+                summary[span.name] = (count + 1,
+                                      total + span.end - span.start)
+        return summary
+
+    def export_chrome_trace(self, filename):
+        """
+        Write every span to filename as Chrome trace event JSON.
+
+        Spans are complete ("X") events, in microseconds since the
+        profiler was created (or cleared).
+        """
+        pid = os.getpid()
+        epoch = self._epoch
+        events = []
+        for span in self._spans:
+            args = {'frame': span.frame}
+            if span.args:
+                args.update(span.args)
+            events.append({'name': span.name, 'cat': span.cat, 'ph': 'X',
+                           'ts': (span.start - epoch) * 1e6,
+                           'dur': (span.end - span.start) * 1e6,
+                           'pid': pid, 'tid': span.tid, 'args': args})
+        with open(filename, 'w') as tracefile:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'},
+                      tracefile)
+
+    def _get_frame(self):
+        """Index of the frame being recorded"""
+        return self._frame
+    Frame = property(_get_frame)
+
+    def _get_spans(self):
+        """Every recorded span, oldest first"""
+        return list(self._spans)
+    Spans = property(_get_spans)
+
+    def __len__(self):
+        """Number of recorded spans"""
+        return len(self._spans)
+
+PROFILER = FrameProfiler()
+
+def enable(capacity=None):
+    """Start recording.  Passing capacity replaces PROFILER."""
+    global ENABLED, PROFILER #pylint:disable-msg=W0603
+    if capacity is not None:
+        PROFILER = FrameProfiler(capacity)
+    ENABLED = True
+
+def disable():
+    """Stop recording.  Recorded spans are kept."""
+    global ENABLED #pylint:disable-msg=W0603
+    ENABLED = False
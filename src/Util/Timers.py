@@ -0,0 +1,298 @@
+"""
+High resolution timers, with running stats per timer name
+
+Timers are started and stopped by timer id (tid) in a TimerRegistry.
+Stopping without a tid stops the most recently started timer that's
+still running, so nested timers can be used like a stack:
+    timers.start()
+    timers.start()
+    timers.stop() #Inner
+    timers.stop() #Outer
+or with timed():
+    with timers.timed("load"):
+        ...
+Only the most recent max_results timings are kept.  Named timers also
+feed running stats (count, total, min, max, p50, p99) that take the same
+small, fixed amount of memory no matter how often the timer runs.
+"""
+
+__all__ = ['perf_counter', 'P2Quantile', 'Timing', 'TimerStats',
+           'TimerRegistry']
+
+import bisect
+import collections
+import contextlib
+import itertools
+import time
+import timeit
+
+#Highest resolution clock available; only differences are meaningful
+perf_counter = getattr(time, 'perf_counter', timeit.default_timer)
+
+class P2Quantile(object):
+    """
+    Streaming estimate of the p quantile (0 < p < 1), using the P-Square
+    algorithm (Jain and Chlamtac, 1985).
+
+    Keeps 5 markers instead of the values, so adding is O(1) and
+    memory is constant.  Exact until 5 values have been added.
+    """
+    def __init__(self, p):
+        if not 0 < p < 1:
+            raise ValueError("Quantile {p} not recognized.".format(p=p))
+        self._p = p
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._increments = [0, p / 2.0, p, (1 + p) / 2.0, 1]
+
+    def add(self, value):
+        """Add a value to the estimate"""
+        heights = self._heights
+        if len(heights) < 5:
+            bisect.insort(heights, value)
+            return
+
+        #Find the cell the value falls in, stretching the ends if needed
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = bisect.bisect_right(heights, value) - 1
+
+        positions = self._positions
+        for i in xrange(cell + 1, 5):
+            positions[i] += 1
+        for i in xrange(5):
+            self._desired[i] += self._increments[i]
+
+        #Move the middle markers toward where they should be
+        for i in xrange(1, 4):
+            offset = self._desired[i] - positions[i]
+            if ((offset >= 1 and positions[i + 1] - positions[i] > 1) or
+                (offset <= -1 and positions[i - 1] - positions[i] < -1)):
+                step = 1 if offset > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = self._linear(i, step)
+                heights[i] = height
+                positions[i] += step
+
+    def _get_value(self):
+        """The current estimate, 0.0 before any values are added"""
+        heights = self._heights
+        if len(heights) == 5:
+            return heights[2]
+        if not heights:
+            return 0.0
+        return heights[int(round(self._p * (len(heights) - 1)))]
+    Value = property(_get_value)
+
+    def _linear(self, i, step):
+        """Linear prediction of marker i's height after moving by step"""
+        heights, positions = self._heights, self._positions
+        return heights[i] + step * ((heights[i + step] - heights[i]) /
+                                    float(positions[i + step] - positions[i]))
+
+    def _parabolic(self, i, step):
+        """Parabolic prediction of marker i's height after moving by step"""
+        heights, positions = self._heights, self._positions
+        span = float(positions[i + 1] - positions[i - 1])
+        right = ((positions[i] - positions[i - 1] + step) *
+                 (heights[i + 1] - heights[i]) /
+                 float(positions[i + 1] - positions[i]))
+        left = ((positions[i + 1] - positions[i] - step) *
+                (heights[i] - heights[i - 1]) /
+                float(positions[i] - positions[i - 1]))
+        return heights[i] + step / span * (right + left)
+
+class Timing(collections.namedtuple('Timing', 'start end')):
+    """Start and end (perf_counter seconds) of a stopped timer"""
+    __slots__ = ()
+
+    @property
+    def elapsed(self):
+        """Seconds between start and end"""
+        return self.end - self.start
+
+class TimerStats(object):
+    """Running stats over every timing of one named timer"""
+    def __init__(self):
+        self._count = 0
+        self._total = 0.0
+        self._min = None
+        self._max = None
+        self._p50 = P2Quantile(0.5)
+        self._p99 = P2Quantile(0.99)
+
+    def add(self, elapsed):
+        """Add one timing, in seconds"""
+        self._count += 1
+        self._total += elapsed
+        if self._min is None or elapsed < self._min:
+            self._min = elapsed
+        if self._max is None or elapsed > self._max:
+            self._max = elapsed
+        self._p50.add(elapsed)
+        self._p99.add(elapsed)
+
+    def _get_count(self):
+        """Number of timings"""
+        return self._count
+    Count = property(_get_count)
+
+    def _get_total(self):
+        """Sum of every timing"""
+        return self._total
+    Total = property(_get_total)
+
+    def _get_min(self):
+        """Shortest timing, None before any timings"""
+        return self._min
+    Min = property(_get_min)
+
+    def _get_max(self):
+        """Longest timing, None before any timings"""
+        return self._max
+    Max = property(_get_max)
+
+    def _get_mean(self):
+        """Average timing, 0.0 before any timings"""
+        return self._total / self._count if self._count else 0.0
+    Mean = property(_get_mean)
+
+    def _get_p50(self):
+        """Estimated median timing"""
+        return self._p50.Value
+    P50 = property(_get_p50)
+
+    def _get_p99(self):
+        """Estimated 99th percentile timing"""
+        return self._p99.Value
+    P99 = property(_get_p99)
+
+class TimerRegistry(object):
+    """
+    Starts and stops timers by timer id (tid), and keeps their timings.
+
+    max_results: number of stopped timings kept for lookup by tid.
+        The oldest timing is dropped to make room for a new one.
+    clock: function returning the current time in seconds.
+
+    Timers with a name (by default, the tid given to start) are added to
+    that name's TimerStats.  Timers started without a tid get the next
+    integer tid, and no stats unless they're given a name.
+    """
+    def __init__(self, max_results=1024, clock=None):
+        self._clock = perf_counter if clock is None else clock
+        self._max_results = max_results
+        self._auto_tids = itertools.count()
+        #tid -> (name, start), in the order they were started
+        self._running = collections.OrderedDict()
+        self._results = collections.OrderedDict()
+        self._stats = {}
+        self._last_tid = None
+
+    def start(self, tid=None, name=None):
+        """
+        Start a timer, and return its tid.
+
+        Restarting a running tid starts it over.
+        """
+        if tid is None:
+            tid = next(self._auto_tids)
+        else:
+            if name is None:
+                name = tid
+            self._running.pop(tid, None)
+        self._running[tid] = (name, self._clock())
+        return tid
+
+    def stop(self, tid=None):
+        """
+        Stop a timer, and return its tid.
+
+        Leaving tid blank stops the most recently started timer that's
+        still running.  Returns None if no timer is running, and
+        ignores tids that aren't running.
+        """
+        end = self._clock()
+        if tid is None:
+            if not self._running:
+                return None
+            tid, (name, start) = self._running.popitem()
+        elif tid in self._running:
+            name, start = self._running.pop(tid)
+        else:
+            return tid
+        return self._keep(tid, name, start, end)
+
+    def record(self, tid, start, end, name=None):
+        """
+        Keep a timing taken elsewhere, as if tid was started at start
+        and stopped at end.  Returns tid.
+
+        The timing is added to name's stats (by default, tid's).
+        """
+        return self._keep(tid, tid if name is None else name, start, end)
+
+    def _keep(self, tid, name, start, end):
+        """Store a timing, and add it to name's stats unless name is None"""
+        results = self._results
+        results.pop(tid, None)
+        results[tid] = Timing(start, end)
+        if len(results) > self._max_results:
+            results.popitem(False)
+        if name is not None:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = TimerStats()
+            stats.add(end - start)
+        self._last_tid = tid
+        return tid
+
+    @contextlib.contextmanager
+    def timed(self, name=None):
+        """Context manager that times its block, yielding the tid"""
+        tid = self.start(name=name)
+        try:
+            yield tid
+        finally:
+            self.stop(tid)
+
+    def elapsed(self, tid=None):
+        """
+        Seconds between the start and stop of a timer, 0 if unknown.
+
+        Leaving tid blank uses the last timer stopped.
+        """
+        if tid is None:
+            tid = self._last_tid
+        timing = self._results.get(tid)
+        return timing.elapsed if timing is not None else 0
+
+    def timing(self, tid):
+        """The Timing of a stopped timer, None if unknown"""
+        return self._results.get(tid)
+
+    def stats(self, name):
+        """The TimerStats for a timer name, None if it never stopped"""
+        return self._stats.get(name)
+
+    def _get_names(self):
+        """Names of every timer with stats"""
+        return self._stats.keys()
+    Names = property(_get_names)
+
+    def _get_last_tid(self):
+        """tid of the last timer stopped"""
+        return self._last_tid
+    LastTid = property(_get_last_tid)
+
+    def _get_running(self):
+        """Number of timers still running"""
+        return len(self._running)
+    Running = property(_get_running)
@@ -9,7 +9,9 @@ that are useful for general coding
 import IO
 import Math
 import Formatting
+import Profiler
 import Structs
+import Timers
 import Wrappers
 
 from _lib import * #pylint:disable-msg=W0401